@@ -0,0 +1,107 @@
+"""日志开销基准：对比关闭日志、同步handler、队列handler下模拟请求的p50/p99延迟
+
+用法（在 apps/api-python 目录下）：
+    python -m benchmarks.logging_overhead --requests 5000 --concurrency 100 --sink-delay-ms 0.2
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+from types import SimpleNamespace
+
+from src.config import logging_config
+from src.config.logging_config import JsonFormatter
+
+
+class SlowFileHandler(logging.FileHandler):
+    """模拟慢磁盘/慢stdout：每条日志写入后额外阻塞"""
+
+    def __init__(self, filename: str, delay: float):
+        super().__init__(filename, encoding="utf-8")
+        self.delay = delay
+
+    def emit(self, record):
+        super().emit(record)
+        if self.delay:
+            time.sleep(self.delay)
+
+
+async def simulated_request(logger: logging.Logger, logs_per_request: int) -> float:
+    started = time.perf_counter()
+    for i in range(logs_per_request):
+        logger.info("handled step %s for user %s", i, 42)
+        await asyncio.sleep(0)
+    return time.perf_counter() - started
+
+
+async def run_load(logger: logging.Logger, total: int, concurrency: int, logs_per_request: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            latencies.append(await simulated_request(logger, logs_per_request))
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def configure(mode: str, path: str, delay: float) -> logging.Logger:
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    logging_config.shutdown_logging()
+
+    if mode == "off":
+        root.setLevel(logging.CRITICAL)
+    elif mode == "sync":
+        handler = SlowFileHandler(path, delay)
+        handler.setFormatter(JsonFormatter())
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+    else:
+        config = SimpleNamespace(
+            LOG_FILE=None, LOG_JSON=True, LOG_FORMAT="", LOG_QUEUE_SIZE=100000,
+            LOG_FILE_MAX_BYTES=0, LOG_FILE_BACKUP_COUNT=0, LOG_DEBUG_SAMPLE_RATE=1.0,
+            LOG_LEVEL="INFO",
+        )
+        listener = logging_config.setup_logging(config)
+        # 替换为同样的慢速文件输出，只比较调用方的阻塞时间
+        output = SlowFileHandler(path, delay)
+        output.setFormatter(JsonFormatter())
+        listener.handlers = (output,)
+    return logging.getLogger("benchmark")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--logs-per-request", type=int, default=5)
+    parser.add_argument("--sink-delay-ms", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("off", "sync", "queue"):
+            logger = configure(mode, os.path.join(tmp, f"{mode}.log"), args.sink_delay_ms / 1000)
+            started = time.perf_counter()
+            latencies = asyncio.run(run_load(logger, args.requests, args.concurrency, args.logs_per_request))
+            elapsed = time.perf_counter() - started
+            print(
+                f"{mode:>5}: p50={statistics.median(latencies) * 1000:8.3f}ms "
+                f"p99={percentile(latencies, 0.99) * 1000:8.3f}ms "
+                f"throughput={args.requests / elapsed:9.1f} req/s"
+            )
+        logging_config.shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
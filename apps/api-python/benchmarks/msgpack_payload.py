@@ -0,0 +1,63 @@
+"""用户列表响应编码基准：对比JSON（FastAPI的jsonable_encoder + JSONResponse）与MessagePack
+
+测量ApiResponse负载大小，以及服务端编码、调用方解码的每次耗时。
+
+用法（在 apps/api-python 目录下）：
+    python -m benchmarks.msgpack_payload --users 20 200 2000
+"""
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from benchmarks.user_construct import make_rows
+from src.models.user import User
+from src.services.msgpack_codec import packb, unpackb
+
+
+def make_payload(count: int) -> dict:
+    """与GET /api/users/相同的响应结构"""
+    return {
+        "success": True,
+        "data": [User.from_row(row).dict() for row in make_rows(count)],
+        "error": None,
+        "message": "Users retrieved successfully",
+    }
+
+
+FORMATS = {
+    "json": (lambda payload: JSONResponse(jsonable_encoder(payload)).body, json.loads),
+    "msgpack": (packb, unpackb),
+}
+
+
+def timed(fn, value, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(value)
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, nargs="+", default=[20, 200, 2000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    for count in args.users:
+        payload = make_payload(count)
+        repeat = max(1, args.repeat * 20 // max(count, 20))
+        for name, (encode, decode) in FORMATS.items():
+            body = encode(payload)
+            encode_time = timed(encode, payload, repeat)
+            decode_time = timed(decode, body, repeat)
+            print(
+                f"{count:>5} users {name:>7}: size={len(body) / 1024:8.1f}KiB "
+                f"encode={encode_time * 1e6:9.1f}us decode={decode_time * 1e6:9.1f}us"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""User模型构造基准：对比逐字段校验（User(**row)）与可信行快速构造（User.from_row）
+
+测量每行构造耗时和构造结果的内存占用（tracemalloc峰值）。
+
+用法（在 apps/api-python 目录下）：
+    python -m benchmarks.user_construct --rows 10000 100000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from src.models.user import User
+
+
+def make_rows(count: int) -> list:
+    """模拟aiomysql DictCursor返回的行（BOOLEAN为0/1，时间为datetime）"""
+    base = datetime(2024, 1, 1)
+    return [
+        {
+            "id": i,
+            "username": f"user_{i}",
+            "email": f"user_{i}@example.com",
+            "name": f"User {i}",
+            "avatar": f"https://api.dicebear.com/7.x/avataaars/svg?seed=user_{i}",
+            "email_verified": i % 2,
+            "is_active": 1,
+            "last_login": None,
+            "created_at": base + timedelta(seconds=i),
+            "updated_at": base + timedelta(seconds=i),
+        }
+        for i in range(count)
+    ]
+
+
+STRATEGIES = {
+    "validate": lambda row: User(**row),
+    "from_row": User.from_row,
+}
+
+
+def measure(strategy, rows: list) -> tuple:
+    gc.collect()
+    started = time.perf_counter()
+    users = [strategy(row) for row in rows]
+    elapsed = time.perf_counter() - started
+    del users
+
+    gc.collect()
+    tracemalloc.start()
+    users = [strategy(row) for row in rows]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del users
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    for count in args.rows:
+        rows = make_rows(count)
+        for name, strategy in STRATEGIES.items():
+            elapsed, peak = measure(strategy, rows)
+            print(
+                f"{count:>7} rows {name:>9}: {elapsed * 1e6 / count:7.2f} us/row "
+                f"total={elapsed * 1000:8.1f}ms peak_mem={peak / 1024 / 1024:7.1f}MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
+from typing import Optional
+
+from ..services.metrics import metrics
+
+# 当前请求ID（由RequestIdMiddleware设置，随协程上下文传递）
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_listener: Optional[QueueListener] = None
+
+
+class RequestContextFilter(logging.Filter):
+    """在产生日志的协程上下文中附加请求ID"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """按比例采样DEBUG日志，其他级别全部保留"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """JSON Lines格式"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "module": record.module,
+            "line": record.lineno,
+            "process": record.process,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exception"] = record.exc_text
+        if record.stack_info:
+            payload["stack"] = record.stack_info
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """非阻塞入队：队列满时丢弃日志并计数，不阻塞事件循环"""
+
+    _exc_formatter = logging.Formatter()
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("log_records_dropped_total")
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 在调用方线程合并消息参数、格式化异常栈，格式化为JSON交给后台线程
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _build_output_handler(config) -> logging.Handler:
+    """后台线程使用的输出handler（滚动文件或stdout）
+
+    多个worker进程写同一文件时不能各自滚动（会互相重命名文件、丢失日志），改为追加写入，
+    由logrotate等外部工具滚动，WatchedFileHandler发现文件被移走后重新打开。
+    """
+    if config.LOG_FILE:
+        try:
+            log_dir = os.path.dirname(config.LOG_FILE)
+            if log_dir:
+                os.makedirs(log_dir, exist_ok=True)
+            if not config.LOG_FILE_ROTATE:
+                return WatchedFileHandler(config.LOG_FILE, encoding="utf-8")
+            return RotatingFileHandler(
+                config.LOG_FILE,
+                maxBytes=config.LOG_FILE_MAX_BYTES,
+                backupCount=config.LOG_FILE_BACKUP_COUNT,
+                encoding="utf-8",
+            )
+        except OSError as e:
+            sys.stderr.write(f"⚠️ Cannot open log file {config.LOG_FILE}, falling back to stdout: {e}\n")
+    return logging.StreamHandler(sys.stdout)
+
+
+def setup_logging(config) -> QueueListener:
+    """配置异步日志：QueueHandler入队，QueueListener在后台线程写出"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = _build_output_handler(config)
+    output.setFormatter(JsonFormatter() if config.LOG_JSON else logging.Formatter(config.LOG_FORMAT))
+
+    log_queue: queue.Queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    if config.LOG_DEBUG_SAMPLE_RATE < 1.0:
+        queue_handler.addFilter(DebugSamplingFilter(config.LOG_DEBUG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(config.LOG_LEVEL)
+
+    # uvicorn/gunicorn的日志也走队列，避免访问日志同步写stdout
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access", "gunicorn.error", "gunicorn.access"):
+        server_logger = logging.getLogger(name)
+        server_logger.handlers = []
+        server_logger.propagate = True
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def set_log_level(level: str) -> None:
+    """运行时修改根日志级别（uvicorn/gunicorn的日志已传递到根logger）"""
+    logging.getLogger().setLevel(level)
+
+
+def shutdown_logging() -> None:
+    """停止后台线程并写出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
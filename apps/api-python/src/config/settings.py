@@ -1,4 +1,5 @@
 import os
+import time
 from typing import Optional
 from enum import Enum
 from pydantic import BaseSettings, Field
@@ -24,6 +25,21 @@ class BaseConfig(BaseSettings):
     PORT: int = 3003
     RELOAD: bool = False
     
+    # 启动配置：后台连接依赖时立即开始服务，/health/ready 在依赖就绪前返回503
+    STARTUP_BACKGROUND_CONNECT: bool = False
+    STARTUP_RETRY_INITIAL_SECONDS: float = 1.0
+    STARTUP_RETRY_MAX_SECONDS: float = 30.0
+    
+    # 生产服务器配置（src/server.py）
+    WEB_WORKERS: int = 0  # 0表示使用CPU核数
+    WEB_BACKLOG: int = 2048
+    WEB_KEEPALIVE: int = 5
+    WEB_MAX_REQUESTS: int = 10000
+    WEB_MAX_REQUESTS_JITTER: int = 1000
+    WEB_GRACEFUL_TIMEOUT: int = 30
+    WEB_TIMEOUT: int = 60
+    WEB_WORKER_TMP_DIR: Optional[str] = "/dev/shm"
+    
     # 数据库配置
     DB_HOST: str = "localhost"
     DB_PORT: int = 3306
@@ -32,7 +48,22 @@ class BaseConfig(BaseSettings):
     DB_DATABASE: str = "turborepo_dev"
     DB_CHARSET: str = "utf8mb4"
     DB_POOL_SIZE: int = 10
+    DB_POOL_SIZE_LIMIT: int = 0  # 运行时DB_POOL_SIZE的上限（每个worker），src/server.py启动时按worker数设置；0表示单进程运行
+    DB_POOL_DRAIN_TIMEOUT: float = 30.0  # 运行时调整连接池大小时，旧连接池等待在用连接归还的最长时间（秒）
     DB_MAX_OVERFLOW: int = 20
+    DB_ACQUIRE_TIMEOUT: float = 5.0
+    DB_MAX_CONNECTIONS: int = 151  # MySQL max_connections，按worker数分摊连接池
+    DB_RESERVED_CONNECTIONS: int = 10  # 预留给运维和其他服务的连接数
+    DB_REPLICA_HOST: Optional[str] = None  # 只读副本，导出等长时间读取优先使用
+    DB_REPLICA_PORT: Optional[int] = None
+    DB_REPLICA_POOL_SIZE: int = 4
+    # 用户分片：分片0为DB_DATABASE，这里列出其余分片（"库名"或"host:port/库名"），分片数确定后不能再修改
+    DB_SHARDS: list = []
+    DB_SHARD_POOL_SIZE: int = 5
+    SNOWFLAKE_EPOCH_MS: int = 1704067200000  # 雪花ID时间起点（2024-01-01 UTC）
+    # 改用雪花ID之前users表的最大自增ID（不超过它的ID在分片0）；迁移时记录在主库snowflake_legacy_ids表，数据库初始化时读取
+    SNOWFLAKE_LEGACY_MAX_ID: int = 0
+    SNOWFLAKE_LEASE_INTERVAL: float = 5.0  # 确认仍持有雪花ID worker id（主库命名锁）的间隔（秒），租约有效期为两倍
     
     # Redis配置
     REDIS_HOST: str = "localhost"
@@ -40,11 +71,160 @@ class BaseConfig(BaseSettings):
     REDIS_PASSWORD: str = "redis123"
     REDIS_DB: int = 0
     REDIS_TIMEOUT: int = 60
+    REDIS_OPERATION_TIMEOUT: float = 2.0
+    # 部署模式：standalone（REDIS_HOST:REDIS_PORT）、sentinel（由哨兵发现主节点）、cluster（按槽路由）
+    REDIS_MODE: str = "standalone"
+    REDIS_SENTINELS: list = []  # "host:port"
+    REDIS_SENTINEL_MASTER: str = "mymaster"
+    REDIS_SENTINEL_PASSWORD: Optional[str] = None
+    REDIS_CLUSTER_NODES: list = []  # 集群启动节点"host:port"，为空时使用REDIS_HOST:REDIS_PORT
+    
+    # 用户缓存与批量查询配置
+    USER_CACHE_TTL: int = 300
+    USER_BATCH_MAX_IDS: int = 500
+    USER_BATCH_CHUNK_SIZE: int = 200
+    USER_PAGE_MAX_LIMIT: int = 100
+    
+    # 用户删除清理配置（删除接口只标记删除，关联数据由后台分批清理）
+    USER_PURGE_INTERVAL: int = 60  # 清理周期（秒），0表示关闭
+    USER_PURGE_BATCH_SIZE: int = 500
+    USER_PURGE_BATCH_PAUSE: float = 0.05  # 批次之间的暂停（秒），限制清理速率
+    USER_PURGE_USERS_PER_PASS: int = 100
+    
+    # 用户搜索索引配置
+    SEARCH_DEFAULT_LIMIT: int = 10
+    SEARCH_MAX_LIMIT: int = 50
+    SEARCH_MAX_TERM_LENGTH: int = 64  # 超出部分不参与前缀匹配
+    SEARCH_REBUILD_CHUNK_SIZE: int = 1000
+    SEARCH_REBUILD_LOCK_TTL: int = 3600
+    
+    # 批量导出配置
+    EXPORT_FETCH_SIZE: int = 1000  # 服务端游标每次读取的行数
+    EXPORT_MAX_CONCURRENT: int = 2  # 每个worker同时进行的导出数
+    EXPORT_NET_WRITE_TIMEOUT: int = 600  # 客户端读取缓慢时MySQL等待发送的秒数
+    
+    # 管理接口配置（为空时管理接口不可用）
+    ADMIN_TOKEN: Optional[str] = None
+    
+    # 性能分析配置（管理接口 /admin/profiling 及请求头X-Profile，默认关闭）
+    PROFILING_ENABLED: bool = False
+    PROFILING_MAX_SECONDS: float = 60.0
+    PROFILING_REPORTS_KEPT: int = 50
+    PROFILING_REPORT_LINES: int = 50
+    PROFILING_SUMMARY_FUNCTIONS: int = 5
+    
+    # 事件循环监控配置
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_LAG_INTERVAL: float = 0.5  # 采样间隔（秒）
+    LOOP_LAG_THRESHOLD: float = 0.1  # 超过该延迟记录警告并抓取调用栈（秒）
+    LOOP_STALL_STACK_DEPTH: int = 30
+    LOOP_DEBUG: bool = False  # asyncio调试模式（慢回调检测，有额外开销；DEBUG时自动开启）
+    LOOP_SLOW_CALLBACK_SECONDS: float = 0.1
+    
+    # 内存诊断配置（/admin/memory）
+    MEMORY_SNAPSHOTS_KEPT: int = 10
+    MEMORY_TRACE_ON_STARTUP: bool = False  # 启动时即开启tracemalloc（有分配开销）
+    MEMORY_TYPE_COUNTS: bool = False  # 导出按类型的对象数（每次采集遍历整个堆）
+    MEMORY_TYPE_COUNTS_LIMIT: int = 20
+    
+    # 链路追踪配置（OpenTelemetry，默认关闭）
+    TRACING_ENABLED: bool = False
+    TRACING_SERVICE_NAME: str = "api-python"
+    TRACING_SAMPLER: str = "head"  # head：按trace id比例采样；tail：根span结束后按错误/耗时/比例决定
+    TRACING_SAMPLE_RATIO: float = 0.1
+    TRACING_TAIL_LATENCY_SECONDS: float = 0.5  # 尾部采样时超过该耗时的trace全部保留
+    TRACING_TAIL_MAX_TRACES: int = 10000  # 尾部采样等待决定的trace上限
+    TRACING_EXPORTER: str = "otlp"  # otlp / file / console
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACING_FILE_PATH: str = "traces.jsonl"
+    
+    # 自适应并发限制配置（每个worker独立，按首字节耗时调整）
+    CONCURRENCY_LIMIT_ENABLED: bool = True
+    CONCURRENCY_INITIAL_LIMIT: int = 50
+    CONCURRENCY_MIN_LIMIT: int = 5
+    CONCURRENCY_MAX_LIMIT: int = 500
+    CONCURRENCY_LATENCY_TARGET: float = 0.25  # 首字节耗时超过该值时减少限制（秒）
+    CONCURRENCY_BACKOFF: float = 0.9  # 每次减少时乘以该系数
+    CONCURRENCY_QUEUE_SIZE: int = 100  # 超出限制时最多排队的请求数
+    CONCURRENCY_QUEUE_TIMEOUT: float = 0.5  # 排队超过该时间返回503（秒）
+    CONCURRENCY_RETRY_AFTER: int = 1  # 503响应的Retry-After（秒）
+    # 不受限制的路径前缀（SSE长连接由SSE_MAX_CLIENTS限制，流式导出由EXPORT_MAX_CONCURRENT限制，它们会长时间占用名额）
+    CONCURRENCY_BYPASS_PATHS: list = ["/health", "/metrics", "/admin", "/api/events", "/api/exports"]
+
+    # 请求截止时间配置（MySQL/Redis操作的超时取剩余时间，超时返回504）
+    DEADLINE_ENABLED: bool = True
+    DEADLINE_DEFAULT_SECONDS: float = 10.0
+    # 按路由前缀覆盖（键为"METHOD /prefix"或"/prefix"，最长前缀优先），0表示不限制
+    DEADLINE_ROUTES: dict = {
+        "/health": 3.0,
+        "GET /api/users": 5.0,
+        "/api/auth": 5.0,
+        "/api/exports": 0,
+        "/api/events": 0,
+        "/admin": 0,
+    }
+    DEADLINE_MYSQL_HINT: bool = True  # 为SELECT加上MAX_EXECUTION_TIME提示，服务端到时中断语句
+
+    # 慢查询记录配置（/admin/slow-queries，按worker聚合）
+    SLOW_QUERY_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD: float = 0.2  # 超过该耗时的语句记录日志（秒）
+    SLOW_QUERY_EXPLAIN: bool = True  # 新出现的慢语句在后台执行EXPLAIN FORMAT=JSON
+    SLOW_QUERY_EXPLAIN_CONCURRENCY: int = 1
+    SLOW_QUERY_EXPLAIN_TIMEOUT: float = 5.0
+    SLOW_QUERY_MAX_FINGERPRINTS: int = 500
+
+    # 运行时配置（部分性能参数可通过 /admin/config、Redis key或JSON文件修改，无需重启）
+    DYNAMIC_CONFIG_ENABLED: bool = True
+    DYNAMIC_CONFIG_REDIS_KEY: str = "config:dynamic"  # 所有worker共享的覆盖值（JSON对象）
+    DYNAMIC_CONFIG_FILE: Optional[str] = None  # 覆盖值文件（JSON对象），按修改时间检测变更
+    DYNAMIC_CONFIG_POLL_INTERVAL: float = 5.0  # 检查Redis key和文件的间隔（秒）
+
+    # 变更事件配置（outbox表 -> Redis Streams events:<类型>）
+    OUTBOX_RELAY_ENABLED: bool = True
+    OUTBOX_POLL_INTERVAL: float = 1.0  # 没有写入唤醒时检查outbox的间隔（秒）
+    OUTBOX_BATCH_SIZE: int = 500
+    OUTBOX_STREAM_MAXLEN: int = 100000  # 每个Stream保留的事件数（近似裁剪）
+    EVENTS_READ_COUNT: int = 100  # 消费者每次读取的事件数
+    EVENTS_BLOCK_MS: int = 5000  # 消费者阻塞读取时间
+    EVENTS_CLAIM_IDLE_MS: int = 60000  # 待确认超过该时间的事件可被其他消费者认领
+    EVENTS_CLAIM_INTERVAL: float = 30.0  # 消费者检查超时待确认事件的间隔（秒）
+    EVENTS_MAX_DELIVERIES: int = 5  # 投递超过该次数仍未处理成功的事件移入死信Stream
+
+    # 事件推送配置（SSE /api/events，每个worker一个Redis订阅）
+    SSE_MAX_CLIENTS: int = 5000  # 每个worker的最大连接数
+    SSE_CLIENT_BUFFER: int = 256  # 每个连接的待发送事件上限，超过时断开（慢消费者）
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+    SSE_RETRY_MS: int = 3000  # 浏览器断线重连间隔
+    SSE_RESUME_MAX_EVENTS: int = 1000  # Last-Event-ID续传时每个Stream最多补发的事件数
+
+    # 计数配置（分页总数）
+    COUNTER_RECONCILE_INTERVAL: int = 300  # 与MySQL对账的间隔（秒），0表示关闭
+    COUNTER_APPROXIMATE_TTL: float = 60.0  # information_schema估算值的进程内缓存时间
+    
+    # 熔断器配置（MySQL和Redis各自独立）
+    CIRCUIT_BREAKER_ENABLED: bool = True
+    CIRCUIT_BREAKER_FAILURE_RATE: float = 0.5
+    CIRCUIT_BREAKER_SLOW_CALL_SECONDS: float = 1.0
+    CIRCUIT_BREAKER_SLOW_CALL_RATE: float = 0.8
+    CIRCUIT_BREAKER_WINDOW_SIZE: int = 20
+    CIRCUIT_BREAKER_MINIMUM_CALLS: int = 10
+    CIRCUIT_BREAKER_OPEN_SECONDS: float = 30.0
+    CIRCUIT_BREAKER_HALF_OPEN_CALLS: int = 3
+    
+    # 请求合并配置（single-flight）
+    SINGLEFLIGHT_ENABLED: bool = True
+    SINGLEFLIGHT_TIMEOUT: float = 5.0
     
     # 日志配置
     LOG_LEVEL: str = "INFO"
     LOG_FORMAT: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     LOG_FILE: Optional[str] = None
+    LOG_JSON: bool = True
+    LOG_QUEUE_SIZE: int = 10000  # 队列满时丢弃日志（计入log_records_dropped_total）
+    LOG_FILE_MAX_BYTES: int = 50 * 1024 * 1024
+    LOG_FILE_BACKUP_COUNT: int = 5
+    LOG_FILE_ROTATE: bool = True  # 进程内按大小滚动LOG_FILE；src/server.py以多个worker启动时设为False，由外部工具（logrotate）滚动
+    LOG_DEBUG_SAMPLE_RATE: float = 1.0  # DEBUG日志采样比例
     
     # CORS配置
     CORS_ORIGINS: list = ["*"]
@@ -136,6 +316,7 @@ class StagingConfig(BaseConfig):
     
     # 预发布环境配置
     LOG_LEVEL: str = "INFO"
+    LOOP_DEBUG: bool = True  # 在预发布环境发现阻塞事件循环的代码
     
     # 预发布环境数据库配置
     DB_HOST: str = Field(default="staging-mysql", env="STAGING_DB_HOST")
@@ -158,8 +339,10 @@ def get_config() -> BaseConfig:
     config_class = config_mapping.get(Environment(env), DevelopmentConfig)
     return config_class()
 
-# 全局配置实例
+# 全局配置实例（记录实例化耗时，见 /health/startup）
+_load_started = time.perf_counter()
 settings = get_config()
+SETTINGS_LOAD_SECONDS = time.perf_counter() - _load_started
 
 # 数据库URL构造
 def get_database_url(config: BaseConfig = settings) -> str:
@@ -1,44 +1,152 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+import asyncio
 import os
 import time
 import logging
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
-from .routes.users import router as users_router
-from .routes.health import router as health_router
-from .routes.auth import router as auth_router
+from .services.startup import startup_report
+from .config.settings import SETTINGS_LOAD_SECONDS, settings
+from .config.logging_config import set_log_level, setup_logging
+from .middleware.request_id import RequestIdMiddleware
+from .middleware.inflight import InflightTrackerMiddleware
+from .middleware.concurrency import ConcurrencyLimitMiddleware
+from .middleware.deadline import DeadlineMiddleware
+
+# 路由及其依赖模块（记录各模块导入耗时）
+users_router = startup_report.import_module(".routes.users", __package__).router
+health_router = startup_report.import_module(".routes.health", __package__).router
+auth_router = startup_report.import_module(".routes.auth", __package__).router
+metrics_router = startup_report.import_module(".routes.metrics", __package__).router
+exports_router = startup_report.import_module(".routes.exports", __package__).router
+admin_router = startup_report.import_module(".routes.admin", __package__).router
+events_router = startup_report.import_module(".routes.events", __package__).router
 from .services.database import DatabaseService
 from .services.redis import RedisService
-from .config.settings import settings
+from .services.counters import counter_service
+from .services.user_purger import user_purger
+from .services.outbox import outbox_relay
+from .services.worker_id import worker_id_lease
+from .services.loop_monitor import loop_monitor
+from .services.memory import install_memory_metrics, memory_diagnostics
+from .services.metrics import metrics
+from .services.concurrency_limiter import collect_limiter_metrics, concurrency_limiter
+from .services.dynamic_config import collect_dynamic_config_metrics, dynamic_config
+from .services.event_hub import collect_event_hub_metrics, event_hub
+from .services.tracing import setup_tracing, shutdown_tracing, statement_span
+from .services.db_instrumentation import add_statement_observer, add_statement_rewriter
+from .services.deadline import add_execution_time_hint, statement_deadline
+from .services.slow_query import slow_query_log
+from .services.msgpack_codec import MsgPackResponse, accepts_msgpack
+from .routes.dependencies import require_admin
 
 # 加载环境变量
 load_dotenv()
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
+# 配置日志（异步队列输出，JSON Lines）
+setup_logging(settings)
 logger = logging.getLogger(__name__)
 
+# GC指标（按需开启tracemalloc）
+install_memory_metrics()
+metrics.register_collector(collect_event_hub_metrics)
+metrics.register_collector(collect_dynamic_config_metrics)
+if settings.MEMORY_TRACE_ON_STARTUP:
+    memory_diagnostics.start()
+
+# 运行时配置变更后需要额外生效的部分（其余配置在每次使用时读取settings）
+dynamic_config.register_applier(["DB_POOL_SIZE"], DatabaseService.resize_pool)
+dynamic_config.register_applier(["LOG_LEVEL"], lambda: set_log_level(settings.LOG_LEVEL))
+dynamic_config.register_applier(
+    ["CONCURRENCY_MIN_LIMIT", "CONCURRENCY_MAX_LIMIT", "CONCURRENCY_LATENCY_TARGET", "CONCURRENCY_QUEUE_SIZE"],
+    concurrency_limiter.reconfigure
+)
+
+# 依赖初始化函数（名称 -> 初始化协程）
+DEPENDENCIES = {
+    "mysql": DatabaseService.initialize,
+    "redis": RedisService.initialize,
+}
+
+async def _initialize_dependency(name: str) -> None:
+    with startup_report.measure_dependency(name):
+        await DEPENDENCIES[name]()
+
+async def initialize_dependencies(names) -> dict:
+    """并发初始化依赖，返回失败的依赖及其异常"""
+    names = list(names)
+    results = await asyncio.gather(
+        *(_initialize_dependency(name) for name in names),
+        return_exceptions=True
+    )
+    return {name: result for name, result in zip(names, results) if isinstance(result, BaseException)}
+
+async def connect_in_background() -> None:
+    """后台连接依赖，失败时指数退避重试，全部成功后标记就绪"""
+    pending = list(DEPENDENCIES)
+    delay = settings.STARTUP_RETRY_INITIAL_SECONDS
+    while pending:
+        failures = await initialize_dependencies(pending)
+        for name, error in failures.items():
+            logger.warning(f"⚠️ {name} not available yet, retrying in {delay:.1f}s: {error}")
+        pending = list(failures)
+        if pending:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.STARTUP_RETRY_MAX_SECONDS)
+    startup_report.mark_ready()
+    logger.info("✅ All dependencies connected, instance is ready")
+    startup_report.log_summary()
+
+def start_maintenance_tasks() -> list:
+    """启动后台维护任务（各任务自行处理依赖暂不可用的情况）"""
+    tasks = [asyncio.create_task(worker_id_lease.run(), name="snowflake-lease")]
+    if settings.COUNTER_RECONCILE_INTERVAL > 0:
+        tasks.append(asyncio.create_task(counter_service.run_reconciler(), name="counter-reconciler"))
+    if settings.LOOP_MONITOR_ENABLED:
+        tasks.append(asyncio.create_task(loop_monitor.run(), name="loop-monitor"))
+    if settings.USER_PURGE_INTERVAL > 0:
+        tasks.append(asyncio.create_task(user_purger.run(), name="user-purger"))
+    if settings.OUTBOX_RELAY_ENABLED:
+        tasks.append(asyncio.create_task(outbox_relay.run(), name="outbox-relay"))
+    if settings.DYNAMIC_CONFIG_ENABLED:
+        tasks.append(asyncio.create_task(dynamic_config.run(), name="dynamic-config"))
+    return tasks
+
 # 应用生命周期管理
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # 启动时初始化数据库和Redis
-    try:
-        logger.info("🚀 Initializing database connection...")
-        await DatabaseService.initialize()
-        logger.info("✅ Database connection initialized successfully")
-        
-        logger.info("🚀 Initializing Redis connection...")
-        await RedisService.initialize()
-        logger.info("✅ Redis connection initialized successfully")
-    except Exception as e:
-        logger.error(f"❌ Failed to initialize services: {e}")
-        raise e
+    # 启动时初始化数据库和Redis（并发进行）
+    background_tasks = []
+    if settings.STARTUP_BACKGROUND_CONNECT:
+        # 立即开始接收请求，依赖在后台连接，/health/ready 在就绪前返回503
+        logger.info("🚀 Connecting database and Redis in background...")
+        background_tasks.append(asyncio.create_task(connect_in_background()))
+    else:
+        logger.info("🚀 Initializing database and Redis connections...")
+        failures = await initialize_dependencies(DEPENDENCIES)
+        if failures:
+            for name, error in failures.items():
+                logger.error(f"❌ Failed to initialize {name}: {error}")
+            raise next(iter(failures.values()))
+        startup_report.mark_ready()
+        logger.info("✅ Database and Redis connections initialized successfully")
+    
+    background_tasks.extend(start_maintenance_tasks())
+    startup_report.mark_serving()
+    if startup_report.ready:
+        startup_report.log_summary()
     
     yield
     
+    # 先停止后台任务，再关闭连接池
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await event_hub.stop()
+    
     # 关闭时清理数据库和Redis连接
     try:
         logger.info("🔄 Closing database connection...")
@@ -50,6 +158,9 @@ async def lifespan(app: FastAPI):
         logger.info("✅ Redis connection closed successfully")
     except Exception as e:
         logger.error(f"❌ Failed to close services: {e}")
+    
+    # 导出剩余的span
+    shutdown_tracing()
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -61,6 +172,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 配置加载耗时计入启动报告
+startup_report.settings_seconds = SETTINGS_LOAD_SECONDS
+
 # 启动时间记录
 start_time = time.time()
 app.state.start_time = start_time
@@ -74,21 +188,67 @@ app.add_middleware(
     allow_headers=settings.CORS_HEADERS,
 )
 
+# 在途请求记录（事件循环阻塞时定位路由）
+if settings.LOOP_MONITOR_ENABLED:
+    app.add_middleware(InflightTrackerMiddleware)
+
+# 请求追踪（未启用或未安装OpenTelemetry时不注册）
+if setup_tracing(settings):
+    from .middleware.tracing import TracingMiddleware
+    app.add_middleware(TracingMiddleware)
+    add_statement_observer(statement_span)
+
+# 单请求性能分析（未启用时不注册，没有任何开销）
+if settings.PROFILING_ENABLED:
+    from .middleware.profiling import ProfilingMiddleware
+    app.add_middleware(ProfilingMiddleware)
+
+# 慢查询记录（计时所有经连接池执行的语句）
+if settings.SLOW_QUERY_ENABLED:
+    add_statement_observer(slow_query_log.observe)
+
+# 请求截止时间与客户端断开检测（在并发限制之内，排队时间不计入截止时间）
+if settings.DEADLINE_ENABLED:
+    app.add_middleware(DeadlineMiddleware)
+    add_statement_observer(statement_deadline)
+    if settings.DEADLINE_MYSQL_HINT:
+        add_statement_rewriter(add_execution_time_hint)
+
+# 自适应并发限制（在追踪和分析之前拒绝，被拒绝的请求几乎没有开销）
+if settings.CONCURRENCY_LIMIT_ENABLED:
+    app.add_middleware(ConcurrencyLimitMiddleware)
+    metrics.register_collector(collect_limiter_metrics)
+
+# 请求ID中间件（最外层，保证所有日志都带上请求ID）
+app.add_middleware(RequestIdMiddleware)
+
 # 注册路由
 app.include_router(health_router, prefix="/health", tags=["health"])
+app.include_router(metrics_router, prefix="/metrics", tags=["metrics"])
 app.include_router(users_router, prefix=f"{settings.API_PREFIX}/users", tags=["users"])
 app.include_router(auth_router, prefix=f"{settings.API_PREFIX}/auth", tags=["auth"])
+app.include_router(events_router, prefix=f"{settings.API_PREFIX}/events", tags=["events"])
+app.include_router(
+    exports_router,
+    prefix=f"{settings.API_PREFIX}/exports",
+    tags=["exports"],
+    dependencies=[Depends(require_admin)]
+)
+app.include_router(admin_router, prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
 
 # 全局异常处理
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return JSONResponse(
+    # 要求MessagePack的服务间调用，错误响应也使用MessagePack
+    response_class = MsgPackResponse if accepts_msgpack(request.headers.get("accept")) else JSONResponse
+    return response_class(
         status_code=exc.status_code,
         content={
             "success": False,
             "error": exc.detail,
             "message": f"HTTP {exc.status_code} Error"
-        }
+        },
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(Exception)
@@ -121,6 +281,16 @@ async def catch_all(path: str):
     raise HTTPException(status_code=404, detail="Route not found")
 
 if __name__ == "__main__":
+    # 单进程开发启动；生产环境使用 python -m src.server（多worker）
     import uvicorn
-    port = int(os.getenv("PORT", 3003))
-    uvicorn.run(app, host="0.0.0.0", port=port) 
\ No newline at end of file
+    port = int(os.getenv("PORT", settings.PORT))
+    uvicorn.run(
+        app,
+        host=settings.HOST,
+        port=port,
+        loop="uvloop",
+        http="httptools",
+        backlog=settings.WEB_BACKLOG,
+        timeout_keep_alive=settings.WEB_KEEPALIVE,
+        timeout_graceful_shutdown=settings.WEB_GRACEFUL_TIMEOUT,
+    ) 
\ No newline at end of file
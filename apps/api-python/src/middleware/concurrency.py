@@ -0,0 +1,85 @@
+import json
+import time
+
+from ..config.settings import settings
+from ..services.concurrency_limiter import (
+    PRIORITY_CRITICAL,
+    PRIORITY_NAMES,
+    PRIORITY_NORMAL,
+    PRIORITY_WRITE,
+    LimiterRejected,
+    concurrency_limiter,
+)
+from ..services.metrics import metrics
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def request_priority(scope) -> int:
+    """请求优先级：豁免路径不受限制，带Authorization的写请求优先于其他请求"""
+    path = scope.get("path", "")
+    if any(path == prefix or path.startswith(prefix.rstrip("/") + "/") for prefix in settings.CONCURRENCY_BYPASS_PATHS):
+        return PRIORITY_CRITICAL
+    if scope.get("method") not in SAFE_METHODS:
+        for name, _ in scope["headers"]:
+            if name == b"authorization":
+                return PRIORITY_WRITE
+    return PRIORITY_NORMAL
+
+
+class ConcurrencyLimitMiddleware:
+    """自适应并发限制：超出限制的请求短暂排队，排不上时立即返回503和Retry-After"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def _reject(self, send, reason: str) -> None:
+        body = json.dumps({
+            "success": False,
+            "error": "Server is overloaded, please retry later",
+            "message": "HTTP 503 Error",
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(settings.CONCURRENCY_RETRY_AFTER).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        priority = request_priority(scope)
+        if priority == PRIORITY_CRITICAL:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await concurrency_limiter.acquire(priority, settings.CONCURRENCY_QUEUE_TIMEOUT)
+        except LimiterRejected as e:
+            metrics.inc("requests_shed_total", priority=PRIORITY_NAMES[priority], reason=e.reason)
+            await self._reject(send, e.reason)
+            return
+
+        started = time.perf_counter()
+        first_byte = None
+
+        async def send_with_timing(message):
+            nonlocal first_byte
+            # 以首字节耗时作为拥塞信号，流式响应的传输时间不影响限制
+            if message["type"] == "http.response.start" and first_byte is None:
+                first_byte = time.perf_counter() - started
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            concurrency_limiter.release()
+            if first_byte is not None:
+                concurrency_limiter.record_latency(first_byte)
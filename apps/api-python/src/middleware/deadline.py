@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+from ..services.deadline import deadline_scope, route_timeout
+from ..services.metrics import metrics
+
+
+class DeadlineMiddleware:
+    """请求截止时间与客户端断开检测
+
+    按路由设置截止时间（MySQL/Redis操作据此缩短超时），在独立任务中处理请求：
+    超过截止时间或客户端断开时取消处理任务，连接池中的连接随之释放（执行中的语句由KILL QUERY终止）。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def _timeout_response(self, send) -> None:
+        body = json.dumps({
+            "success": False,
+            "error": "Request deadline exceeded",
+            "message": "HTTP 504 Error",
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 504,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timeout = route_timeout(scope.get("method", ""), scope.get("path", ""))
+        # 只有本中间件读取客户端消息：请求体最多预读一个分块（保留上传的背压），读到http.disconnect说明客户端已断开
+        messages: asyncio.Queue = asyncio.Queue(maxsize=1)
+        response_started = False
+        response_complete = False
+
+        async def watch_disconnect():
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                await messages.put(message)
+
+        async def receive_forwarded():
+            if messages.empty() and watcher.done():
+                return {"type": "http.disconnect"}
+            get = asyncio.ensure_future(messages.get())
+            try:
+                await asyncio.wait({get, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                if not get.done():
+                    get.cancel()
+            if get.done() and not get.cancelled():
+                return get.result()
+            return messages.get_nowait() if not messages.empty() else {"type": "http.disconnect"}
+
+        async def send_tracking(message):
+            nonlocal response_started, response_complete
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+
+        watcher = asyncio.create_task(watch_disconnect())
+        with deadline_scope(timeout):
+            handler = asyncio.create_task(self.app(scope, receive_forwarded, send_tracking))
+        try:
+            done, _ = await asyncio.wait({handler, watcher}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if handler in done:
+                handler.result()
+                return
+            if response_complete:
+                # 响应已完整发出（uvicorn此时对receive返回http.disconnect），等待处理任务收尾，不再取消
+                await handler
+                return
+
+            handler.cancel()
+            await asyncio.gather(handler, return_exceptions=True)
+            if watcher in done:
+                metrics.inc("requests_client_disconnected_total")
+            else:
+                metrics.inc("deadline_exceeded_total", stage="request")
+                if not response_started:
+                    await self._timeout_response(send)
+        finally:
+            watcher.cancel()
+            if not handler.done():
+                handler.cancel()
+                await asyncio.gather(handler, return_exceptions=True)
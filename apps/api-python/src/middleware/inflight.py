@@ -0,0 +1,22 @@
+import asyncio
+
+from ..services.loop_monitor import inflight_requests
+
+
+class InflightTrackerMiddleware:
+    """记录正在处理的请求，事件循环被阻塞时据此定位路由"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        task = asyncio.current_task()
+        inflight_requests.track(task, scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            inflight_requests.untrack(task)
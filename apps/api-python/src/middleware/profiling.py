@@ -0,0 +1,68 @@
+import time
+import uuid
+
+from ..config.logging_config import request_id_var
+from ..routes.dependencies import is_admin_token
+from ..services.profiler import request_profiles
+
+PROFILE_HEADER = b"x-profile"
+ADMIN_TOKEN_HEADER = b"x-admin-token"
+
+
+class ProfilingMiddleware:
+    """请求头带 X-Profile: 1（且X-Admin-Token有效）时用cProfile分析该请求
+
+    响应头X-Profile-Summary给出自身耗时最多的函数，完整报告通过
+    GET /admin/profiling/requests/{X-Profile-Id} 获取。只在PROFILING_ENABLED时注册。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if headers.get(PROFILE_HEADER) != b"1" or not is_admin_token(
+            headers.get(ADMIN_TOKEN_HEADER, b"").decode("latin-1")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = request_profiles.start()
+        if profiler is None:
+            async def send_busy(message):
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": [*message.get("headers", []), (b"x-profile", b"busy")]}
+                await send(message)
+
+            await self.app(scope, receive, send_busy)
+            return
+
+        profile_id = request_id_var.get() or uuid.uuid4().hex
+        started = time.perf_counter()
+        finished = False
+
+        def finish() -> str:
+            nonlocal finished
+            finished = True
+            return request_profiles.finish(profile_id, profiler, time.perf_counter() - started)
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start" and not finished:
+                # 响应头发出时结束分析（不包含响应体的发送）
+                summary = finish()
+                message = {**message, "headers": [
+                    *message.get("headers", []),
+                    (b"x-profile-id", profile_id.encode("latin-1")),
+                    (b"x-profile-summary", summary.encode("latin-1", errors="replace")),
+                ]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            if not finished:
+                finish()
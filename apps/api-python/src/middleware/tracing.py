@@ -0,0 +1,50 @@
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from ..services.tracing import extract_context
+
+
+class TracingMiddleware:
+    """为每个请求创建服务端span（解析W3C traceparent作为父上下文），只在TRACING_ENABLED时注册"""
+
+    def __init__(self, app):
+        self.app = app
+        self.tracer = trace.get_tracer(__name__)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+        token = otel_context.attach(extract_context(headers))
+        method = scope.get("method", "")
+        try:
+            with self.tracer.start_as_current_span(
+                f"HTTP {method}",
+                kind=SpanKind.SERVER,
+                attributes={
+                    "http.method": method,
+                    "http.target": scope.get("path", ""),
+                    "http.scheme": scope.get("scheme", "http"),
+                },
+            ) as span:
+                async def send_with_status(message):
+                    if message["type"] == "http.response.start":
+                        status_code = message["status"]
+                        span.set_attribute("http.status_code", status_code)
+                        if status_code >= 500:
+                            span.set_status(Status(StatusCode.ERROR))
+                    await send(message)
+
+                try:
+                    await self.app(scope, receive, send_with_status)
+                finally:
+                    # 路由匹配后用路由模板命名span，避免路径参数造成高基数
+                    route = getattr(scope.get("route"), "path", None)
+                    if route:
+                        span.set_attribute("http.route", route)
+                        span.update_name(f"HTTP {method} {route}")
+        finally:
+            otel_context.detach(token)
@@ -1,8 +1,23 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, field_serializer
+import asyncio
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime
 import aiomysql
+import logging
 from ..services.database import get_database_service
+from ..services.redis import RedisService, get_redis_service
+from ..services.singleflight import SingleFlight, flight_key
+from ..services.dataloader import DataLoader
+from ..services.metrics import metrics
+from ..services.counters import counter_service
+from ..services.search_index import user_search_index
+from ..services.user_purger import user_purger
+from ..services.outbox import outbox_relay, record_event
+from ..services.sharding import group_by_shard, merge_sorted, scatter, shard_for_email, shard_for_id
+from ..services.snowflake import id_generator
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
 
 class User(BaseModel):
     id: Optional[int] = None
@@ -15,6 +30,22 @@ class User(BaseModel):
     last_login: Optional[datetime] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    
+    @field_serializer("id")
+    def _serialize_id(self, value: Optional[int]) -> Optional[str]:
+        """雪花ID超过2^53，序列化为字符串（与 packages/shared-types 的 User.id: string 一致），JavaScript客户端不丢精度"""
+        return None if value is None else str(value)
+    
+    @classmethod
+    def from_row(cls, row: dict) -> 'User':
+        """从数据库行快速构造（跳过字段校验，仅用于本库查询出的可信数据）
+        
+        MySQL的BOOLEAN列返回0/1，这里显式转换；日期列已由驱动转换为datetime。
+        """
+        values = dict(row)
+        values["email_verified"] = bool(values.get("email_verified"))
+        values["is_active"] = bool(values.get("is_active", True))
+        return cls.model_construct(**values)
 
 class CreateUserRequest(BaseModel):
     username: str
@@ -28,57 +59,229 @@ class UpdateUserRequest(BaseModel):
     name: Optional[str] = None
     avatar: Optional[str] = None
 
+USER_COLUMNS = """id, username, email, name, avatar,
+                   email_verified, is_active, last_login,
+                   created_at, updated_at"""
+
+# 跨分片列表的排序键（created_at倒序，同一时间按id倒序）
+def _created_order(user: 'User'):
+    return (user.created_at or datetime.min, user.id or 0)
+
+def user_cache_key(user_id: int) -> str:
+    """用户缓存key"""
+    return f"user:{user_id}"
+
+async def _get_cache() -> Optional[RedisService]:
+    """获取Redis缓存服务，不可用时返回None（直接查库）"""
+    try:
+        return await get_redis_service()
+    except Exception as e:
+        logger.warning(f"⚠️ User cache unavailable: {e}")
+        return None
+
+async def _invalidate_user_cache(user_id: int) -> None:
+    cache = await _get_cache()
+    if cache is not None:
+        await cache.delete(user_cache_key(user_id))
+
+# 读请求合并：并发的相同查询共享一次数据库访问
+_user_flight = SingleFlight("user_repository")
+
+def _forget_user_reads(user_id: int) -> None:
+    """写操作提交后丢弃可能读到旧数据的进行中查询（之后的调用重新查库）"""
+    _user_flight.forget(flight_key("get_user_by_id", user_id))
+    for method in ("get_user_by_email", "get_all_users", "get_users_page"):
+        _user_flight.forget_method(method)
+
+async def _coalesce(key, fn):
+    """按方法名和参数合并并发的相同读请求"""
+    if not settings.SINGLEFLIGHT_ENABLED:
+        return await fn()
+    return await _user_flight.do(key, fn, timeout=settings.SINGLEFLIGHT_TIMEOUT)
+
 class UserRepository:
     @staticmethod
     async def get_all_users() -> List[User]:
         """获取所有用户"""
-        db_service = await get_database_service()
-        
-        async with db_service.get_connection() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                await cursor.execute("""
-                    SELECT id, username, email, name, avatar, 
-                           email_verified, is_active, last_login, 
-                           created_at, updated_at 
-                    FROM users 
-                    ORDER BY created_at DESC
-                """)
-                rows = await cursor.fetchall()
-                return [User(**row) for row in rows]
+        return await _coalesce(flight_key("get_all_users"), UserRepository._query_all_users)
     
     @staticmethod
     async def get_user_by_id(user_id: int) -> Optional[User]:
         """根据ID获取用户"""
+        return await _coalesce(
+            flight_key("get_user_by_id", user_id),
+            lambda: UserRepository._query_user_by_id(user_id)
+        )
+    
+    @staticmethod
+    async def get_user_by_email(email: str) -> Optional[User]:
+        """根据邮箱获取用户"""
+        return await _coalesce(
+            flight_key("get_user_by_email", email),
+            lambda: UserRepository._query_user_by_email(email)
+        )
+    
+    @staticmethod
+    async def get_users_page(offset: int, limit: int) -> List[User]:
+        """分页获取用户（按创建时间倒序）"""
+        return await _coalesce(
+            flight_key("get_users_page", offset, limit),
+            lambda: UserRepository._query_users_page(offset, limit)
+        )
+    
+    @staticmethod
+    async def get_users_by_ids(user_ids: List[int]) -> Dict[int, User]:
+        """批量获取用户：先一次MGET查缓存，未命中的按块用IN查询并回填缓存"""
+        ids = list(dict.fromkeys(user_ids))
+        if not ids:
+            return {}
+        
+        found: Dict[int, User] = {}
+        cache = await _get_cache()
+        if cache is not None:
+            cached = await cache.mget([user_cache_key(user_id) for user_id in ids])
+            for user_id, value in zip(ids, cached):
+                if isinstance(value, dict):
+                    # 缓存中的日期为ISO字符串，需要经过校验转换
+                    found[user_id] = User(**value)
+        
+        missing = [user_id for user_id in ids if user_id not in found]
+        metrics.inc("user_batch_cache_hits_total", len(ids) - len(missing))
+        metrics.inc("user_batch_cache_misses_total", len(missing))
+        if missing:
+            loaded = await UserRepository._query_users_by_ids(missing)
+            found.update(loaded)
+            if cache is not None and loaded:
+                await cache.mset(
+                    {user_cache_key(user_id): user.json() for user_id, user in loaded.items()},
+                    ttl=settings.USER_CACHE_TTL
+                )
+        return found
+    
+    @staticmethod
+    async def search_users(query: str, limit: int, cursor: Optional[str] = None) -> Optional[Tuple[List[User], Optional[str]]]:
+        """前缀搜索用户：索引给出ID，再批量加载用户（保持索引顺序）"""
+        result = await user_search_index.search(query, limit, cursor)
+        if result is None:
+            return None
+        user_ids, next_cursor = result
+        users = await UserRepository.get_users_by_ids(user_ids)
+        # 索引中可能残留已删除用户，加载不到的直接跳过
+        return [users[user_id] for user_id in user_ids if user_id in users], next_cursor
+    
+    @staticmethod
+    async def _query_users_by_ids(user_ids: List[int]) -> Dict[int, User]:
+        """按分片分组，各分片并发查询"""
         db_service = await get_database_service()
+        chunk_size = settings.USER_BATCH_CHUNK_SIZE
+        
+        async def query_shard(shard: int, shard_ids: List[int]) -> Dict[int, User]:
+            result: Dict[int, User] = {}
+            async with db_service.get_connection(shard) as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    for start in range(0, len(shard_ids), chunk_size):
+                        chunk = shard_ids[start:start + chunk_size]
+                        placeholders = ", ".join(["%s"] * len(chunk))
+                        await cursor.execute(
+                            f"SELECT {USER_COLUMNS} FROM users WHERE id IN ({placeholders}) AND deleted_at IS NULL",
+                            chunk
+                        )
+                        for row in await cursor.fetchall():
+                            result[row["id"]] = User.from_row(row)
+            return result
         
-        async with db_service.get_connection() as conn:
+        result: Dict[int, User] = {}
+        for found in await asyncio.gather(*(query_shard(shard, ids) for shard, ids in group_by_shard(user_ids))):
+            result.update(found)
+        return result
+    
+    @staticmethod
+    async def _query_users_page(offset: int, limit: int) -> List[User]:
+        """跨分片分页：每个分片取前offset+limit行，按created_at归并后截取"""
+        db_service = await get_database_service()
+        
+        async def query_shard(shard: int) -> List[User]:
+            async with db_service.get_connection(shard) as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute(
+                        f"SELECT {USER_COLUMNS} FROM users WHERE deleted_at IS NULL "
+                        "ORDER BY created_at DESC, id DESC LIMIT %s",
+                        (offset + limit,)
+                    )
+                    return [User.from_row(row) for row in await cursor.fetchall()]
+        
+        if db_service.shard_count == 1:
+            async with db_service.get_connection() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute(
+                        f"SELECT {USER_COLUMNS} FROM users WHERE deleted_at IS NULL "
+                        "ORDER BY created_at DESC LIMIT %s OFFSET %s",
+                        (limit, offset)
+                    )
+                    rows = await cursor.fetchall()
+                    return [User.from_row(row) for row in rows]
+        
+        merged = merge_sorted(await scatter(query_shard), key=_created_order, reverse=True)
+        return merged[offset:offset + limit]
+    
+    @staticmethod
+    async def _query_all_users() -> List[User]:
+        db_service = await get_database_service()
+        
+        async def query_shard(shard: int) -> List[User]:
+            async with db_service.get_connection(shard) as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute("""
+                        SELECT id, username, email, name, avatar, 
+                               email_verified, is_active, last_login, 
+                               created_at, updated_at 
+                        FROM users 
+                        WHERE deleted_at IS NULL
+                        ORDER BY created_at DESC, id DESC
+                    """)
+                    rows = await cursor.fetchall()
+                    return [User.from_row(row) for row in rows]
+        
+        return merge_sorted(await scatter(query_shard), key=_created_order, reverse=True)
+    
+    @staticmethod
+    async def _query_user_by_id(user_id: int) -> Optional[User]:
+        shard = shard_for_id(user_id)
+        if shard is None:
+            return None
+        db_service = await get_database_service()
+        
+        async with db_service.get_connection(shard) as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute("""
                     SELECT id, username, email, name, avatar, 
                            email_verified, is_active, last_login, 
                            created_at, updated_at 
                     FROM users 
-                    WHERE id = %s
+                    WHERE id = %s AND deleted_at IS NULL
                 """, (user_id,))
                 row = await cursor.fetchone()
-                return User(**row) if row else None
+                return User.from_row(row) if row else None
     
     @staticmethod
-    async def get_user_by_email(email: str) -> Optional[User]:
-        """根据邮箱获取用户"""
+    async def _query_user_by_email(email: str) -> Optional[User]:
         db_service = await get_database_service()
         
-        async with db_service.get_connection() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                await cursor.execute("""
-                    SELECT id, username, email, name, avatar, 
-                           email_verified, is_active, last_login, 
-                           created_at, updated_at 
-                    FROM users 
-                    WHERE email = %s
-                """, (email,))
-                row = await cursor.fetchone()
-                return User(**row) if row else None
+        # 按邮箱哈希定位分片；分片化之前创建的用户都在分片0
+        for shard in dict.fromkeys((shard_for_email(email), 0)):
+            async with db_service.get_connection(shard) as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute("""
+                        SELECT id, username, email, name, avatar, 
+                               email_verified, is_active, last_login, 
+                               created_at, updated_at 
+                        FROM users 
+                        WHERE email = %s AND deleted_at IS NULL
+                    """, (email,))
+                    row = await cursor.fetchone()
+                    if row:
+                        return User.from_row(row)
+        return None
     
     @staticmethod
     async def create_user(user_data: CreateUserRequest) -> User:
@@ -89,25 +292,47 @@ class UserRepository:
         import hashlib
         password_hash = hashlib.sha256(user_data.password.encode()).hexdigest()
         
-        async with db_service.get_connection() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                await cursor.execute("""
-                    INSERT INTO users (username, email, password_hash, name, avatar, created_at, updated_at)
-                    VALUES (%s, %s, %s, %s, %s, NOW(), NOW())
-                """, (
-                    user_data.username,
-                    user_data.email,
-                    password_hash,
-                    user_data.name,
-                    user_data.avatar or f"https://api.dicebear.com/7.x/avataaars/svg?seed={user_data.username}"
-                ))
-                
-                user_id = conn.insert_id()
-                return await UserRepository.get_user_by_id(user_id)
+        # 按邮箱选择分片，ID编码所在分片；用户行与变更事件在同一事务中提交
+        shard = shard_for_email(user_data.email)
+        for attempt in range(2):
+            user_id = id_generator.next_id(shard)
+            try:
+                async with db_service.transaction(shard) as conn:
+                    async with conn.cursor(aiomysql.DictCursor) as cursor:
+                        await cursor.execute("""
+                            INSERT INTO users (id, username, email, password_hash, name, avatar, created_at, updated_at)
+                            VALUES (%s, %s, %s, %s, %s, %s, NOW(), NOW())
+                        """, (
+                            user_id,
+                            user_data.username,
+                            user_data.email,
+                            password_hash,
+                            user_data.name,
+                            user_data.avatar or f"https://api.dicebear.com/7.x/avataaars/svg?seed={user_data.username}"
+                        ))
+                    await record_event(conn, "users", user_id, "user.created", {"username": user_data.username, "name": user_data.name})
+                break
+            except aiomysql.IntegrityError as e:
+                # worker id由主库命名锁租用，主键冲突只可能发生在租约丢失的瞬间，换一个ID重试一次
+                if attempt or e.args[0] != 1062 or "PRIMARY" not in str(e):
+                    raise
+                logger.warning(f"⚠️ Snowflake id {user_id} collided on shard {shard}, retrying")
+        _forget_user_reads(user_id)
+        outbox_relay.wake()
+        
+        await counter_service.adjust("users", 1)
+        # 写后读不走请求合并，避免拿到写入前发起的查询结果
+        new_user = await UserRepository._query_user_by_id(user_id)
+        if new_user is not None:
+            await user_search_index.index_user(new_user)
+        return new_user
     
     @staticmethod
     async def update_user(user_id: int, user_data: UpdateUserRequest) -> Optional[User]:
         """更新用户"""
+        shard = shard_for_id(user_id)
+        if shard is None:
+            return None
         db_service = await get_database_service()
         
         # 构建动态更新语句
@@ -132,21 +357,64 @@ class UserRepository:
         update_fields.append("updated_at = NOW()")
         values.append(user_id)
         
-        async with db_service.get_connection() as conn:
+        async with db_service.transaction(shard) as conn:
             async with conn.cursor() as cursor:
-                query = f"UPDATE users SET {', '.join(update_fields)} WHERE id = %s"
+                query = f"UPDATE users SET {', '.join(update_fields)} WHERE id = %s AND deleted_at IS NULL"
                 await cursor.execute(query, values)
-                
-                if cursor.rowcount > 0:
-                    return await UserRepository.get_user_by_id(user_id)
-                return None
+                updated = cursor.rowcount > 0
+            if updated:
+                await record_event(conn, "users", user_id, "user.updated", {"changes": user_data.dict(exclude_none=True)})
+        
+        if not updated:
+            return None
+        _forget_user_reads(user_id)
+        outbox_relay.wake()
+        await _invalidate_user_cache(user_id)
+        updated_user = await UserRepository._query_user_by_id(user_id)
+        if updated_user is not None:
+            await user_search_index.index_user(updated_user)
+        return updated_user
+    
+    @staticmethod
+    async def email_exists(email: str) -> bool:
+        """邮箱是否已被占用（包括等待清理的已删除用户，email列有唯一约束）"""
+        db_service = await get_database_service()
+        
+        for shard in dict.fromkeys((shard_for_email(email), 0)):
+            async with db_service.get_connection(shard) as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute("SELECT 1 FROM users WHERE email = %s LIMIT 1", (email,))
+                    if await cursor.fetchone() is not None:
+                        return True
+        return False
     
     @staticmethod
     async def delete_user(user_id: int) -> bool:
-        """删除用户"""
+        """删除用户：只标记删除（tombstone）并立即返回，关联数据和用户行由UserPurger分批清理"""
+        shard = shard_for_id(user_id)
+        if shard is None:
+            return False
         db_service = await get_database_service()
         
-        async with db_service.get_connection() as conn:
+        async with db_service.transaction(shard) as conn:
             async with conn.cursor() as cursor:
-                await cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
-                return cursor.rowcount > 0 
\ No newline at end of file
+                await cursor.execute(
+                    "UPDATE users SET is_active = FALSE, deleted_at = NOW() WHERE id = %s AND deleted_at IS NULL",
+                    (user_id,)
+                )
+                deleted = cursor.rowcount > 0
+            if deleted:
+                await record_event(conn, "users", user_id, "user.deleted")
+        
+        if deleted:
+            _forget_user_reads(user_id)
+            outbox_relay.wake()
+            await _invalidate_user_cache(user_id)
+            await counter_service.adjust("users", -1)
+            await user_search_index.remove_user(user_id)
+            user_purger.wake()
+        return deleted 
+
+def create_user_loader() -> DataLoader:
+    """创建请求级用户loader：同一tick内的按ID查询合并为一次批量查询"""
+    return DataLoader("users", UserRepository.get_users_by_ids)
@@ -0,0 +1,179 @@
+import asyncio
+import os
+from enum import Enum
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
+
+from ..config.settings import settings
+from ..services.dynamic_config import dynamic_config
+from ..services.loop_monitor import loop_monitor
+from ..services.memory import memory_diagnostics
+from ..services.profiler import request_profiles, sampling_profiler
+from ..services.slow_query import slow_query_log
+
+router = APIRouter()
+
+class ProfileFormat(str, Enum):
+    """采样结果格式"""
+    COLLAPSED = "collapsed"
+    SPEEDSCOPE = "speedscope"
+
+class MemoryGroupBy(str, Enum):
+    """tracemalloc统计分组方式"""
+    LINENO = "lineno"
+    FILENAME = "filename"
+    TRACEBACK = "traceback"
+
+class SlowQuerySort(str, Enum):
+    """慢查询排序方式"""
+    TOTAL = "total_seconds"
+    MAX = "max_seconds"
+    COUNT = "count"
+
+def _require_profiling() -> None:
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Profiling is disabled (set PROFILING_ENABLED)"
+        )
+
+@router.post("/profiling/sample")
+async def sample_profile(
+    seconds: float = Query(10.0, gt=0, description="采样时长（秒）"),
+    interval_ms: float = Query(5.0, ge=1, description="采样间隔（毫秒）"),
+    format: ProfileFormat = Query(ProfileFormat.SPEEDSCOPE, description="输出格式：collapsed/speedscope")
+):
+    """对处理本请求的worker采样seconds秒，返回调用栈文件"""
+    _require_profiling()
+    if sampling_profiler.running:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Sampling already in progress")
+
+    seconds = min(seconds, settings.PROFILING_MAX_SECONDS)
+    loop = asyncio.get_running_loop()
+    try:
+        samples = await loop.run_in_executor(None, sampling_profiler.sample, seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    name = f"worker-{os.getpid()}"
+    headers = {"X-Worker-Pid": str(os.getpid()), "X-Profile-Samples": str(samples.sample_count)}
+    if format == ProfileFormat.COLLAPSED:
+        headers["Content-Disposition"] = f'attachment; filename="{name}.collapsed.txt"'
+        return PlainTextResponse(samples.to_collapsed(), headers=headers)
+    headers["Content-Disposition"] = f'attachment; filename="{name}.speedscope.json"'
+    return JSONResponse(samples.to_speedscope(name), headers=headers)
+
+@router.get("/profiling/requests/{profile_id}")
+async def get_request_profile(profile_id: str):
+    """获取带X-Profile头的请求的完整cProfile报告"""
+    _require_profiling()
+    report = request_profiles.get(profile_id)
+    if report is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return PlainTextResponse(report)
+
+@router.get("/loop")
+async def get_loop_status():
+    """事件循环延迟及在途请求"""
+    return {"success": True, "data": loop_monitor.snapshot()}
+
+class SnapshotRequest(BaseModel):
+    name: str
+
+@router.post("/memory/tracing")
+async def start_memory_tracing(frames: int = Query(1, ge=1, le=50, description="每次分配记录的栈深度")):
+    """开启tracemalloc"""
+    memory_diagnostics.start(frames)
+    return {"success": True, "data": {"tracing": memory_diagnostics.tracing}}
+
+@router.delete("/memory/tracing")
+async def stop_memory_tracing():
+    """关闭tracemalloc并丢弃快照"""
+    memory_diagnostics.stop()
+    return {"success": True, "data": {"tracing": memory_diagnostics.tracing}}
+
+@router.get("/memory/snapshots")
+async def list_memory_snapshots():
+    """已保存的快照"""
+    return {"success": True, "data": {"tracing": memory_diagnostics.tracing, "snapshots": memory_diagnostics.list_snapshots()}}
+
+@router.post("/memory/snapshots")
+async def take_memory_snapshot(snapshot_request: SnapshotRequest):
+    """保存命名快照"""
+    try:
+        info = await asyncio.get_running_loop().run_in_executor(
+            None, memory_diagnostics.take_snapshot, snapshot_request.name
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"success": True, "data": info}
+
+@router.get("/memory/snapshots/{name}")
+async def get_memory_snapshot_top(
+    name: str,
+    group_by: MemoryGroupBy = Query(MemoryGroupBy.LINENO),
+    limit: int = Query(20, ge=1, le=500)
+):
+    """快照中占用最多的分配位置"""
+    try:
+        return {"success": True, "data": memory_diagnostics.top(name, group_by.value, limit)}
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot not found")
+
+@router.get("/memory/diff")
+async def diff_memory_snapshots(
+    base: str = Query(..., description="基准快照名"),
+    target: Optional[str] = Query(None, description="目标快照名，为空时与当前状态比较"),
+    group_by: MemoryGroupBy = Query(MemoryGroupBy.LINENO),
+    limit: int = Query(20, ge=1, le=500)
+):
+    """两个快照之间增长最多的分配位置"""
+    try:
+        stats = await asyncio.get_running_loop().run_in_executor(
+            None, memory_diagnostics.diff, base, target, group_by.value, limit
+        )
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot not found")
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"success": True, "data": stats}
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    sort: SlowQuerySort = Query(SlowQuerySort.TOTAL, description="排序：total_seconds/max_seconds/count"),
+    limit: int = Query(20, ge=1, le=500)
+):
+    """本worker中最慢的语句（按指纹聚合，含EXPLAIN结果）"""
+    return {
+        "success": True,
+        "data": {
+            "threshold_seconds": settings.SLOW_QUERY_THRESHOLD,
+            "queries": slow_query_log.top(sort.value, limit),
+        }
+    }
+
+@router.delete("/slow-queries")
+async def reset_slow_queries():
+    """清空慢查询统计"""
+    slow_query_log.reset()
+    return {"success": True}
+
+@router.get("/config")
+async def get_config():
+    """可在运行时修改的配置：当前值、启动时的值及来源（default/file/redis）"""
+    return {"success": True, "data": dynamic_config.snapshot()}
+
+@router.put("/config")
+async def update_config(overrides: Dict[str, Any]):
+    """修改运行时配置（值为null时删除覆盖），写入Redis key后其他worker在下一次检查时应用"""
+    try:
+        changes, propagated = await dynamic_config.publish(overrides)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {
+        "success": True,
+        "data": {"version": dynamic_config.version, "changes": changes, "propagated": propagated}
+    }
@@ -1,21 +1,73 @@
 from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel, EmailStr
 from typing import Optional
-import random
 import string
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import os
-from datetime import datetime, timedelta
-import hashlib
+import logging
+from datetime import datetime
 
 from ..models.user import UserRepository, CreateUserRequest
+from ..services.redis import get_redis_service, hash_tag
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# 验证码存储（生产环境应使用Redis）
-verification_codes = {}
+# 验证码存储在Redis中（多个worker共享），5分钟过期
+VERIFICATION_CODE_TTL = 300
+VERIFICATION_MAX_ATTEMPTS = 3
+
+# 保存验证码并重置尝试次数
+_STORE_CODE_SCRIPT = """
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], 'code', ARGV[1], 'attempts', 0)
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+# 原子校验验证码：成功时删除；错误时增加尝试次数（ARGV[2]为0时不限次数），超过次数时删除
+_CHECK_CODE_SCRIPT = """
+local code = redis.call('HGET', KEYS[1], 'code')
+if not code then
+    return 'missing'
+end
+local limit = tonumber(ARGV[2])
+local attempts = tonumber(redis.call('HGET', KEYS[1], 'attempts'))
+if limit > 0 and attempts >= limit then
+    redis.call('DEL', KEYS[1])
+    return 'locked'
+end
+if code ~= ARGV[1] then
+    if limit > 0 then
+        attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+    end
+    return 'mismatch:' .. attempts
+end
+redis.call('DEL', KEYS[1])
+return 'ok'
+"""
+
+
+def verification_code_key(email: str) -> str:
+    """验证码key（以邮箱为hash tag，与同一邮箱的其他key位于同一槽位）"""
+    return f"verification:{hash_tag(email)}:code"
+
+
+async def store_verification_code(email: str, code: str) -> bool:
+    redis_service = await get_redis_service()
+    result = await redis_service.eval(_STORE_CODE_SCRIPT, [verification_code_key(email)], [code, VERIFICATION_CODE_TTL])
+    return result is not None
+
+
+async def check_verification_code(email: str, code: str, max_attempts: int) -> str:
+    """返回ok、missing、locked或"mismatch:已尝试次数"；Redis不可用时抛出HTTPException(503)"""
+    redis_service = await get_redis_service()
+    result = await redis_service.eval(_CHECK_CODE_SCRIPT, [verification_code_key(email)], [code, max_attempts])
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="验证服务暂时不可用，请稍后重试"
+        )
+    return result
 
 class SendCodeRequest(BaseModel):
     email: EmailStr
@@ -32,18 +84,21 @@ class ApiResponse(BaseModel):
 
 def generate_verification_code() -> str:
     """生成6位数字验证码"""
+    import random
     return ''.join(random.choices(string.digits, k=6))
 
 def send_email(to_email: str, subject: str, body: str) -> bool:
     """发送邮件（简化版本，生产环境需要更完善的邮件服务）"""
     try:
         # 这里使用模拟邮件发送，实际应用中需要配置SMTP服务器
-        print(f"📧 模拟发送邮件到 {to_email}")
-        print(f"主题: {subject}")
-        print(f"内容: {body}")
-        print("-" * 50)
+        logger.info(f"📧 模拟发送邮件到 {to_email}, 主题: {subject}")
+        logger.debug(f"邮件内容: {body}")
         
-        # 在生产环境中，这里应该是真实的SMTP配置
+        # 在生产环境中，这里应该是真实的SMTP配置（smtplib/email模块按需导入，避免拖慢启动）
+        # import os
+        # import smtplib
+        # from email.mime.text import MIMEText
+        # from email.mime.multipart import MIMEMultipart
         # smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
         # smtp_port = int(os.getenv('SMTP_PORT', '587'))
         # smtp_username = os.getenv('SMTP_USERNAME')
@@ -64,7 +119,7 @@ def send_email(to_email: str, subject: str, body: str) -> bool:
         
         return True
     except Exception as e:
-        print(f"发送邮件失败: {e}")
+        logger.error(f"❌ 发送邮件失败: {e}")
         return False
 
 @router.post("/send-verification-code", response_model=ApiResponse)
@@ -77,11 +132,11 @@ async def send_verification_code(request: SendCodeRequest):
         code = generate_verification_code()
         
         # 存储验证码（5分钟有效期）
-        verification_codes[email] = {
-            'code': code,
-            'expires_at': datetime.now() + timedelta(minutes=5),
-            'attempts': 0
-        }
+        if not await store_verification_code(email, code):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="验证码保存失败，请稍后重试"
+            )
         
         # 邮件内容
         subject = "您的登录验证码"
@@ -131,6 +186,8 @@ async def send_verification_code(request: SendCodeRequest):
                 detail="邮件发送失败，请稍后重试"
             )
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -144,42 +201,28 @@ async def login_with_verification_code(request: VerifyCodeRequest):
         email = request.email
         code = request.verificationCode
         
-        # 检查验证码是否存在
-        if email not in verification_codes:
+        # 校验验证码（过期的验证码已由Redis删除）
+        result = await check_verification_code(email, code, VERIFICATION_MAX_ATTEMPTS)
+        if result == 'missing':
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="验证码不存在或已过期，请重新获取"
             )
         
-        code_data = verification_codes[email]
-        
-        # 检查验证码是否过期
-        if datetime.now() > code_data['expires_at']:
-            del verification_codes[email]
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="验证码已过期，请重新获取"
-            )
-        
         # 检查尝试次数（防暴力破解）
-        if code_data['attempts'] >= 3:
-            del verification_codes[email]
+        if result == 'locked':
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="验证码尝试次数过多，请重新获取"
             )
         
-        # 验证验证码
-        if code != code_data['code']:
-            code_data['attempts'] += 1
+        if result != 'ok':
+            attempts = int(result.split(':')[1])
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"验证码错误，还可尝试 {3 - code_data['attempts']} 次"
+                detail=f"验证码错误，还可尝试 {VERIFICATION_MAX_ATTEMPTS - attempts} 次"
             )
         
-        # 验证成功，清除验证码
-        del verification_codes[email]
-        
         # 检查用户是否存在
         user = await UserRepository.get_user_by_email(email)
         
@@ -193,7 +236,7 @@ async def login_with_verification_code(request: VerifyCodeRequest):
         
         # 生成简单的用户会话信息（实际应用中应该生成JWT token）
         session_data = {
-            'user_id': user.id,
+            'user_id': str(user.id),
             'email': user.email,
             'username': user.username,
             'login_time': datetime.now().isoformat(),
@@ -221,7 +264,10 @@ async def register_with_verification_code(request: dict):
         email = request.get('email')
         code = request.get('verificationCode')
         username = request.get('username')
-        password = request.get('password', 'temp_password_' + str(random.randint(1000, 9999)))
+        password = request.get('password')
+        if password is None:
+            import random
+            password = 'temp_password_' + str(random.randint(1000, 9999))
         
         if not all([email, code, username]):
             raise HTTPException(
@@ -230,33 +276,21 @@ async def register_with_verification_code(request: dict):
             )
         
         # 验证验证码（复用验证逻辑）
-        if email not in verification_codes:
+        result = await check_verification_code(email, code, 0)
+        if result == 'missing':
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="验证码不存在或已过期"
             )
         
-        code_data = verification_codes[email]
-        
-        if datetime.now() > code_data['expires_at']:
-            del verification_codes[email]
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="验证码已过期"
-            )
-        
-        if code != code_data['code']:
+        if result != 'ok':
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="验证码错误"
             )
         
-        # 清除验证码
-        del verification_codes[email]
-        
         # 检查用户是否已存在
-        existing_user = await UserRepository.get_user_by_email(email)
-        if existing_user:
+        if await UserRepository.email_exists(email):
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="该邮箱已被注册"
@@ -0,0 +1,27 @@
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException, status
+
+from ..config.settings import settings
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """校验管理令牌（未配置ADMIN_TOKEN时始终为False）"""
+    if not settings.ADMIN_TOKEN or token is None:
+        return False
+    return secrets.compare_digest(token, settings.ADMIN_TOKEN)
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """管理接口鉴权：请求头X-Admin-Token必须与ADMIN_TOKEN一致"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin API is disabled"
+        )
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin token"
+        )
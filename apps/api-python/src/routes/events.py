@@ -0,0 +1,67 @@
+import asyncio
+import json
+from enum import Enum
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+
+from ..config.settings import settings
+from ..services.event_hub import EventFilter, Subscriber, encode_cursor, event_hub
+from ..services.metrics import metrics
+
+router = APIRouter()
+
+class EventStream(str, Enum):
+    """可订阅的事件类别"""
+    USERS = "users"
+    ORDERS = "orders"
+
+def format_event(subscriber: Subscriber, stream: str, event: dict) -> str:
+    data = {key: value for key, value in event.items() if key != "id"}
+    return f"id: {encode_cursor(subscriber.positions)}\nevent: {event.get('type', stream)}\ndata: {json.dumps(data)}\n\n"
+
+async def event_stream(subscriber: Subscriber) -> AsyncIterator[str]:
+    """SSE输出：事件、空闲时的心跳注释；被判定为慢消费者或订阅中断时结束"""
+    try:
+        yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+        while True:
+            try:
+                item = await asyncio.wait_for(subscriber.queue.get(), settings.SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if item is None or subscriber.closed:
+                return
+            stream, event = item
+            if subscriber.accept(stream, event):
+                metrics.inc("sse_events_sent_total")
+                yield format_event(subscriber, stream, event)
+    finally:
+        event_hub.unsubscribe(subscriber)
+
+@router.get("")
+async def subscribe_events(
+    streams: List[EventStream] = Query([EventStream.USERS, EventStream.ORDERS], description="订阅的事件类别"),
+    user_id: Optional[int] = Query(None, description="只接收该用户的事件"),
+    order_status: Optional[str] = Query(None, alias="status", description="只接收该状态的订单事件"),
+    last_event_id: Optional[str] = Header(None, description="断线重连时由浏览器自动带上，从该位置之后补发")
+):
+    """订阅用户/订单变更事件（Server-Sent Events）"""
+    event_filter = EventFilter([stream.value for stream in streams], user_id=user_id, status=order_status)
+    try:
+        subscriber = await event_hub.subscribe(event_filter, last_event_id)
+    except OverflowError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "5"})
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Event subscription unavailable",
+            headers={"Retry-After": "5"}
+        )
+
+    return StreamingResponse(
+        event_stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,60 @@
+from enum import Enum
+
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+
+from ..services.export import (
+    EXPORT_TABLES,
+    MEDIA_TYPES,
+    ExportFormat,
+    release_export_slot,
+    stream_export,
+    try_acquire_export_slot,
+)
+from ..services.sharding import shard_count
+
+router = APIRouter()
+
+ExportTable = Enum("ExportTable", {name: name for name in EXPORT_TABLES}, type=str)
+
+class ExportResponse(StreamingResponse):
+    """流式导出响应：无论正常结束、出错还是客户端断开都释放导出名额"""
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            release_export_slot()
+
+@router.get("/{table}")
+async def export_table(
+    table: ExportTable,
+    format: ExportFormat = Query(ExportFormat.NDJSON, description="导出格式：csv/ndjson"),
+    gzip: bool = Query(False, description="是否gzip压缩"),
+    after_id: int = Query(0, ge=0, description="断点续传：只导出id大于该值的行"),
+    after_shard: int = Query(0, ge=0, description="断点续传：从该分片继续（after_id作用于该分片，之后的分片完整导出）"),
+    replica: bool = Query(True, description="配置了只读副本时从副本读取")
+):
+    """按分片、主键顺序流式导出整张表（分片部署时每行带shard列）"""
+    if after_shard >= shard_count():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"after_shard must be less than {shard_count()}"
+        )
+    if not try_acquire_export_slot():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many exports in progress",
+            headers={"Retry-After": "30"}
+        )
+
+    filename = f"{table.value}.{format.value}" + (".gz" if gzip else "")
+    return ExportResponse(
+        stream_export(table.value, format, after_id=after_id, gzip=gzip, replica=replica, after_shard=after_shard),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Export-After-Id": str(after_id),
+            "X-Export-After-Shard": str(after_shard),
+        }
+    )
@@ -1,9 +1,12 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 import time
 import os
 from datetime import datetime
 from ..services.database import get_database_service
 from ..services.redis import get_redis_service
+from ..services.circuit_breaker import circuit_breaker_states
+from ..services.startup import startup_report
 from ..config.settings import settings
 
 router = APIRouter()
@@ -46,6 +49,7 @@ async def health_check():
             "database": database_status,
             "redis": redis_status
         },
+        "circuit_breakers": circuit_breaker_states(),
         "config": {
             "db_host": settings.DB_HOST,
             "redis_host": settings.REDIS_HOST,
@@ -53,5 +57,27 @@ async def health_check():
         } if settings.DEBUG else None
     }
 
+@router.get("/ready")
+async def readiness_check():
+    """就绪检查：依赖连接完成前返回503"""
+    report = startup_report.as_dict()
+    return JSONResponse(
+        status_code=200 if startup_report.ready else 503,
+        content={
+            "ready": startup_report.ready,
+            "dependencies": {
+                name: entry.get("status") for name, entry in report["dependencies"].items()
+            }
+        }
+    )
+
+@router.get("/startup")
+async def startup_timing():
+    """启动耗时报告（模块导入、配置加载、依赖初始化）"""
+    return {
+        "success": True,
+        "data": startup_report.as_dict()
+    }
+
 # 保存启动时间
 health_check.start_time = time.time() 
\ No newline at end of file
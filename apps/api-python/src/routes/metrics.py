@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+
+from ..services.metrics import metrics
+
+router = APIRouter()
+
+@router.get("")
+async def get_metrics(format: str = Query("json", pattern="^(json|prometheus)$")):
+    """导出进程内指标"""
+    if format == "prometheus":
+        return PlainTextResponse(metrics.render_prometheus())
+    return {
+        "success": True,
+        "data": metrics.snapshot()
+    }
@@ -0,0 +1,61 @@
+from contextvars import ContextVar
+from typing import Any, Callable, Coroutine, Optional
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+from ..services.metrics import metrics
+from ..services.msgpack_codec import MsgPackResponse, accepts_msgpack, is_msgpack, unpackb
+
+# 当前请求要求MessagePack响应时为路由声明的状态码，否则为None
+_msgpack_status: ContextVar[Optional[int]] = ContextVar("msgpack_status", default=None)
+
+
+class MsgPackRequest(Request):
+    """MessagePack请求体：FastAPI按JSON请求体的流程取request.json()，这里直接返回解码结果（不经过JSON）"""
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = unpackb(await self.body())
+        return self._json
+
+
+class MsgPackRoute(APIRoute):
+    """支持MessagePack的路由
+
+    - Content-Type为application/msgpack的请求体按MessagePack解码，之后的校验与JSON请求体相同
+    - Accept包含application/msgpack时，处理函数通过negotiated()返回MessagePack响应
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            if is_msgpack(request.headers.get("content-type")):
+                # FastAPI只对JSON类型调用request.json()，对它呈现为JSON请求体
+                scope = dict(request.scope)
+                scope["headers"] = [
+                    (name, b"application/json" if name == b"content-type" else value)
+                    for name, value in request.scope["headers"]
+                ]
+                request = MsgPackRequest(scope, request.receive)
+                metrics.inc("msgpack_requests_total", direction="request")
+            if not accepts_msgpack(request.headers.get("accept")):
+                return await handler(request)
+            token = _msgpack_status.set(self.status_code or 200)
+            try:
+                return await handler(request)
+            finally:
+                _msgpack_status.reset(token)
+
+        return route_handler
+
+
+def negotiated(payload: Any) -> Any:
+    """按Accept返回：要求MessagePack时直接编码（datetime保持为Timestamp），否则原样交给FastAPI按JSON序列化"""
+    status_code = _msgpack_status.get()
+    if status_code is None:
+        return payload
+    metrics.inc("msgpack_requests_total", direction="response")
+    return MsgPackResponse(payload.dict() if isinstance(payload, BaseModel) else payload, status_code=status_code)
@@ -1,9 +1,17 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+import asyncio
+import math
 from typing import List
 from pydantic import BaseModel
 from typing import Optional, Any
 
-from ..models.user import User, CreateUserRequest, UpdateUserRequest, UserRepository
+from ..models.user import User, CreateUserRequest, UpdateUserRequest, UserRepository, create_user_loader
+from ..services.dataloader import DataLoader
+from ..services.counters import CountMode, counter_service
+from ..config.settings import settings
+from .negotiation import MsgPackRoute, negotiated
 
 # API响应模型
 class ApiResponse(BaseModel):
@@ -12,18 +20,152 @@ class ApiResponse(BaseModel):
     error: Optional[str] = None
     message: Optional[str] = None
 
-router = APIRouter()
+# 分页模型（与 packages/shared-types 的 Pagination/PaginatedResponse 保持一致）
+class Pagination(BaseModel):
+    page: int
+    limit: int
+    total: Optional[int] = None
+    total_pages: Optional[int] = None
+    count_mode: CountMode = CountMode.EXACT
 
-@router.get("/", response_model=ApiResponse)
-async def get_all_users():
-    """获取所有用户"""
+class PaginatedResponse(BaseModel):
+    success: bool
+    data: Optional[List[Any]] = None
+    error: Optional[str] = None
+    message: Optional[str] = None
+    pagination: Optional[Pagination] = None
+
+class BatchUsersRequest(BaseModel):
+    ids: List[int]
+
+# 内部服务可用MessagePack收发（Accept/Content-Type: application/msgpack）
+router = APIRouter(route_class=MsgPackRoute)
+
+def get_user_loader(request: Request) -> DataLoader:
+    """请求级用户loader（同一请求内共享）"""
+    loader = getattr(request.state, "user_loader", None)
+    if loader is None:
+        loader = create_user_loader()
+        request.state.user_loader = loader
+    return loader
+
+def _parse_ids(raw: str) -> List[int]:
+    try:
+        return [int(part) for part in raw.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be a comma-separated list of integers"
+        )
+
+def _unpaginated(payload: ApiResponse) -> Any:
+    """不分页的响应直接返回，不经response_model=PaginatedResponse转换（保持原有结构，不带pagination字段）"""
+    response = negotiated(payload)
+    if isinstance(response, BaseModel):
+        return JSONResponse(jsonable_encoder(response))
+    return response
+
+async def _batch_response(ids: List[int], loader: DataLoader) -> ApiResponse:
+    """按请求顺序返回批量查询结果，未找到的用户标记found=false"""
+    if len(ids) > settings.USER_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.USER_BATCH_MAX_IDS} ids per request"
+        )
+    users = await loader.load_many(ids)
+    return ApiResponse(
+        success=True,
+        data=[
+            {"id": str(user_id), "found": user is not None, "user": user.dict() if user else None}
+            for user_id, user in zip(ids, users)
+        ],
+        message="Users retrieved successfully"
+    )
+
+@router.post("/batch", response_model=ApiResponse)
+async def get_users_batch(batch_request: BatchUsersRequest, loader: DataLoader = Depends(get_user_loader)):
+    """批量获取用户"""
+    try:
+        return negotiated(await _batch_response(batch_request.ids, loader))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve users: {str(e)}"
+        )
+
+@router.get("/search", response_model=ApiResponse)
+async def search_users(
+    q: str = Query(..., min_length=1, description="搜索前缀（匹配用户名、姓名、邮箱@之前的部分）"),
+    limit: int = Query(settings.SEARCH_DEFAULT_LIMIT, ge=1, description="返回数量"),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor")
+):
+    """按前缀搜索用户"""
     try:
+        result = await UserRepository.search_users(q, min(limit, settings.SEARCH_MAX_LIMIT), cursor)
+        if result is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Search index is unavailable"
+            )
+        users, next_cursor = result
+        return negotiated(ApiResponse(
+            success=True,
+            data={"users": [user.dict() for user in users], "next_cursor": next_cursor},
+            message="Users retrieved successfully"
+        ))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to search users: {str(e)}"
+        )
+
+@router.get("/", response_model=PaginatedResponse)
+async def get_all_users(
+    ids: Optional[str] = Query(None, description="逗号分隔的用户ID，传入时按ID批量查询"),
+    page: Optional[int] = Query(None, ge=1, description="页码，传入page或limit时分页返回"),
+    limit: Optional[int] = Query(None, ge=1, description="每页数量"),
+    count: CountMode = Query(CountMode.EXACT, description="总数计算方式：exact/approximate/none"),
+    loader: DataLoader = Depends(get_user_loader)
+):
+    """获取所有用户（传入ids时批量获取指定用户，传入page/limit时分页）"""
+    try:
+        if ids is not None:
+            return _unpaginated(await _batch_response(_parse_ids(ids), loader))
+        
+        if page is not None or limit is not None:
+            page = page or 1
+            limit = min(limit or 20, settings.USER_PAGE_MAX_LIMIT)
+            users, total = await asyncio.gather(
+                UserRepository.get_users_page((page - 1) * limit, limit),
+                counter_service.count("users", count)
+            )
+            return negotiated(PaginatedResponse(
+                success=True,
+                data=[user.dict() for user in users],
+                message="Users retrieved successfully",
+                pagination=Pagination(
+                    page=page,
+                    limit=limit,
+                    total=total,
+                    total_pages=math.ceil(total / limit) if total is not None else None,
+                    count_mode=count
+                )
+            ))
+        
         users = await UserRepository.get_all_users()
-        return ApiResponse(
+        return _unpaginated(ApiResponse(
             success=True,
             data=[user.dict() for user in users],
             message="Users retrieved successfully"
-        )
+        ))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -42,10 +184,10 @@ async def get_user_by_id(user_id: int):
                 detail="User not found"
             )
         
-        return ApiResponse(
+        return negotiated(ApiResponse(
             success=True,
             data=user.dict()
-        )
+        ))
     except HTTPException:
         raise
     except Exception as e:
@@ -59,8 +201,7 @@ async def create_user(user_request: CreateUserRequest):
     """创建新用户"""
     try:
         # 检查邮箱是否已存在
-        existing_user = await UserRepository.get_user_by_email(user_request.email)
-        if existing_user:
+        if await UserRepository.email_exists(user_request.email):
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="User with this email already exists"
@@ -69,11 +210,11 @@ async def create_user(user_request: CreateUserRequest):
         # 创建新用户
         new_user = await UserRepository.create_user(user_request)
         
-        return ApiResponse(
+        return negotiated(ApiResponse(
             success=True,
             data=new_user.dict(),
             message="User created successfully"
-        )
+        ))
     except HTTPException:
         raise
     except Exception as e:
@@ -94,11 +235,11 @@ async def update_user(user_id: int, user_request: UpdateUserRequest):
                 detail="User not found"
             )
         
-        return ApiResponse(
+        return negotiated(ApiResponse(
             success=True,
             data=updated_user.dict(),
             message="User updated successfully"
-        )
+        ))
     except HTTPException:
         raise
     except Exception as e:
@@ -119,10 +260,10 @@ async def delete_user(user_id: int):
                 detail="User not found"
             )
         
-        return ApiResponse(
+        return negotiated(ApiResponse(
             success=True,
             message="User deleted successfully"
-        )
+        ))
     except HTTPException:
         raise
     except Exception as e:
@@ -0,0 +1,33 @@
+import argparse
+import asyncio
+import logging
+
+from ..services.database import DatabaseService
+from ..services.redis import RedisService
+from ..services.search_index import user_search_index
+
+logger = logging.getLogger(__name__)
+
+
+async def rebuild(chunk_size: int) -> int:
+    """连接MySQL/Redis并重建用户搜索索引"""
+    await asyncio.gather(DatabaseService.initialize(), RedisService.initialize())
+    try:
+        return await user_search_index.rebuild(chunk_size)
+    finally:
+        await DatabaseService.close()
+        await RedisService.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the Redis user search index from MySQL")
+    parser.add_argument("--chunk-size", type=int, default=None, help="每次从MySQL读取的行数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    indexed = asyncio.run(rebuild(args.chunk_size))
+    logger.info(f"✅ Search index rebuilt with {indexed} users")
+
+
+if __name__ == "__main__":
+    main()
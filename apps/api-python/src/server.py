@@ -0,0 +1,146 @@
+import logging
+import multiprocessing
+from typing import Any, Dict, List, Tuple
+
+from gunicorn.app.base import BaseApplication
+from uvicorn.workers import UvicornWorker
+
+from .config.settings import settings
+from .services.sharding import parse_shard
+
+logger = logging.getLogger(__name__)
+
+
+class ProductionUvicornWorker(UvicornWorker):
+    """显式使用uvloop和httptools的uvicorn worker"""
+
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on"}
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        # 在gunicorn强制结束worker之前留出时间执行lifespan关闭（连接池清理）
+        self.config.timeout_graceful_shutdown = max(1, int(self.cfg.graceful_timeout) - 5)
+
+
+class ProductionApplication(BaseApplication):
+    """以代码方式配置的gunicorn应用"""
+
+    def __init__(self, options: Dict[str, Any]):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        # 在worker进程内导入应用（不使用preload，保证每个worker独立的事件循环和连接池）
+        from .main import app
+        return app
+
+
+def resolve_worker_count() -> int:
+    """worker数量，WEB_WORKERS为0时使用CPU核数"""
+    if settings.WEB_WORKERS > 0:
+        return settings.WEB_WORKERS
+    return multiprocessing.cpu_count()
+
+
+# 每个worker打开的连接池（配置项），按所在MySQL服务器分摊max_connections
+POOL_SETTINGS = ("DB_POOL_SIZE", "DB_SHARD_POOL_SIZE", "DB_REPLICA_POOL_SIZE")
+
+
+def pools_by_server() -> Dict[Tuple[str, int], List[str]]:
+    """每个worker的连接池按MySQL服务器分组：主库、同一服务器上的分片、只读副本（同一服务器时也计入）"""
+    servers: Dict[Tuple[str, int], List[str]] = {}
+    servers.setdefault((settings.DB_HOST, settings.DB_PORT), []).append("DB_POOL_SIZE")
+    for entry in settings.DB_SHARDS:
+        host, port, _ = parse_shard(entry)
+        servers.setdefault((host, port), []).append("DB_SHARD_POOL_SIZE")
+    if settings.DB_REPLICA_HOST:
+        replica = (settings.DB_REPLICA_HOST, settings.DB_REPLICA_PORT or settings.DB_PORT)
+        servers.setdefault(replica, []).append("DB_REPLICA_POOL_SIZE")
+    return servers
+
+
+def connection_budget(workers: int) -> int:
+    """每个worker在每台MySQL服务器上可用的连接数"""
+    available = settings.DB_MAX_CONNECTIONS - settings.DB_RESERVED_CONNECTIONS
+    return max(1, available // max(1, workers))
+
+
+def resolve_pool_sizes(workers: int) -> Dict[str, int]:
+    """每个worker各连接池的大小，保证每台服务器上所有worker、所有连接池的连接总数不超过max_connections
+
+    某台服务器上的连接池总和超出预算时按比例缩小这些连接池（每个至少1个连接）。
+    """
+    budget = connection_budget(workers)
+    sizes = {name: getattr(settings, name) for name in POOL_SETTINGS}
+    for pools in pools_by_server().values():
+        demand = sum(sizes[name] for name in pools)
+        if demand > budget:
+            for name in set(pools):
+                sizes[name] = max(1, sizes[name] * budget // demand)
+    return sizes
+
+
+def primary_pool_limit(workers: int, sizes: Dict[str, int]) -> int:
+    """运行时DB_POOL_SIZE的上限：每个worker在主库服务器上的预算减去同一服务器上的其他连接池"""
+    pools = pools_by_server()[(settings.DB_HOST, settings.DB_PORT)]
+    others = sum(sizes[name] for name in pools) - sizes["DB_POOL_SIZE"]
+    return max(1, connection_budget(workers) - others)
+
+
+def build_options(workers: int) -> Dict[str, Any]:
+    """gunicorn配置项"""
+    return {
+        "bind": f"{settings.HOST}:{settings.PORT}",
+        "workers": workers,
+        "worker_class": ProductionUvicornWorker,
+        "backlog": settings.WEB_BACKLOG,
+        "keepalive": settings.WEB_KEEPALIVE,
+        "max_requests": settings.WEB_MAX_REQUESTS,
+        "max_requests_jitter": settings.WEB_MAX_REQUESTS_JITTER,
+        "graceful_timeout": settings.WEB_GRACEFUL_TIMEOUT,
+        "timeout": settings.WEB_TIMEOUT,
+        "worker_tmp_dir": settings.WEB_WORKER_TMP_DIR,
+        "loglevel": settings.LOG_LEVEL.lower(),
+    }
+
+
+def run() -> None:
+    """启动多进程生产服务器"""
+    logging.basicConfig(level=settings.LOG_LEVEL)
+
+    workers = resolve_worker_count()
+    sizes = resolve_pool_sizes(workers)
+    budget = connection_budget(workers)
+    for name, size in sizes.items():
+        if size < getattr(settings, name):
+            logger.warning(
+                f"⚠️ {name}={getattr(settings, name)} x {workers} workers exceeds "
+                f"max_connections={settings.DB_MAX_CONNECTIONS}, capping pool to {size} per worker"
+            )
+        # worker由master进程fork产生，会继承这里调整后的配置
+        setattr(settings, name, size)
+    if workers > 1:
+        # 多个worker不能各自滚动同一个日志文件
+        settings.LOG_FILE_ROTATE = False
+    # 运行时调整的DB_POOL_SIZE写入共享的Redis key，所有worker都会采用，按每个worker的份额校验
+    settings.DB_POOL_SIZE_LIMIT = primary_pool_limit(workers, sizes)
+    for (host, port), pools in pools_by_server().items():
+        per_worker = sum(sizes[name] for name in pools)
+        if per_worker > budget:
+            logger.warning(f"⚠️ {len(pools)} pools on {host}:{port} need at least {per_worker} connections per worker, budget is {budget}")
+        logger.info(f"🗄️ {host}:{port}: {per_worker}/worker, {per_worker * workers}/{settings.DB_MAX_CONNECTIONS} connections")
+    logger.info(
+        f"🚀 Starting {workers} workers on {settings.HOST}:{settings.PORT} "
+        f"(uvloop/httptools, db pool {sizes['DB_POOL_SIZE']}/worker, runtime limit {settings.DB_POOL_SIZE_LIMIT})"
+    )
+
+    ProductionApplication(build_options(workers)).run()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,243 @@
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import Any, Awaitable, Callable, Deque, Dict, Tuple, Type
+import logging
+
+from fastapi import HTTPException, status
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, Enum):
+    """熔断器状态"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+_STATE_VALUES = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+
+
+class CircuitOpenError(HTTPException):
+    """熔断器打开时快速失败（503）"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.breaker_name = name
+        self.retry_after = max(1, int(retry_after + 0.999))
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Service temporarily unavailable: {name} circuit is open",
+            headers={"Retry-After": str(self.retry_after)}
+        )
+
+
+class CircuitBreaker:
+    """基于滑动窗口的熔断器（错误率 + 慢调用率）"""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_rate_threshold: float = 0.5,
+        slow_call_duration: float = 1.0,
+        slow_call_rate_threshold: float = 0.8,
+        window_size: int = 20,
+        minimum_calls: int = 10,
+        open_duration: float = 30.0,
+        half_open_max_calls: int = 3,
+        recorded_exceptions: Tuple[Type[BaseException], ...] = (Exception,),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.open_duration = open_duration
+        self.half_open_max_calls = half_open_max_calls
+        self.recorded_exceptions = recorded_exceptions
+        self._clock = clock
+
+        self._state = CircuitState.CLOSED
+        self._window: Deque[Tuple[bool, bool]] = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._half_open_inflight = 0
+        self._half_open_successes = 0
+        self._publish_state()
+
+    @property
+    def state(self) -> CircuitState:
+        """当前状态（OPEN超时后自动转为HALF_OPEN）"""
+        if self._state == CircuitState.OPEN and self._clock() - self._opened_at >= self.open_duration:
+            self._transition(CircuitState.HALF_OPEN)
+        return self._state
+
+    def _transition(self, new_state: CircuitState) -> None:
+        if new_state == self._state:
+            return
+        old_state = self._state
+        self._state = new_state
+        if new_state == CircuitState.OPEN:
+            self._opened_at = self._clock()
+        elif new_state == CircuitState.HALF_OPEN:
+            self._half_open_inflight = 0
+            self._half_open_successes = 0
+        else:
+            self._window.clear()
+
+        log = logger.warning if new_state == CircuitState.OPEN else logger.info
+        log(f"⚡ Circuit breaker '{self.name}' {old_state.value} -> {new_state.value}")
+        metrics.inc("circuit_breaker_transitions_total", breaker=self.name, to=new_state.value)
+        self._publish_state()
+
+    def _publish_state(self) -> None:
+        metrics.set_gauge("circuit_breaker_state", _STATE_VALUES[self._state], breaker=self.name)
+
+    def allow_request(self) -> None:
+        """检查是否允许调用，不允许时抛出CircuitOpenError"""
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return
+        if state == CircuitState.HALF_OPEN and self._half_open_inflight < self.half_open_max_calls:
+            self._half_open_inflight += 1
+            return
+
+        metrics.inc("circuit_breaker_rejected_total", breaker=self.name)
+        retry_after = self.open_duration - (self._clock() - self._opened_at)
+        raise CircuitOpenError(self.name, retry_after if state == CircuitState.OPEN else 1)
+
+    def record_success(self, duration: float) -> None:
+        """记录一次成功调用（耗时超过阈值按慢调用计）"""
+        slow = duration >= self.slow_call_duration
+        if self._state == CircuitState.HALF_OPEN:
+            self._half_open_inflight = max(0, self._half_open_inflight - 1)
+            if slow:
+                self._transition(CircuitState.OPEN)
+                return
+            self._half_open_successes += 1
+            if self._half_open_successes >= self.half_open_max_calls:
+                self._transition(CircuitState.CLOSED)
+            return
+        self._record(failed=False, slow=slow)
+
+    def record_failure(self, duration: float) -> None:
+        """记录一次失败调用"""
+        if self._state == CircuitState.HALF_OPEN:
+            self._half_open_inflight = max(0, self._half_open_inflight - 1)
+            self._transition(CircuitState.OPEN)
+            return
+        self._record(failed=True, slow=duration >= self.slow_call_duration)
+
+    def _release(self) -> None:
+        """调用被取消时释放半开状态的试探名额"""
+        if self._state == CircuitState.HALF_OPEN:
+            self._half_open_inflight = max(0, self._half_open_inflight - 1)
+
+    def _record(self, failed: bool, slow: bool) -> None:
+        if self._state != CircuitState.CLOSED:
+            return
+        self._window.append((failed, slow))
+        total = len(self._window)
+        if total < self.minimum_calls:
+            return
+        failure_rate = sum(1 for f, _ in self._window if f) / total
+        slow_rate = sum(1 for _, s in self._window if s) / total
+        if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+            self._transition(CircuitState.OPEN)
+
+    @asynccontextmanager
+    async def guard(self):
+        """以上下文管理器的方式保护一段调用"""
+        self.allow_request()
+        started = self._clock()
+        try:
+            yield
+        except self.recorded_exceptions:
+            self.record_failure(self._clock() - started)
+            raise
+        except BaseException:
+            # 业务异常或取消不计入依赖故障
+            self._release()
+            raise
+        else:
+            self.record_success(self._clock() - started)
+
+    @asynccontextmanager
+    async def guard_checkout(self):
+        """保护从连接池取出并使用连接的整个过程，yield的函数在取到连接后调用
+
+        使用期间抛出的recorded_exceptions同样计为失败；只有取连接的耗时参与慢调用判断，
+        长时间持有连接（后台任务、流式导出）不算慢调用。
+        """
+        self.allow_request()
+        started = self._clock()
+        checked_out = None
+
+        def acquired() -> None:
+            nonlocal checked_out
+            checked_out = self._clock()
+
+        try:
+            yield acquired
+        except self.recorded_exceptions:
+            self.record_failure((checked_out or self._clock()) - started)
+            raise
+        except BaseException:
+            self._release()
+            raise
+        else:
+            self.record_success((checked_out or self._clock()) - started)
+
+    async def call(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """通过熔断器执行协程函数"""
+        async with self.guard():
+            return await fn(*args, **kwargs)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """熔断器状态快照（用于健康检查）"""
+        state = self.state
+        total = len(self._window)
+        return {
+            "state": state.value,
+            "window_calls": total,
+            "failure_rate": round(sum(1 for f, _ in self._window if f) / total, 3) if total else 0.0,
+            "slow_call_rate": round(sum(1 for _, s in self._window if s) / total, 3) if total else 0.0,
+            "retry_after": max(0.0, round(self.open_duration - (self._clock() - self._opened_at), 1))
+            if state == CircuitState.OPEN else None,
+        }
+
+
+# 全局熔断器注册表
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(name: str, **options) -> CircuitBreaker:
+    """获取（或创建）指定名称的熔断器"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = CircuitBreaker(name, **options)
+        _breakers[name] = breaker
+    return breaker
+
+
+def breaker_options(config) -> Dict[str, Any]:
+    """从配置对象读取熔断器参数"""
+    return {
+        "failure_rate_threshold": config.CIRCUIT_BREAKER_FAILURE_RATE,
+        "slow_call_duration": config.CIRCUIT_BREAKER_SLOW_CALL_SECONDS,
+        "slow_call_rate_threshold": config.CIRCUIT_BREAKER_SLOW_CALL_RATE,
+        "window_size": config.CIRCUIT_BREAKER_WINDOW_SIZE,
+        "minimum_calls": config.CIRCUIT_BREAKER_MINIMUM_CALLS,
+        "open_duration": config.CIRCUIT_BREAKER_OPEN_SECONDS,
+        "half_open_max_calls": config.CIRCUIT_BREAKER_HALF_OPEN_CALLS,
+    }
+
+
+def circuit_breaker_states() -> Dict[str, Dict[str, Any]]:
+    """所有熔断器的状态"""
+    return {name: breaker.snapshot() for name, breaker in _breakers.items()}
+
@@ -0,0 +1,151 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import List, Tuple
+import logging
+
+from ..config.settings import settings
+from .metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+# 请求优先级（数值越小越重要）：健康检查等不受限制，已认证的写请求最后被拒绝
+PRIORITY_CRITICAL = 0
+PRIORITY_WRITE = 1
+PRIORITY_NORMAL = 2
+
+PRIORITY_NAMES = {PRIORITY_CRITICAL: "critical", PRIORITY_WRITE: "write", PRIORITY_NORMAL: "normal"}
+
+
+class LimiterRejected(Exception):
+    """请求被拒绝（reason为queue_full/queue_timeout/evicted）"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdaptiveConcurrencyLimiter:
+    """自适应并发限制（AIMD，每个worker独立）
+
+    以首字节耗时为拥塞信号：不超过CONCURRENCY_LATENCY_TARGET时加性增加（每约limit个请求+1），
+    超过时乘性减少（每个目标耗时窗口最多减少一次）。超出限制的请求按优先级排队，
+    队列满时新来的高优先级请求挤掉队尾最低优先级的请求。
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_target: float,
+                 backoff: float, queue_size: int):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.queue_size = queue_size
+        self.inflight = 0
+        self._last_decrease = 0.0
+        # 等待队列：(优先级, 序号, future)，取消的项懒删除
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    @classmethod
+    def from_settings(cls) -> "AdaptiveConcurrencyLimiter":
+        return cls(
+            initial=settings.CONCURRENCY_INITIAL_LIMIT,
+            minimum=settings.CONCURRENCY_MIN_LIMIT,
+            maximum=settings.CONCURRENCY_MAX_LIMIT,
+            latency_target=settings.CONCURRENCY_LATENCY_TARGET,
+            backoff=settings.CONCURRENCY_BACKOFF,
+            queue_size=settings.CONCURRENCY_QUEUE_SIZE,
+        )
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, waiter in self._waiters if not waiter.done())
+
+    def _has_capacity(self) -> bool:
+        return self.inflight < int(self.limit)
+
+    async def acquire(self, priority: int, timeout: float) -> None:
+        """获取执行名额，排队超时或被挤出时抛出LimiterRejected"""
+        if self._has_capacity() and not self.queued:
+            self.inflight += 1
+            return
+
+        if self.queued >= self.queue_size:
+            self._evict_lowest(priority)
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        self._wake()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+                raise LimiterRejected("queue_timeout")
+        except asyncio.CancelledError:
+            # 已分配名额但请求被取消时归还名额
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            metrics.observe("concurrency_queue_wait_seconds", time.perf_counter() - started)
+        if not waiter.result():
+            raise LimiterRejected("evicted")
+
+    def _evict_lowest(self, priority: int) -> None:
+        """队列已满：挤出优先级更低的最后一个等待者，否则拒绝新请求"""
+        pending = [entry for entry in self._waiters if not entry[2].done()]
+        victim = max(pending, key=lambda entry: (entry[0], entry[1]), default=None)
+        if victim is None or victim[0] <= priority:
+            raise LimiterRejected("queue_full")
+        victim[2].set_result(False)
+
+    def release(self) -> None:
+        """归还名额并按优先级唤醒等待者"""
+        self.inflight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self._has_capacity():
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                self.inflight += 1
+                waiter.set_result(True)
+
+    def record_latency(self, latency: float) -> None:
+        """根据一次请求的首字节耗时调整限制"""
+        if latency > self.latency_target:
+            now = time.monotonic()
+            # 同一拥塞窗口内的多个慢请求只减少一次，避免限制瞬间跌到最小值
+            if now - self._last_decrease >= self.latency_target:
+                self._last_decrease = now
+                self.limit = max(float(self.minimum), self.limit * self.backoff)
+                metrics.inc("concurrency_limit_decreases_total")
+        elif self.inflight * 2 >= self.limit:
+            # 只有在实际用到限制的一半以上时才增加，空闲时限制不会无限增长
+            self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+        self._wake()
+
+    def reconfigure(self) -> None:
+        """从settings重新读取参数（运行时调整），当前限制收敛到新的上下限内"""
+        self.minimum = settings.CONCURRENCY_MIN_LIMIT
+        self.maximum = settings.CONCURRENCY_MAX_LIMIT
+        self.latency_target = settings.CONCURRENCY_LATENCY_TARGET
+        self.queue_size = settings.CONCURRENCY_QUEUE_SIZE
+        self.limit = min(float(self.maximum), max(float(self.minimum), self.limit))
+        self._wake()
+
+
+def collect_limiter_metrics(registry: MetricsRegistry) -> None:
+    limiter = concurrency_limiter
+    registry.set_gauge("concurrency_limit", int(limiter.limit))
+    registry.set_gauge("concurrency_inflight", limiter.inflight)
+    registry.set_gauge("concurrency_queued", limiter.queued)
+
+
+# 全局并发限制实例
+concurrency_limiter = AdaptiveConcurrencyLimiter.from_settings()
@@ -0,0 +1,192 @@
+import asyncio
+import time
+from enum import Enum
+from typing import Dict, Optional, Tuple
+import logging
+
+import aiomysql
+
+from ..config.settings import settings
+from .database import get_database_service
+from .metrics import metrics
+from .redis import RedisService, get_redis_service
+
+logger = logging.getLogger(__name__)
+
+
+class CountMode(str, Enum):
+    """分页总数的计算方式"""
+    EXACT = "exact"              # Redis维护的精确计数
+    APPROXIMATE = "approximate"  # information_schema估算值
+    NONE = "none"                # 不返回总数
+
+
+# 被计数的表及其计数条件
+COUNTED_TABLES: Dict[str, str] = {
+    "users": "SELECT COUNT(*) FROM users WHERE deleted_at IS NULL",
+    "products": "SELECT COUNT(*) FROM products",
+}
+# 按用户分片存储的表，计数为所有分片之和
+SHARDED_TABLES = {"users"}
+# 需要按分类维护计数的表
+CATEGORY_COUNTS: Dict[str, str] = {
+    "products": "SELECT category, COUNT(*) FROM products GROUP BY category",
+}
+
+RECONCILE_LOCK_KEY = "count:reconcile:lock"
+
+
+def counter_key(table: str, category: Optional[str] = None) -> str:
+    """计数器key"""
+    if category is None:
+        return f"count:{table}"
+    return f"count:{table}:category:{category}"
+
+
+class CounterService:
+    """表行数计数：写路径增减Redis计数器，后台定期与MySQL对账"""
+
+    def __init__(self):
+        self._approximate_cache: Dict[str, Tuple[float, int]] = {}
+
+    @staticmethod
+    async def _get_redis() -> Optional[RedisService]:
+        try:
+            return await get_redis_service()
+        except Exception as e:
+            logger.warning(f"⚠️ Counter storage unavailable: {e}")
+            return None
+
+    async def adjust(self, table: str, delta: int, category: Optional[str] = None) -> None:
+        """写入/删除后增减计数（计数器尚未初始化时跳过，等待对账）"""
+        redis_service = await self._get_redis()
+        if redis_service is None:
+            return
+        await redis_service.incr_if_exists(counter_key(table), delta)
+        if category is not None:
+            await redis_service.incr_if_exists(counter_key(table, category), delta)
+
+    async def count(self, table: str, mode: CountMode, category: Optional[str] = None) -> Optional[int]:
+        """按指定方式获取总数"""
+        if mode == CountMode.NONE:
+            return None
+        if mode == CountMode.APPROXIMATE and category is None:
+            return await self.get_approximate(table)
+        # information_schema没有按分类的估算，分类计数使用精确计数器
+        return await self.get_exact(table, category)
+
+    async def get_exact(self, table: str, category: Optional[str] = None) -> int:
+        """精确计数：优先读Redis计数器，未初始化时COUNT(*)并写入"""
+        key = counter_key(table, category)
+        redis_service = await self._get_redis()
+        if redis_service is not None:
+            value = await redis_service.get(key)
+            if value is not None:
+                metrics.inc("counter_reads_total", table=table, source="redis")
+                return int(value)
+
+        metrics.inc("counter_reads_total", table=table, source="mysql")
+        total = await self._count_from_database(table, category)
+        if redis_service is not None:
+            await redis_service.set(key, total)
+        return total
+
+    async def get_approximate(self, table: str) -> int:
+        """估算计数：InnoDB统计信息中的TABLE_ROWS（进程内缓存）"""
+        cached = self._approximate_cache.get(table)
+        now = time.monotonic()
+        if cached is not None and now - cached[0] < settings.COUNTER_APPROXIMATE_TTL:
+            return cached[1]
+
+        db_service = await get_database_service()
+        estimate = 0
+        for shard in self._shards(db_service, table):
+            async with db_service.get_connection(shard) as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        """
+                        SELECT TABLE_ROWS FROM information_schema.TABLES
+                        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+                        """,
+                        (table,)
+                    )
+                    row = await cursor.fetchone()
+            estimate += int(row[0] or 0) if row else 0
+        self._approximate_cache[table] = (now, estimate)
+        metrics.inc("counter_reads_total", table=table, source="information_schema")
+        return estimate
+
+    async def _count_from_database(self, table: str, category: Optional[str] = None) -> int:
+        if table not in COUNTED_TABLES:
+            raise ValueError(f"Table {table} is not counted")
+        query = COUNTED_TABLES[table]
+        args: tuple = ()
+        if category is not None:
+            if table not in CATEGORY_COUNTS:
+                raise ValueError(f"Table {table} has no category counts")
+            query = f"{query} WHERE category = %s"
+            args = (category,)
+
+        db_service = await get_database_service()
+        total = 0
+        for shard in self._shards(db_service, table):
+            async with db_service.get_connection(shard) as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(query, args)
+                    row = await cursor.fetchone()
+            total += int(row[0])
+        return total
+
+    @staticmethod
+    def _shards(db_service, table: str) -> range:
+        return range(db_service.shard_count if table in SHARDED_TABLES else 1)
+
+    async def reconcile(self) -> Dict[str, int]:
+        """与MySQL对账：重新COUNT并覆盖Redis计数器
+
+        COUNT与写回之间发生的写入可能造成短暂偏差，下一轮对账时修正。
+        """
+        redis_service = await self._get_redis()
+        if redis_service is None:
+            return {}
+
+        counts: Dict[str, int] = {}
+        for table in COUNTED_TABLES:
+            counts[counter_key(table)] = await self._count_from_database(table)
+
+        db_service = await get_database_service()
+        for table, query in CATEGORY_COUNTS.items():
+            async with db_service.get_connection() as conn:
+                async with conn.cursor(aiomysql.Cursor) as cursor:
+                    await cursor.execute(query)
+                    rows = await cursor.fetchall()
+            for category, total in rows:
+                if category is not None:
+                    counts[counter_key(table, category)] = int(total)
+
+        await redis_service.mset(counts)
+        for key, total in counts.items():
+            metrics.set_gauge("counter_value", total, key=key)
+        metrics.inc("counter_reconciliations_total")
+        return counts
+
+    async def run_reconciler(self) -> None:
+        """后台定期对账（多worker之间通过Redis锁保证每个周期只执行一次）"""
+        interval = settings.COUNTER_RECONCILE_INTERVAL
+        while True:
+            try:
+                redis_service = await self._get_redis()
+                if redis_service is not None and await redis_service.set_if_absent(
+                    RECONCILE_LOCK_KEY, "1", ttl=max(1, interval - 1)
+                ):
+                    counts = await self.reconcile()
+                    logger.info(f"🔢 Counters reconciled: {counts}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Counter reconciliation failed: {e}")
+            await asyncio.sleep(interval)
+
+
+# 全局计数服务实例
+counter_service = CounterService()
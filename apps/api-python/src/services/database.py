@@ -1,15 +1,50 @@
 import aiomysql
+import asyncio
 import os
-from typing import Optional
+from typing import List, Optional, Set
 import logging
 from contextlib import asynccontextmanager
 from ..config.settings import settings
+from .circuit_breaker import CircuitBreaker, breaker_options, get_circuit_breaker
+from .db_instrumentation import instrument_connection
+from .deadline import wait_with_budget
+from .worker_id import worker_id_lease
+from .metrics import metrics
+from .sharding import parse_shard
+from .tracing import span
 
 logger = logging.getLogger(__name__)
 
+# 计入熔断统计的异常：连接/超时类故障，业务错误（如唯一键冲突）不计入
+DB_FAILURE_EXCEPTIONS = (
+    aiomysql.OperationalError,
+    aiomysql.InterfaceError,
+    asyncio.TimeoutError,
+    ConnectionError,
+    OSError,
+)
+
+@asynccontextmanager
+async def _unguarded():
+    """未启用熔断器时代替CircuitBreaker.guard_checkout"""
+    yield lambda: None
+
+# 请求被取消时连接可能仍在执行语句，这些异常退出时终止服务端语句并关闭连接
+ABANDON_EXCEPTIONS = (asyncio.CancelledError, asyncio.TimeoutError)
+
 class DatabaseService:
     _instance: Optional['DatabaseService'] = None
     _pool: Optional[aiomysql.Pool] = None
+    _replica_pool: Optional[aiomysql.Pool] = None
+    # 用户分片连接池（分片1..N，分片0使用主库连接池）
+    _shard_pools: List[aiomysql.Pool] = []
+    _init_lock: Optional[asyncio.Lock] = None
+    _kill_tasks: Set[asyncio.Task] = set()
+    # 运行时调整大小后仍在等待在用连接归还的旧主库连接池
+    _retired_pools: Set[aiomysql.Pool] = set()
+    _drain_cond: Optional[asyncio.Condition] = None
+    # 排空期间已通过检查、正在从新连接池获取连接的请求数
+    _drain_reserved: int = 0
     
     def __new__(cls):
         if cls._instance is None:
@@ -20,43 +55,320 @@ class DatabaseService:
     async def initialize(cls) -> 'DatabaseService':
         """初始化数据库连接池"""
         instance = cls()
-        if cls._pool is None:
+        if cls._pool is not None:
+            return instance
+        if cls._init_lock is None:
+            cls._init_lock = asyncio.Lock()
+        # 后台连接与请求触发的初始化可能并发，只创建一个连接池
+        async with cls._init_lock:
+            if cls._pool is not None:
+                return instance
+            # 先租用雪花ID的worker id：租不到时初始化失败（启动失败，或后台连接时重试），不会带着重复的id提供服务
+            await worker_id_lease.acquire()
             try:
-                cls._pool = await aiomysql.create_pool(
-                    host=settings.DB_HOST,
-                    port=settings.DB_PORT,
-                    user=settings.DB_USERNAME,
-                    password=settings.DB_PASSWORD,
-                    db=settings.DB_DATABASE,
-                    charset=settings.DB_CHARSET,
-                    autocommit=True,
-                    minsize=1,
-                    maxsize=settings.DB_POOL_SIZE,
-                )
-                logger.info(f"✅ Database connection pool created successfully (Environment: {settings.ENVIRONMENT})")
+                cls._pool = await cls._create_primary_pool()
+                metrics.set_gauge("db_pool_max_size", settings.DB_POOL_SIZE)
+                logger.info(f"✅ Database connection pool created successfully (Environment: {settings.ENVIRONMENT}, pool size: {settings.DB_POOL_SIZE})")
                 logger.debug(f"🔍 Database config: {settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_DATABASE}")
             except Exception as e:
                 logger.error(f"❌ Database connection failed: {e}")
                 raise e
+            await cls._load_legacy_id_max()
+            if settings.DB_REPLICA_HOST:
+                await cls._initialize_replica()
+            if settings.DB_SHARDS and not cls._shard_pools:
+                await cls._initialize_shards()
         return instance
     
+    @staticmethod
+    async def _create_primary_pool(minsize: int = 1) -> aiomysql.Pool:
+        return await aiomysql.create_pool(
+            host=settings.DB_HOST,
+            port=settings.DB_PORT,
+            user=settings.DB_USERNAME,
+            password=settings.DB_PASSWORD,
+            db=settings.DB_DATABASE,
+            charset=settings.DB_CHARSET,
+            autocommit=True,
+            minsize=minsize,
+            maxsize=settings.DB_POOL_SIZE,
+        )
+    
+    @classmethod
+    async def _load_legacy_id_max(cls) -> None:
+        """读取迁移到雪花ID时记录的最大自增ID（见database/init/04-snowflake-ids.sql），不超过它的ID按分片0路由"""
+        try:
+            async with cls._pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute("SELECT max_id FROM snowflake_legacy_ids WHERE table_name = 'users'")
+                    row = await cursor.fetchone()
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to load legacy id cutoff, using SNOWFLAKE_LEGACY_MAX_ID={settings.SNOWFLAKE_LEGACY_MAX_ID}: {e}")
+            return
+        if row is not None:
+            settings.SNOWFLAKE_LEGACY_MAX_ID = row[0]
+            logger.info(f"🆔 User ids up to {row[0]} are legacy AUTO_INCREMENT ids on shard 0")
+    
+    @classmethod
+    async def resize_pool(cls) -> None:
+        """按DB_POOL_SIZE替换主库连接池（运行时调整）
+        
+        aiomysql连接池不能修改大小，这里先创建新连接池再替换，新请求立即使用新连接池；
+        旧连接池在后台等待在用连接归还后关闭，超过DB_POOL_DRAIN_TIMEOUT时强制关闭。
+        旧连接池排空期间，新连接池只在两者的连接总数低于DB_POOL_SIZE时打开新连接（见_acquire_primary）。
+        """
+        old = cls._pool
+        if old is None or old.maxsize == settings.DB_POOL_SIZE:
+            return
+        if cls._drain_cond is None:
+            cls._drain_cond = asyncio.Condition()
+        # 新连接池不预先打开连接，旧连接池的空闲连接立即关闭
+        cls._pool = await cls._create_primary_pool(minsize=0)
+        old.close()
+        cls._retired_pools.add(old)
+        metrics.set_gauge("db_pool_max_size", settings.DB_POOL_SIZE)
+        metrics.inc("db_pool_resizes_total")
+        logger.info(f"🔁 Database pool resized {old.maxsize} -> {settings.DB_POOL_SIZE}, draining {old.size - old.freesize} in-use connections")
+        task = asyncio.get_running_loop().create_task(cls._drain_pool(old))
+        cls._kill_tasks.add(task)
+        task.add_done_callback(cls._kill_tasks.discard)
+    
+    @classmethod
+    async def _drain_pool(cls, pool: aiomysql.Pool) -> None:
+        try:
+            await asyncio.wait_for(pool.wait_closed(), settings.DB_POOL_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Retired database pool still had {pool.size - pool.freesize} connections in use, terminating")
+            pool.terminate()
+        finally:
+            cls._retired_pools.discard(pool)
+            await cls._notify_drained()
+    
+    @classmethod
+    async def _notify_drained(cls) -> None:
+        """主库连接被归还或旧连接池关闭了连接，唤醒排空期间等待主库连接的请求"""
+        if cls._drain_cond is not None:
+            async with cls._drain_cond:
+                cls._drain_cond.notify_all()
+    
+    @classmethod
+    def _retired_connections(cls) -> int:
+        return sum(pool.size for pool in cls._retired_pools)
+    
+    @classmethod
+    async def _acquire_primary(cls, pool: aiomysql.Pool):
+        """从主库连接池获取连接；旧连接池排空期间保证新旧连接池的连接总数不超过DB_POOL_SIZE
+        
+        只在锁内检查并预留名额，获取连接（可能需要建立新连接）在锁外进行，不同请求互不阻塞。
+        """
+        if not cls._retired_pools:
+            return await pool.acquire()
+        async with cls._drain_cond:
+            await cls._drain_cond.wait_for(
+                lambda: not cls._retired_pools
+                or pool.freesize > cls._drain_reserved
+                or pool.size + cls._drain_reserved + cls._retired_connections() < settings.DB_POOL_SIZE
+            )
+            cls._drain_reserved += 1
+        try:
+            return await pool.acquire()
+        finally:
+            cls._drain_reserved -= 1
+            await cls._notify_drained()
+    
+    @classmethod
+    async def _initialize_shards(cls) -> None:
+        """创建用户分片连接池（任一分片不可用时初始化失败，后台连接会重试）"""
+        pools = []
+        try:
+            for entry in settings.DB_SHARDS:
+                host, port, database = parse_shard(entry)
+                pools.append(await aiomysql.create_pool(
+                    host=host,
+                    port=port,
+                    user=settings.DB_USERNAME,
+                    password=settings.DB_PASSWORD,
+                    db=database,
+                    charset=settings.DB_CHARSET,
+                    autocommit=True,
+                    minsize=1,
+                    maxsize=settings.DB_SHARD_POOL_SIZE,
+                ))
+        except Exception as e:
+            for pool in pools:
+                pool.close()
+            logger.error(f"❌ Shard connection failed: {e}")
+            raise
+        cls._shard_pools = pools
+        logger.info(f"✅ {len(pools)} additional user shard pools created ({', '.join(settings.DB_SHARDS)})")
+    
+    @classmethod
+    async def _initialize_replica(cls) -> None:
+        """创建只读副本连接池（失败时只记录日志，读请求回退到主库）"""
+        try:
+            cls._replica_pool = await aiomysql.create_pool(
+                host=settings.DB_REPLICA_HOST,
+                port=settings.DB_REPLICA_PORT or settings.DB_PORT,
+                user=settings.DB_USERNAME,
+                password=settings.DB_PASSWORD,
+                db=settings.DB_DATABASE,
+                charset=settings.DB_CHARSET,
+                autocommit=True,
+                minsize=0,
+                maxsize=settings.DB_REPLICA_POOL_SIZE,
+            )
+            logger.info(f"✅ Replica connection pool created ({settings.DB_REPLICA_HOST}, pool size: {settings.DB_REPLICA_POOL_SIZE})")
+        except Exception as e:
+            logger.warning(f"⚠️ Replica connection failed, falling back to primary: {e}")
+    
     @classmethod
     async def close(cls):
         """关闭数据库连接池"""
+        for pool in cls._shard_pools:
+            pool.close()
+            await pool.wait_closed()
+        cls._shard_pools = []
+        if cls._replica_pool:
+            cls._replica_pool.close()
+            await cls._replica_pool.wait_closed()
+            cls._replica_pool = None
         if cls._pool:
             cls._pool.close()
             await cls._pool.wait_closed()
             cls._pool = None
             logger.info("✅ Database connection pool closed")
+        worker_id_lease.release()
     
-    @asynccontextmanager
-    async def get_connection(self):
-        """获取数据库连接"""
+    @staticmethod
+    def get_breaker(shard: int = 0) -> Optional[CircuitBreaker]:
+        """MySQL熔断器（每个分片独立，未启用时返回None）"""
+        if not settings.CIRCUIT_BREAKER_ENABLED:
+            return None
+        return get_circuit_breaker(
+            "mysql" if shard == 0 else f"mysql_shard_{shard}",
+            recorded_exceptions=DB_FAILURE_EXCEPTIONS,
+            **breaker_options(settings)
+        )
+    
+    @classmethod
+    async def _kill_query(cls, host: str, port: int, thread_id: int) -> None:
+        """用独立连接终止服务端仍在执行的语句（连接池可能已满，不从池中取连接）"""
+        try:
+            conn = await asyncio.wait_for(aiomysql.connect(
+                host=host,
+                port=port,
+                user=settings.DB_USERNAME,
+                password=settings.DB_PASSWORD,
+                charset=settings.DB_CHARSET,
+                autocommit=True,
+            ), settings.DB_ACQUIRE_TIMEOUT)
+            try:
+                async with conn.cursor() as cursor:
+                    await cursor.execute("KILL QUERY %s", (thread_id,))
+            finally:
+                conn.close()
+            metrics.inc("db_queries_killed_total")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to kill query on connection {thread_id}: {e}")
+    
+    @classmethod
+    def _abandon(cls, conn) -> None:
+        """放弃被取消请求的连接：后台终止服务端语句，关闭连接（读到一半的结果无法复用）"""
+        if conn.closed:
+            return
+        thread_id = conn.thread_id()
+        conn.close()
+        task = asyncio.get_running_loop().create_task(cls._kill_query(conn.host, conn.port, thread_id))
+        cls._kill_tasks.add(task)
+        task.add_done_callback(cls._kill_tasks.discard)
+    
+    @property
+    def shard_count(self) -> int:
+        return 1 + len(self._shard_pools)
+    
+    def _pool_for(self, shard: int) -> aiomysql.Pool:
         if self._pool is None:
             raise RuntimeError("Database pool not initialized")
+        if shard == 0:
+            return self._pool
+        if not 0 < shard <= len(self._shard_pools):
+            raise RuntimeError(f"Shard {shard} is not configured")
+        return self._shard_pools[shard - 1]
+    
+    @asynccontextmanager
+    async def get_connection(self, shard: int = 0):
+        """获取数据库连接（shard为用户分片，0为主库；获取等待受请求截止时间限制，请求取消时终止执行中的语句）
+        
+        熔断器记录取连接和使用连接期间的连接/超时类故障，但只按取连接的耗时判断慢调用：
+        清理、索引重建、outbox等后台任务长时间持有连接，不应计为慢调用。
+        """
+        pool = self._pool_for(shard)
         
-        async with self._pool.acquire() as conn:
-            yield conn
+        breaker = self.get_breaker(shard)
+        timeout = None if breaker is None else settings.DB_ACQUIRE_TIMEOUT
+        # 熔断打开时直接抛出CircuitOpenError（503），不再排队等待连接
+        async with (_unguarded() if breaker is None else breaker.guard_checkout()) as acquired:
+            with span("mysql acquire", kind="client", **{"db.system": "mysql", "db.shard": shard}):
+                conn = await wait_with_budget(
+                    self._acquire_primary(pool) if shard == 0 else pool.acquire(), timeout
+                )
+            acquired()
+            try:
+                yield instrument_connection(conn)
+            except ABANDON_EXCEPTIONS:
+                self._abandon(conn)
+                raise
+            finally:
+                await pool.release(conn)
+                if self._retired_pools:
+                    await self._notify_drained()
+    
+    @asynccontextmanager
+    async def transaction(self, shard: int = 0):
+        """在事务中执行（连接池中的连接默认autocommit），正常退出时提交，异常时回滚
+        
+        取消时不回滚：连接会被关闭，服务端自动回滚未提交的事务。
+        """
+        async with self.get_connection(shard) as conn:
+            await conn.begin()
+            try:
+                yield conn
+            except Exception:
+                await conn.rollback()
+                raise
+            await conn.commit()
+    
+    @asynccontextmanager
+    async def stream_connection(self, replica: bool = False, shard: int = 0):
+        """获取用于长时间流式读取的连接
+        
+        熔断器只按取连接的耗时判断慢调用（持续数分钟的读取不应计为慢调用），读取中的连接故障计为失败；replica为True且配置了
+        只读副本时分片0使用副本连接池（其他分片没有副本）。异常或取消退出时直接关闭连接，服务端游标中未读完的结果无需排空。
+        """
+        pool = self._pool_for(shard)
+        if replica and shard == 0 and self._replica_pool is not None:
+            pool = self._replica_pool
+        
+        breaker = self.get_breaker(shard)
+        async with (_unguarded() if breaker is None else breaker.guard_checkout()) as acquired:
+            with span("mysql acquire", kind="client", **{"db.system": "mysql", "db.shard": shard, "db.replica": pool is self._replica_pool}):
+                conn = await asyncio.wait_for(
+                    self._acquire_primary(pool) if pool is self._pool else pool.acquire(),
+                    settings.DB_ACQUIRE_TIMEOUT
+                )
+            acquired()
+            try:
+                yield instrument_connection(conn)
+            except ABANDON_EXCEPTIONS:
+                self._abandon(conn)
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            finally:
+                await pool.release(conn)
+                if self._retired_pools:
+                    await self._notify_drained()
     
     async def health_check(self) -> bool:
         """数据库健康检查"""
@@ -0,0 +1,96 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Set, TypeVar
+
+from .metrics import metrics
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class DataLoader(Generic[K, V]):
+    """DataLoader：收集同一个事件循环tick内的load调用，合并为一次批量查询
+
+    batch_fn接收去重后的key列表，返回 {key: value}；缺失的key解析为None。
+    同一个loader内相同key只查询一次（请求级缓存），因此应按请求创建实例。
+    一批的所有等待者都被取消（请求截止、客户端断开）时取消这次批量查询，释放数据库连接；
+    批量查询被取消时其中的future也随之取消。
+    """
+
+    def __init__(self, name: str, batch_fn: Callable[[List[K]], Awaitable[Dict[K, V]]]):
+        self.name = name
+        self._batch_fn = batch_fn
+        self._cache: Dict[K, asyncio.Future] = {}
+        self._pending: Dict[K, asyncio.Future] = {}
+        self._dispatch_scheduled = False
+        # 进行中的批量查询（保留引用，避免任务在执行中被垃圾回收）
+        self._tasks: Set[asyncio.Task] = set()
+
+    def load(self, key: K) -> "asyncio.Future[Optional[V]]":
+        """加载单个key，返回可等待的future"""
+        future = self._cache.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._cache[key] = future
+        self._pending[key] = future
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            # 下一个tick再派发，期间其他协程的load调用会进入同一批
+            loop.call_soon(self._dispatch)
+        return future
+
+    async def load_many(self, keys: List[K]) -> List[Optional[V]]:
+        """批量加载，结果顺序与keys一致"""
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def clear(self, key: K) -> None:
+        """清除单个key的请求级缓存"""
+        self._cache.pop(key, None)
+
+    def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        self._dispatch_scheduled = False
+        if not pending:
+            return
+        task = asyncio.get_running_loop().create_task(self._resolve(pending))
+        self._tasks.add(task)
+        task.add_done_callback(lambda t: self._finish(t, pending))
+        for key, future in pending.items():
+            future.add_done_callback(lambda f, k=key: self._on_future_done(k, f, task, pending))
+
+    def _on_future_done(self, key: K, future: asyncio.Future, task: asyncio.Task,
+                        pending: Dict[K, asyncio.Future]) -> None:
+        if not future.cancelled():
+            return
+        # 取消的key不缓存，后续可重新加载
+        if self._cache.get(key) is future:
+            del self._cache[key]
+        # 一批的future全部被取消时没有人需要结果，取消批量查询
+        if not task.done() and all(f.cancelled() for f in pending.values()):
+            task.cancel()
+
+    def _finish(self, task: asyncio.Task, pending: Dict[K, asyncio.Future]) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled():
+            return
+        for future in pending.values():
+            future.cancel()
+
+    async def _resolve(self, pending: Dict[K, asyncio.Future]) -> None:
+        metrics.observe("dataloader_batch_size", len(pending), loader=self.name)
+        try:
+            results = await self._batch_fn(list(pending))
+        except Exception as e:
+            for key, future in pending.items():
+                # 失败的key不缓存，后续可重试
+                if self._cache.get(key) is future:
+                    del self._cache[key]
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, future in pending.items():
+            if not future.done():
+                future.set_result(results.get(key))
@@ -0,0 +1,75 @@
+import functools
+from contextlib import ExitStack
+from typing import Any, Callable, ContextManager, List
+
+# 语句观察者：observer(query, args)返回包裹一次execute的上下文管理器（追踪、慢查询记录等）
+StatementObserver = Callable[[str, Any], ContextManager]
+
+# 语句改写：rewriter(query)返回实际发送的语句（如加上优化器提示）
+StatementRewriter = Callable[[str], str]
+
+_statement_observers: List[StatementObserver] = []
+_statement_rewriters: List[StatementRewriter] = []
+
+
+def add_statement_observer(observer: StatementObserver) -> None:
+    if observer not in _statement_observers:
+        _statement_observers.append(observer)
+
+
+def remove_statement_observer(observer: StatementObserver) -> None:
+    if observer in _statement_observers:
+        _statement_observers.remove(observer)
+
+
+def add_statement_rewriter(rewriter: StatementRewriter) -> None:
+    if rewriter not in _statement_rewriters:
+        _statement_rewriters.append(rewriter)
+
+
+def remove_statement_rewriter(rewriter: StatementRewriter) -> None:
+    if rewriter in _statement_rewriters:
+        _statement_rewriters.remove(rewriter)
+
+
+class InstrumentedCursorMixin:
+    """在每次execute外层依次进入所有语句观察者（观察者看到的是改写前的语句）"""
+
+    async def execute(self, query, args=None):
+        original = query
+        for rewriter in list(_statement_rewriters):
+            query = rewriter(query)
+        if not _statement_observers:
+            return await super().execute(query, args)
+        with ExitStack() as stack:
+            for observer in list(_statement_observers):
+                stack.enter_context(observer(original, args))
+            return await super().execute(query, args)
+
+
+@functools.lru_cache(maxsize=None)
+def _instrumented_cursor_class(cursor_class: type) -> type:
+    return type(f"Instrumented{cursor_class.__name__}", (InstrumentedCursorMixin, cursor_class), {})
+
+
+class InstrumentedConnection:
+    """连接代理：cursor()返回带观察者的游标，其余属性直接转发给原连接"""
+
+    __slots__ = ("_conn",)
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *cursors):
+        classes = cursors or (self._conn.cursorclass,)
+        return self._conn.cursor(*(_instrumented_cursor_class(cls) for cls in classes))
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def instrument_connection(conn):
+    """有观察者或改写时返回代理连接，否则原样返回（无额外开销）"""
+    if not _statement_observers and not _statement_rewriters:
+        return conn
+    return InstrumentedConnection(conn)
@@ -0,0 +1,123 @@
+import asyncio
+import math
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Iterator, Optional
+
+import aiomysql
+from fastapi import HTTPException, status
+
+from ..config.settings import settings
+from .metrics import metrics
+
+# 当前请求的截止时间（time.monotonic()），None表示不限制
+_deadline_var: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+# MySQL超过MAX_EXECUTION_TIME中断语句时的错误码
+ER_QUERY_TIMEOUT = 3024
+
+_SELECT_RE = re.compile(r"^(\s*SELECT\b)", re.IGNORECASE)
+
+
+class DeadlineExceeded(HTTPException):
+    """请求截止时间已到（504）"""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Request deadline exceeded"
+        )
+
+
+def route_timeout(method: str, path: str) -> Optional[float]:
+    """按DEADLINE_ROUTES查找路由的超时时间（最长前缀优先，键为"METHOD /prefix"或"/prefix"），0表示不限制"""
+    best_length = -1
+    timeout = settings.DEADLINE_DEFAULT_SECONDS
+    for key, seconds in settings.DEADLINE_ROUTES.items():
+        key_method, _, prefix = key.rpartition(" ")
+        if key_method and key_method.upper() != method:
+            continue
+        if path != prefix and not path.startswith(prefix.rstrip("/") + "/"):
+            continue
+        # 同样长度的前缀中指定了方法的更具体
+        length = len(prefix) * 2 + (1 if key_method else 0)
+        if length > best_length:
+            best_length = length
+            timeout = seconds
+    return timeout if timeout and timeout > 0 else None
+
+
+def remaining() -> Optional[float]:
+    """距截止时间的剩余秒数（未设置截止时间时为None）"""
+    deadline = _deadline_var.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """在当前上下文中设置截止时间（已有更早的截止时间时保留原值）"""
+    deadline = _deadline_var.get()
+    if seconds is not None:
+        candidate = time.monotonic() + seconds
+        deadline = candidate if deadline is None else min(deadline, candidate)
+    token = _deadline_var.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline_var.reset(token)
+
+
+def budget(limit: Optional[float]) -> Optional[float]:
+    """单次操作的超时时间：limit与剩余时间中较小者，截止时间已过时抛出DeadlineExceeded"""
+    left = remaining()
+    if left is None:
+        return limit
+    if left <= 0:
+        metrics.inc("deadline_exceeded_total", stage="budget")
+        raise DeadlineExceeded()
+    return left if limit is None else min(limit, left)
+
+
+async def wait_with_budget(awaitable: Awaitable[Any], limit: Optional[float]) -> Any:
+    """在预算内等待；因截止时间（而不是limit本身）超时时抛出DeadlineExceeded，不计入熔断统计"""
+    try:
+        timeout = budget(limit)
+    except DeadlineExceeded:
+        # 截止时间已过，awaitable不会被等待，关闭它（如pool.acquire()的协程）
+        close = getattr(awaitable, "close", None)
+        if close is not None:
+            close()
+        raise
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        if limit is None or (timeout is not None and timeout < limit):
+            metrics.inc("deadline_exceeded_total", stage="wait")
+            raise DeadlineExceeded() from None
+        raise
+
+
+def add_execution_time_hint(query: str) -> str:
+    """为SELECT语句加上MAX_EXECUTION_TIME提示（剩余时间，毫秒），服务端到时自行中断语句"""
+    left = remaining()
+    if left is None or "MAX_EXECUTION_TIME" in query:
+        return query
+    milliseconds = max(1, math.ceil(left * 1000))
+    return _SELECT_RE.sub(rf"\1 /*+ MAX_EXECUTION_TIME({milliseconds}) */", query, count=1)
+
+
+@contextmanager
+def statement_deadline(query: str, args: Any) -> Iterator[None]:
+    """语句观察者：执行前检查剩余时间，把MAX_EXECUTION_TIME中断转换为504"""
+    budget(None)
+    try:
+        yield
+    except aiomysql.OperationalError as e:
+        if e.args and e.args[0] == ER_QUERY_TIMEOUT and _deadline_var.get() is not None:
+            metrics.inc("deadline_exceeded_total", stage="mysql")
+            raise DeadlineExceeded() from e
+        raise
@@ -0,0 +1,263 @@
+import asyncio
+import inspect
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+import logging
+
+from ..config.settings import BaseConfig, settings
+from .metrics import MetricsRegistry, metrics
+from .redis import get_redis_service
+
+logger = logging.getLogger(__name__)
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+# 可在运行时修改的配置及其最小值（这些配置在每次使用时读取settings，修改后下一次使用即生效；
+# 连接池大小、日志级别、并发限制另外需要注册应用函数）
+TUNABLE_SETTINGS: Dict[str, Optional[float]] = {
+    "DB_POOL_SIZE": 1,
+    "DB_ACQUIRE_TIMEOUT": 0.01,
+    "REDIS_OPERATION_TIMEOUT": 0.01,
+    "USER_CACHE_TTL": 1,
+    "COUNTER_APPROXIMATE_TTL": 0,
+    "USER_BATCH_MAX_IDS": 1,
+    "USER_PAGE_MAX_LIMIT": 1,
+    "SEARCH_MAX_LIMIT": 1,
+    "SINGLEFLIGHT_TIMEOUT": 0.01,
+    "SLOW_QUERY_THRESHOLD": 0,
+    "CONCURRENCY_MIN_LIMIT": 1,
+    "CONCURRENCY_MAX_LIMIT": 1,
+    "CONCURRENCY_LATENCY_TARGET": 0.001,
+    "CONCURRENCY_QUEUE_SIZE": 0,
+    "CONCURRENCY_QUEUE_TIMEOUT": 0,
+    "LOG_LEVEL": None,
+}
+
+# 覆盖值来源，后面的优先：文件 < Redis key（管理接口写入Redis key）
+SOURCES = ("file", "redis")
+
+Applier = Callable[[], Union[None, Awaitable[None]]]
+
+# 在Redis中原子合并覆盖值（值为null时删除该项），返回合并后的JSON；不同worker同时发布时不会互相覆盖
+_MERGE_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+local layer = {}
+if current then
+    layer = cjson.decode(current)
+end
+for name, value in pairs(cjson.decode(ARGV[1])) do
+    if value == cjson.null then
+        layer[name] = nil
+    else
+        layer[name] = value
+    end
+end
+local merged = cjson.encode(layer)
+redis.call('SET', KEYS[1], merged)
+return merged
+"""
+
+
+def pool_size_limit() -> int:
+    """运行时DB_POOL_SIZE的上限：gunicorn启动时设置的每个worker份额，单进程运行时为max_connections减去预留"""
+    return settings.DB_POOL_SIZE_LIMIT or settings.DB_MAX_CONNECTIONS - settings.DB_RESERVED_CONNECTIONS
+
+
+def validate_overrides(overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """校验并转换覆盖值（类型取自BaseConfig），值为None表示删除该覆盖；任一项不合法时抛出ValueError"""
+    validated = {}
+    for name, value in overrides.items():
+        if name not in TUNABLE_SETTINGS:
+            raise ValueError(f"{name} cannot be changed at runtime")
+        if value is None:
+            validated[name] = None
+            continue
+        value, error = BaseConfig.__fields__[name].validate(value, {}, loc=name)
+        if error:
+            raise ValueError(f"Invalid value for {name}: {error.exc}")
+        minimum = TUNABLE_SETTINGS[name]
+        if minimum is not None and value < minimum:
+            raise ValueError(f"{name} must be at least {minimum}")
+        if name == "LOG_LEVEL":
+            value = value.upper()
+            if value not in LOG_LEVELS:
+                raise ValueError(f"LOG_LEVEL must be one of {', '.join(LOG_LEVELS)}")
+        if name == "DB_POOL_SIZE" and value > pool_size_limit():
+            raise ValueError(f"DB_POOL_SIZE exceeds the per-worker connection limit ({pool_size_limit()})")
+        validated[name] = value
+    return validated
+
+
+class DynamicConfig:
+    """运行时配置：启动时的值为基线，文件和Redis key中的覆盖值按顺序叠加
+
+    一次更新的所有配置先全部校验，再在同一个事件循环步骤中一起替换（其他协程看不到只改了一半的配置），
+    之后调用受影响配置的应用函数；应用失败时恢复这些配置的旧值。每项变更记录日志和指标。
+    """
+
+    def __init__(self):
+        self._baseline: Optional[Dict[str, Any]] = None
+        self._layers: Dict[str, Dict[str, Any]] = {source: {} for source in SOURCES}
+        self._appliers: List[Tuple[frozenset, Applier]] = []
+        self._lock: Optional[asyncio.Lock] = None
+        self._file_mtime: Optional[float] = None
+        self._redis_raw: Optional[str] = None
+        self.version = 0
+
+    def register_applier(self, names: Iterable[str], applier: Applier) -> None:
+        """names中任一配置变更后调用applier（从settings读取新值）"""
+        self._appliers.append((frozenset(names), applier))
+
+    def baseline(self) -> Dict[str, Any]:
+        if self._baseline is None:
+            self._baseline = {name: getattr(settings, name) for name in TUNABLE_SETTINGS}
+        return self._baseline
+
+    def source_of(self, name: str) -> str:
+        for source in reversed(SOURCES):
+            if name in self._layers[source]:
+                return source
+        return "default"
+
+    def _effective(self, layers: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        values = dict(self.baseline())
+        for source in SOURCES:
+            values.update(layers[source])
+        return values
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "settings": {
+                name: {"value": getattr(settings, name), "default": default, "source": self.source_of(name)}
+                for name, default in self.baseline().items()
+            },
+        }
+
+    async def update(self, source: str, overrides: Dict[str, Any], replace: bool = False,
+                     reason: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """更新某个来源的覆盖值（replace为True时整体替换该来源），返回实际发生的变更"""
+        validated = validate_overrides(overrides)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            layers = {name: dict(layer) for name, layer in self._layers.items()}
+            layer = {} if replace else layers[source]
+            for name, value in validated.items():
+                if value is None:
+                    layer.pop(name, None)
+                else:
+                    layer[name] = value
+            layers[source] = layer
+
+            target = self._effective(layers)
+            if target["CONCURRENCY_MIN_LIMIT"] > target["CONCURRENCY_MAX_LIMIT"]:
+                raise ValueError("CONCURRENCY_MIN_LIMIT must not exceed CONCURRENCY_MAX_LIMIT")
+            self._layers = layers
+
+            changes = {
+                name: {"old": getattr(settings, name), "new": value}
+                for name, value in target.items()
+                if getattr(settings, name) != value
+            }
+            if not changes:
+                return {}
+            # 同步地一次替换全部配置
+            for name, change in changes.items():
+                setattr(settings, name, change["new"])
+            self.version += 1
+            for name, change in changes.items():
+                logger.info(f"🔧 Setting {name} changed {change['old']!r} -> {change['new']!r} ({reason or source})")
+                metrics.inc("dynamic_config_changes_total", setting=name, source=source)
+            await self._apply(changes)
+            return changes
+
+    async def _apply(self, changes: Dict[str, Dict[str, Any]]) -> None:
+        for names, applier in self._appliers:
+            affected = names.intersection(changes)
+            if not affected:
+                continue
+            try:
+                result = applier()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                # 应用失败时恢复旧值，保持settings与实际生效的状态一致
+                for name in affected:
+                    setattr(settings, name, changes[name]["old"])
+                    changes[name]["applied"] = False
+                    metrics.inc("dynamic_config_apply_failures_total", setting=name)
+                logger.error(f"❌ Failed to apply {', '.join(sorted(affected))}, reverted: {e}")
+
+    async def reload_redis(self) -> None:
+        """读取Redis key中的覆盖值（key不存在时清空该来源；Redis不可用时保持不变）"""
+        redis_service = await get_redis_service()
+        raw = await asyncio.wait_for(
+            redis_service.client.get(settings.DYNAMIC_CONFIG_REDIS_KEY), settings.REDIS_OPERATION_TIMEOUT
+        )
+        if raw == self._redis_raw:
+            return
+        # 先记录已读取的内容，不合法的值只报错一次，修正后再应用
+        self._redis_raw = raw
+        overrides = json.loads(raw) if raw else {}
+        await self.update("redis", overrides, replace=True, reason=f"redis key {settings.DYNAMIC_CONFIG_REDIS_KEY}")
+
+    async def reload_file(self) -> None:
+        """文件修改时间变化时重新读取（文件被删除时清空该来源）"""
+        path = settings.DYNAMIC_CONFIG_FILE
+        if not path:
+            return
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._file_mtime:
+            return
+        self._file_mtime = mtime
+        overrides = {}
+        if mtime is not None:
+            with open(path, encoding="utf-8") as f:
+                overrides = json.load(f)
+        await self.update("file", overrides, replace=True, reason=f"file {path}")
+
+    async def publish(self, overrides: Dict[str, Any]) -> Tuple[Dict[str, Dict[str, Any]], bool]:
+        """管理接口：在Redis中合并到key（所有worker在下一次检查时应用），本worker立即应用合并结果
+
+        合并以Redis中的当前内容为准（本worker读到的可能已过时），其他worker刚发布的修改不会被覆盖。
+        返回(本worker的变更, 是否已写入Redis)；Redis不可用时只在本worker生效。
+        """
+        validated = validate_overrides(overrides)
+        redis_service = await get_redis_service()
+        merged = await redis_service.eval(_MERGE_SCRIPT, [settings.DYNAMIC_CONFIG_REDIS_KEY], [json.dumps(validated)])
+        if merged is None:
+            return await self.update("redis", validated, reason="admin"), False
+        self._redis_raw = merged
+        changes = await self.update("redis", json.loads(merged), replace=True, reason="admin")
+        return changes, True
+
+    async def run(self) -> None:
+        """后台检查循环：每DYNAMIC_CONFIG_POLL_INTERVAL秒检查文件和Redis key"""
+        self.baseline()
+        while True:
+            for source, reload in (("file", self.reload_file), ("redis", self.reload_redis)):
+                try:
+                    await reload()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    metrics.inc("dynamic_config_reload_failures_total", source=source)
+                    logger.error(f"❌ Dynamic config reload from {source} failed: {e}")
+            await asyncio.sleep(settings.DYNAMIC_CONFIG_POLL_INTERVAL)
+
+
+def collect_dynamic_config_metrics(registry: MetricsRegistry) -> None:
+    registry.set_gauge("dynamic_config_version", dynamic_config.version)
+    for name in TUNABLE_SETTINGS:
+        value = getattr(settings, name)
+        if isinstance(value, (int, float)):
+            registry.set_gauge("dynamic_config_value", value, setting=name)
+
+
+# 全局运行时配置实例
+dynamic_config = DynamicConfig()
@@ -0,0 +1,146 @@
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import logging
+
+import redis.asyncio as redis
+
+from ..config.settings import settings
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 事件处理函数：接收解码后的事件（payload已解析为dict）
+EventHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def dead_letter_key(stream: str) -> str:
+    """死信Stream：多次投递仍处理失败的事件"""
+    return f"{stream}:dead"
+
+
+def decode_event(entry_id: str, fields: Dict[str, str]) -> Dict[str, Any]:
+    event = dict(fields)
+    event["stream_id"] = entry_id
+    event["payload"] = json.loads(fields.get("payload") or "{}")
+    return event
+
+
+class EventConsumer:
+    """Redis Streams消费者组封装（供下游Python服务消费outbox事件）
+
+    - 启动时先处理本消费者未确认的消息（崩溃前读到但未处理完的），再读取新消息
+    - 处理成功后XACK；处理失败的消息留在待确认列表，每EVENTS_CLAIM_INTERVAL秒认领空闲超过EVENTS_CLAIM_IDLE_MS的消息重试
+      （包括本消费者自己的），投递次数达到EVENTS_MAX_DELIVERIES的消息移入死信Stream（dead_letter_key）后确认
+    - replay(start_id)把组的读取位置重置到指定ID，从该位置重新投递
+    投递语义为至少一次，处理函数应按event_id幂等。
+    """
+
+    def __init__(self, client: redis.Redis, stream: str, group: str, consumer: str, handler: EventHandler,
+                 start_id: str = "$"):
+        self.client = client
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer
+        self.handler = handler
+        self.start_id = start_id
+
+    async def ensure_group(self) -> None:
+        """创建消费者组（Stream不存在时一并创建，组已存在时忽略）"""
+        try:
+            await self.client.xgroup_create(self.stream, self.group, id=self.start_id, mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def replay(self, start_id: str = "0") -> None:
+        """重置组的读取位置，从start_id之后重新投递（"0"为Stream中保留的全部事件）"""
+        await self.client.xgroup_setid(self.stream, self.group, id=start_id)
+        logger.info(f"⏪ Consumer group {self.group} on {self.stream} reset to {start_id}")
+
+    async def _handle(self, entries: List[Tuple[str, Dict[str, str]]]) -> int:
+        handled = 0
+        for entry_id, fields in entries:
+            if fields is None:
+                # 待确认的消息已被MAXLEN裁剪，无法再处理
+                await self.client.xack(self.stream, self.group, entry_id)
+                continue
+            try:
+                await self.handler(decode_event(entry_id, fields))
+            except Exception as e:
+                metrics.inc("event_consumer_failures_total", stream=self.stream, group=self.group)
+                logger.error(f"❌ Event {entry_id} on {self.stream} failed in {self.group}: {e}")
+                continue
+            await self.client.xack(self.stream, self.group, entry_id)
+            metrics.inc("event_consumer_handled_total", stream=self.stream, group=self.group)
+            handled += 1
+        return handled
+
+    async def _read(self, last_id: str, block: Optional[int]) -> List[Tuple[str, Dict[str, str]]]:
+        response = await self.client.xreadgroup(
+            self.group, self.consumer, {self.stream: last_id},
+            count=settings.EVENTS_READ_COUNT, block=block
+        )
+        return response[0][1] if response else []
+
+    async def process_pending(self) -> int:
+        """处理本消费者未确认的消息"""
+        handled = 0
+        last_id = "0"
+        while True:
+            entries = await self._read(last_id, None)
+            if not entries:
+                return handled
+            handled += await self._handle(entries)
+            last_id = entries[-1][0]
+
+    async def dead_letter_exhausted(self) -> int:
+        """把空闲超时且投递次数达到EVENTS_MAX_DELIVERIES的消息移入死信Stream并确认，返回移动数"""
+        pending = await self.client.xpending_range(
+            self.stream, self.group, min="-", max="+",
+            count=settings.EVENTS_READ_COUNT, idle=settings.EVENTS_CLAIM_IDLE_MS
+        )
+        moved = 0
+        for entry in pending:
+            if entry["times_delivered"] < settings.EVENTS_MAX_DELIVERIES:
+                continue
+            entry_id = entry["message_id"]
+            entries = await self.client.xrange(self.stream, min=entry_id, max=entry_id)
+            if entries:
+                # 先写死信再确认：中途失败时最多重复写一次死信
+                fields = dict(entries[0][1])
+                fields.update({
+                    "dead_stream_id": entry_id,
+                    "dead_group": self.group,
+                    "dead_deliveries": str(entry["times_delivered"]),
+                })
+                await self.client.xadd(dead_letter_key(self.stream), fields,
+                                       maxlen=settings.OUTBOX_STREAM_MAXLEN, approximate=True)
+            await self.client.xack(self.stream, self.group, entry_id)
+            metrics.inc("event_consumer_dead_lettered_total", stream=self.stream, group=self.group)
+            logger.warning(f"⚠️ Event {entry_id} on {self.stream} moved to {dead_letter_key(self.stream)} after {entry['times_delivered']} deliveries")
+            moved += 1
+        return moved
+
+    async def claim_stale(self) -> int:
+        """认领组内空闲超过EVENTS_CLAIM_IDLE_MS的消息并处理（先移走投递次数用尽的消息）"""
+        await self.dead_letter_exhausted()
+        _, entries, *_ = await self.client.xautoclaim(
+            self.stream, self.group, self.consumer,
+            min_idle_time=settings.EVENTS_CLAIM_IDLE_MS, start_id="0-0", count=settings.EVENTS_READ_COUNT
+        )
+        return await self._handle(entries)
+
+    async def run(self) -> None:
+        """消费循环：先处理遗留消息，之后阻塞读取新消息，并按EVENTS_CLAIM_INTERVAL定时认领超时消息（与是否读到新消息无关）"""
+        await self.ensure_group()
+        await self.process_pending()
+        loop = asyncio.get_running_loop()
+        next_claim = loop.time() + settings.EVENTS_CLAIM_INTERVAL
+        while True:
+            entries = await self._read(">", settings.EVENTS_BLOCK_MS)
+            if entries:
+                await self._handle(entries)
+            if loop.time() >= next_claim:
+                await self.claim_stale()
+                next_claim = loop.time() + settings.EVENTS_CLAIM_INTERVAL
@@ -0,0 +1,231 @@
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Set, Tuple
+import logging
+
+from ..config.settings import settings
+from .metrics import MetricsRegistry, metrics
+from .outbox import stream_key
+from .redis import get_redis_service
+
+logger = logging.getLogger(__name__)
+
+# 订阅所有变更事件频道（events:users、events:orders……），频道名与Stream名相同
+EVENTS_PATTERN = "events:*"
+
+
+def encode_cursor(positions: Dict[str, str]) -> str:
+    """SSE事件ID：客户端在各Stream中已收到的位置，如users:1700000000000-0;orders:1700000000001-3"""
+    return ";".join(f"{name}:{entry_id}" for name, entry_id in sorted(positions.items()))
+
+
+def decode_cursor(cursor: Optional[str]) -> Dict[str, str]:
+    positions = {}
+    for part in (cursor or "").split(";"):
+        name, _, entry_id = part.strip().partition(":")
+        if name and entry_id:
+            positions[name] = entry_id
+    return positions
+
+
+def _entry_key(entry_id: str) -> Tuple[int, int]:
+    milliseconds, _, sequence = entry_id.partition("-")
+    return int(milliseconds), int(sequence or 0)
+
+
+class EventFilter:
+    """订阅过滤条件：事件类别（users/orders）、用户ID、订单状态，为空表示不限制"""
+
+    def __init__(self, streams: List[str], user_id: Optional[int] = None, status: Optional[str] = None):
+        self.streams = streams
+        self.user_id = user_id
+        self.status = status
+
+    def matches(self, stream: str, event: Dict[str, Any]) -> bool:
+        if stream not in self.streams:
+            return False
+        payload = event["payload"]
+        if self.user_id is not None:
+            owner = event["aggregate_id"] if stream == "users" else payload.get("user_id")
+            if str(owner) != str(self.user_id):
+                return False
+        if self.status is not None and payload.get("status") != self.status:
+            return False
+        return True
+
+
+class Subscriber:
+    """单个SSE连接：有界队列，队列满时被判定为慢消费者并断开（客户端可用Last-Event-ID续传）"""
+
+    def __init__(self, event_filter: EventFilter, positions: Dict[str, str]):
+        self.filter = event_filter
+        self.positions = dict(positions)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.SSE_CLIENT_BUFFER)
+        self.closed = False
+
+    def offer(self, stream: str, event: Dict[str, Any]) -> bool:
+        """放入事件，队列已满时返回False"""
+        try:
+            self.queue.put_nowait((stream, event))
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def close(self) -> None:
+        self.closed = True
+        # 唤醒正在等待的读取方（队列满时读取方本来就不会阻塞）
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    def accept(self, stream: str, event: Dict[str, Any]) -> bool:
+        """去重：续传回放与实时推送可能重叠，只发送位置之后的事件，并更新位置"""
+        seen = self.positions.get(stream)
+        if seen is not None and _entry_key(event["id"]) <= _entry_key(seen):
+            return False
+        self.positions[stream] = event["id"]
+        return True
+
+
+def decode_message(channel: str, data: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """解析OutboxRelay发布的频道消息，返回(事件类别, 事件)"""
+    try:
+        event = json.loads(data)
+        event["payload"] = json.loads(event.get("payload") or "{}")
+    except (TypeError, ValueError):
+        return None
+    return channel.split(":", 1)[1], event
+
+
+class EventHub:
+    """每个worker一个Redis pub/sub订阅（PSUBSCRIBE events:*），把变更事件分发给本worker的所有SSE连接
+
+    第一个订阅者出现时启动订阅任务（之后一直保持）；订阅连接断开时关闭所有连接，
+    客户端带Last-Event-ID重连后从Stream补齐。
+    """
+
+    def __init__(self):
+        self._subscribers: Set[Subscriber] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    async def subscribe(self, event_filter: EventFilter, last_event_id: Optional[str]) -> Subscriber:
+        """注册订阅并补发Last-Event-ID之后的事件（先注册再回放，回放期间的实时事件不会丢失）
+
+        Last-Event-ID中没有的Stream（新连接，或只收到过其他类别的事件）从注册前的最后一个条目开始，
+        SSE事件ID因此总是包含所有订阅的Stream，断线期间任何类别的事件都能补发。
+        """
+        if len(self._subscribers) >= settings.SSE_MAX_CLIENTS:
+            raise OverflowError("Too many event stream clients")
+        positions = decode_cursor(last_event_id)
+        await self._start_positions(event_filter.streams, positions)
+        subscriber = Subscriber(event_filter, positions)
+        self._subscribers.add(subscriber)
+        try:
+            await self._ensure_listener()
+            await self._replay(subscriber)
+        except BaseException:
+            self.unsubscribe(subscriber)
+            raise
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    async def _ensure_listener(self) -> None:
+        if self._task is None or self._task.done():
+            self._ready = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._listen(), name="event-hub")
+        # 订阅生效后再回放，避免回放与订阅之间的事件丢失
+        await asyncio.wait_for(self._ready.wait(), settings.REDIS_OPERATION_TIMEOUT)
+
+    @staticmethod
+    async def _start_positions(streams: List[str], positions: Dict[str, str]) -> None:
+        """为没有位置的Stream取当前最后一个条目ID（Redis不可用时跳过，这些Stream只接收实时事件）"""
+        missing = [stream for stream in streams if stream not in positions]
+        if not missing:
+            return
+        redis_service = await get_redis_service()
+        for stream in missing:
+            entry_id = await redis_service.last_entry_id(stream_key(stream))
+            if entry_id is not None:
+                positions[stream] = entry_id
+
+    async def _replay(self, subscriber: Subscriber) -> None:
+        """从各Stream读取客户端位置之后的事件，按Stream条目ID合并后放入队列"""
+        redis_service = await get_redis_service()
+        backlog = []
+        for stream, position in subscriber.positions.items():
+            if stream not in subscriber.filter.streams:
+                continue
+            entries = await redis_service.xrange(stream_key(stream), f"({position}", settings.SSE_RESUME_MAX_EVENTS)
+            for entry_id, fields in entries or []:
+                event = {"id": entry_id, **fields, "payload": json.loads(fields.get("payload") or "{}")}
+                backlog.append((stream, event))
+        backlog.sort(key=lambda item: _entry_key(item[1]["id"]))
+        metrics.inc("sse_replayed_events_total", len(backlog))
+        for stream, event in backlog:
+            if subscriber.filter.matches(stream, event):
+                subscriber.offer(stream, event)
+
+    def dispatch(self, stream: str, event: Dict[str, Any]) -> None:
+        """分发给匹配的订阅者，队列已满的订阅者被断开"""
+        for subscriber in list(self._subscribers):
+            if not subscriber.filter.matches(stream, event):
+                continue
+            if not subscriber.offer(stream, event):
+                metrics.inc("sse_slow_consumers_evicted_total")
+                self.unsubscribe(subscriber)
+                subscriber.close()
+
+    async def stop(self) -> None:
+        """停止订阅任务（关闭时调用）"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _close_all(self) -> None:
+        for subscriber in list(self._subscribers):
+            self.unsubscribe(subscriber)
+            subscriber.close()
+
+    async def _listen(self) -> None:
+        redis_service = await get_redis_service()
+        pubsub = redis_service.pubsub()
+        try:
+            await pubsub.psubscribe(EVENTS_PATTERN)
+            self._ready.set()
+            logger.info("📡 Event hub subscribed to change events")
+            while True:
+                message = await pubsub.get_message(timeout=settings.SSE_HEARTBEAT_SECONDS)
+                if message is None or message["type"] != "pmessage":
+                    continue
+                decoded = decode_message(message["channel"], message["data"])
+                if decoded is not None:
+                    metrics.inc("sse_events_received_total")
+                    self.dispatch(*decoded)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Event hub subscription failed, closing {len(self._subscribers)} streams: {e}")
+        finally:
+            # 订阅中断期间的事件无法实时送达，断开所有连接让客户端续传
+            self._close_all()
+            try:
+                await pubsub.close()
+            except Exception:
+                pass
+
+
+def collect_event_hub_metrics(registry: MetricsRegistry) -> None:
+    registry.set_gauge("sse_clients", event_hub.subscriber_count)
+
+
+# 全局事件分发实例
+event_hub = EventHub()
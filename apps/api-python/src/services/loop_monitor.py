@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, List, Optional
+
+from ..config.settings import settings
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class InflightRequests:
+    """正在处理的请求（按asyncio任务索引），用于定位阻塞事件循环的路由"""
+
+    def __init__(self):
+        self._requests: Dict[asyncio.Task, Dict[str, Any]] = {}
+
+    def track(self, task: Optional[asyncio.Task], scope: Dict[str, Any]) -> None:
+        if task is not None:
+            self._requests[task] = {"scope": scope, "started": time.monotonic()}
+
+    def untrack(self, task: Optional[asyncio.Task]) -> None:
+        self._requests.pop(task, None)
+
+    @staticmethod
+    def _route(scope: Dict[str, Any]) -> str:
+        # 路由匹配后使用路由模板，降低日志中路径的基数
+        route = scope.get("route")
+        path = getattr(route, "path", None) or scope.get("path", "")
+        return f"{scope.get('method', '')} {path}"
+
+    def describe(self, task: Optional[asyncio.Task]) -> str:
+        """描述任务对应的请求（不是请求任务时返回任务名）"""
+        entry = self._requests.get(task) if task is not None else None
+        if entry is not None:
+            return self._route(entry["scope"])
+        if task is not None:
+            return f"task {task.get_name()}"
+        return "no running task"
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return sorted(
+            (
+                {"route": self._route(entry["scope"]), "age_seconds": round(now - entry["started"], 3)}
+                for entry in list(self._requests.values())
+            ),
+            key=lambda item: -item["age_seconds"]
+        )
+
+
+class _SlowCallbackCounter(logging.Filter):
+    """统计asyncio调试模式输出的慢回调警告"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.msg, str) and record.msg.startswith("Executing"):
+            metrics.inc("event_loop_slow_callbacks_total")
+        return True
+
+
+class LoopMonitor:
+    """事件循环延迟监控
+
+    协程每LOOP_LAG_INTERVAL秒醒来一次，实际醒来时间与预期的差值即调度延迟；
+    看门狗线程在心跳超时时抓取事件循环线程的当前调用栈，在阻塞仍在发生时记录阻塞位置和路由。
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = time.monotonic()
+        self._stop = threading.Event()
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def _enable_debug(self, loop: asyncio.AbstractEventLoop) -> None:
+        loop.set_debug(True)
+        loop.slow_callback_duration = settings.LOOP_SLOW_CALLBACK_SECONDS
+        logging.getLogger("asyncio").addFilter(_SlowCallbackCounter())
+        logger.info(f"🐢 asyncio debug mode enabled (slow callback > {settings.LOOP_SLOW_CALLBACK_SECONDS}s)")
+
+    async def run(self) -> None:
+        """后台监控任务（取消时停止看门狗线程）"""
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        if settings.DEBUG or settings.LOOP_DEBUG:
+            self._enable_debug(loop)
+
+        self._stop.clear()
+        self._heartbeat = time.monotonic()
+        watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        watchdog.start()
+
+        interval = settings.LOOP_LAG_INTERVAL
+        try:
+            while True:
+                expected = loop.time() + interval
+                await asyncio.sleep(interval)
+                lag = max(0.0, loop.time() - expected)
+                self._heartbeat = time.monotonic()
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                metrics.observe("event_loop_lag_seconds", lag)
+                metrics.set_gauge("event_loop_lag_last_seconds", lag)
+                if lag >= settings.LOOP_LAG_THRESHOLD:
+                    metrics.inc("event_loop_lag_exceeded_total")
+                    logger.warning(f"🐢 Event loop lag {lag * 1000:.0f}ms (threshold {settings.LOOP_LAG_THRESHOLD * 1000:.0f}ms)")
+        finally:
+            self._stop.set()
+
+    def _watch(self) -> None:
+        """看门狗线程：心跳超过预期时间LOOP_LAG_THRESHOLD仍未更新时报告一次阻塞"""
+        threshold = settings.LOOP_LAG_THRESHOLD
+        reported = False
+        while not self._stop.wait(threshold / 2):
+            blocked = time.monotonic() - self._heartbeat - settings.LOOP_LAG_INTERVAL
+            if blocked < threshold:
+                reported = False
+            elif not reported:
+                reported = True
+                self._report_stall(blocked)
+
+    def _report_stall(self, blocked: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame, limit=settings.LOOP_STALL_STACK_DEPTH)) if frame else ""
+        try:
+            # 在其他线程读取当前任务只是一次字典查找
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        metrics.inc("event_loop_stalls_total")
+        logger.warning(
+            f"🧱 Event loop blocked for {blocked * 1000:.0f}ms+ in {inflight_requests.describe(task)}\n{stack}"
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "last_lag_seconds": round(self.last_lag, 6),
+            "max_lag_seconds": round(self.max_lag, 6),
+            "debug": bool(self._loop and self._loop.get_debug()),
+            "inflight": inflight_requests.snapshot(),
+        }
+
+
+# 全局实例
+inflight_requests = InflightRequests()
+loop_monitor = LoopMonitor()
@@ -0,0 +1,121 @@
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class MetricsRegistry:
+    """进程内指标注册表（计数器、仪表、摘要）"""
+
+    def __init__(self):
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._summaries: Dict[str, Dict[LabelKey, List[float]]] = {}
+        self._collectors: List[Callable[['MetricsRegistry'], None]] = []
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """计数器累加"""
+        series = self._counters.setdefault(name, {})
+        key = _label_key(labels)
+        series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """设置仪表值"""
+        self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """记录一次观测值（count/sum/max）"""
+        series = self._summaries.setdefault(name, {})
+        key = _label_key(labels)
+        stats = series.get(key)
+        if stats is None:
+            series[key] = [1, value, value]
+        else:
+            stats[0] += 1
+            stats[1] += value
+            if value > stats[2]:
+                stats[2] = value
+
+    def set_summary(self, name: str, count: int, total: float, maximum: float, **labels) -> None:
+        """直接设置摘要（由采集回调发布在别处累计的count/sum/max）"""
+        self._summaries.setdefault(name, {})[_label_key(labels)] = [count, total, maximum]
+
+    def get_counter(self, name: str, **labels) -> float:
+        """读取计数器当前值"""
+        return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def get_gauge(self, name: str, **labels) -> Optional[float]:
+        """读取仪表当前值"""
+        return self._gauges.get(name, {}).get(_label_key(labels))
+
+    def register_collector(self, collector: Callable[['MetricsRegistry'], None]) -> None:
+        """注册采集回调，在导出指标前调用"""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def _collect(self) -> None:
+        for collector in list(self._collectors):
+            try:
+                collector(self)
+            except Exception:
+                # 采集失败不影响其他指标导出
+                pass
+
+    def snapshot(self) -> dict:
+        """导出所有指标（JSON结构）"""
+        self._collect()
+
+        def series(values: Dict[LabelKey, object]) -> list:
+            return [{"labels": dict(key), "value": value} for key, value in values.items()]
+
+        return {
+            "timestamp": time.time(),
+            "counters": {name: series(values) for name, values in self._counters.items()},
+            "gauges": {name: series(values) for name, values in self._gauges.items()},
+            "summaries": {
+                name: [
+                    {"labels": dict(key), "count": s[0], "sum": s[1], "max": s[2]}
+                    for key, s in values.items()
+                ]
+                for name, values in self._summaries.items()
+            },
+        }
+
+    def render_prometheus(self) -> str:
+        """导出Prometheus文本格式"""
+        self._collect()
+        lines: List[str] = []
+
+        def fmt(name: str, key: LabelKey, value: float) -> str:
+            if not key:
+                return f"{name} {value}"
+            labels = ",".join(f'{k}="{v}"' for k, v in key)
+            return f"{name}{{{labels}}} {value}"
+
+        for name, values in self._counters.items():
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(fmt(name, key, value) for key, value in values.items())
+        for name, values in self._gauges.items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(fmt(name, key, value) for key, value in values.items())
+        for name, values in self._summaries.items():
+            lines.append(f"# TYPE {name} summary")
+            for key, (count, total, maximum) in values.items():
+                lines.append(fmt(f"{name}_count", key, count))
+                lines.append(fmt(f"{name}_sum", key, total))
+                lines.append(fmt(f"{name}_max", key, maximum))
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """清空所有指标（测试用）"""
+        self._counters.clear()
+        self._gauges.clear()
+        self._summaries.clear()
+
+
+# 全局指标实例
+metrics = MetricsRegistry()
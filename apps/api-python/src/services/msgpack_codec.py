@@ -0,0 +1,65 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Optional
+
+import msgpack
+from pydantic import BaseModel
+from starlette.responses import Response
+
+# 服务间调用的二进制格式（Accept/Content-Type）
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+
+def _default(value: Any) -> Any:
+    """msgpack不能直接编码的类型，与 packages/shared-types 的模型保持一致
+
+    - datetime编码为msgpack Timestamp扩展类型（-1），不带时区的按UTC处理
+    - pydantic模型按字段名展开；枚举取值；Decimal转为字符串（与JSON一致，不丢精度）
+    """
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return msgpack.Timestamp.from_datetime(value)
+    if isinstance(value, BaseModel):
+        return value.dict()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} as MessagePack")
+
+
+def packb(value: Any) -> bytes:
+    return msgpack.packb(value, default=_default, use_bin_type=True, datetime=False)
+
+
+def unpackb(data: bytes) -> Any:
+    """解码请求体：Timestamp解码为带UTC时区的datetime，map的key必须是字符串"""
+    return msgpack.unpackb(data, raw=False, timestamp=3, strict_map_key=True)
+
+
+def is_msgpack(content_type: Optional[str]) -> bool:
+    return (content_type or "").split(";", 1)[0].strip().lower() in MSGPACK_MEDIA_TYPES
+
+
+def accepts_msgpack(accept: Optional[str]) -> bool:
+    """Accept中列出了MessagePack且没有被q=0排除（浏览器的*/*不会切换格式）"""
+    for part in (accept or "").split(","):
+        media_type, *params = part.split(";")
+        if media_type.strip().lower() not in MSGPACK_MEDIA_TYPES:
+            continue
+        return not any(param.strip().replace(" ", "") in ("q=0", "q=0.0") for param in params)
+    return False
+
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return packb(content)
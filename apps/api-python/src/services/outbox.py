@@ -0,0 +1,153 @@
+import asyncio
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from ..config.settings import settings
+from .database import get_database_service
+from .metrics import metrics
+from .redis import get_redis_service
+from .sharding import shard_lock_name
+
+logger = logging.getLogger(__name__)
+
+# MySQL命名锁，多个worker中同一时间只有一个转发outbox（保证同一分片的事件按提交顺序追加）
+RELAY_LOCK_NAME = "outbox_relay"
+
+
+def stream_key(aggregate_type: str) -> str:
+    """聚合类型对应的Stream（同时也是PUBLISH频道名），如events:users"""
+    return f"events:{aggregate_type}"
+
+
+async def record_event(conn, aggregate_type: str, aggregate_id: int, event_type: str,
+                       payload: Optional[Dict[str, Any]] = None) -> None:
+    """在业务写入所在的事务中写入outbox事件（与业务数据一起提交或回滚）"""
+    async with conn.cursor() as cursor:
+        await cursor.execute(
+            """
+            INSERT INTO outbox_events (aggregate_type, aggregate_id, event_type, payload)
+            VALUES (%s, %s, %s, %s)
+            """,
+            (aggregate_type, aggregate_id, event_type, json.dumps(payload or {}, default=str))
+        )
+    metrics.inc("outbox_events_recorded_total", type=event_type)
+
+
+def _to_stream_event(row: Tuple, shard: int = 0) -> Tuple[str, Dict[str, str]]:
+    event_id, aggregate_type, aggregate_id, event_type, payload, created_at = row
+    occurred_at = created_at.isoformat() if isinstance(created_at, datetime) else str(created_at)
+    return stream_key(aggregate_type), {
+        # 各分片的outbox_events各自自增，其他分片的事件ID带分片前缀以保持唯一
+        "event_id": str(event_id) if shard == 0 else f"{shard}-{event_id}",
+        "type": event_type,
+        "aggregate_id": str(aggregate_id),
+        "payload": payload,
+        "occurred_at": occurred_at,
+    }
+
+
+class OutboxRelay:
+    """把outbox_events中已提交的事件批量转发到Redis Streams，转发成功后删除
+
+    Redis不可用时事件保留在表中，下一轮重试（至少一次投递，消费者按event_id去重）。
+    写入后调用wake()立即转发，否则每OUTBOX_POLL_INTERVAL秒检查一次。
+    """
+
+    def __init__(self):
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def _event(self) -> asyncio.Event:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        return self._wakeup
+
+    def wake(self) -> None:
+        """有新事件提交时唤醒转发循环"""
+        self._event().set()
+
+    async def relay_batch(self, conn, redis_service, shard: int = 0) -> Optional[int]:
+        """转发一批事件，返回转发数；Redis写入失败时返回None，事件不删除
+
+        不在这里抛出异常：调用方仍持有MySQL连接，Redis故障不应表现为数据库连接上的错误。
+        """
+        async with conn.cursor() as cursor:
+            await cursor.execute(
+                """
+                SELECT id, aggregate_type, aggregate_id, event_type, payload, created_at
+                FROM outbox_events ORDER BY id LIMIT %s
+                """,
+                (settings.OUTBOX_BATCH_SIZE,)
+            )
+            rows: List[Tuple] = list(await cursor.fetchall())
+        if not rows:
+            return 0
+
+        if not await redis_service.publish_events([_to_stream_event(row, shard) for row in rows], settings.OUTBOX_STREAM_MAXLEN):
+            return None
+
+        ids = [row[0] for row in rows]
+        placeholders = ", ".join(["%s"] * len(ids))
+        async with conn.cursor() as cursor:
+            await cursor.execute(f"DELETE FROM outbox_events WHERE id IN ({placeholders})", ids)
+        metrics.inc("outbox_events_relayed_total", len(ids))
+        return len(ids)
+
+    async def relay_pending(self) -> int:
+        """转发所有分片的待发送事件，返回转发数"""
+        db_service = await get_database_service()
+        total = 0
+        for shard in range(db_service.shard_count):
+            total += await self.relay_shard(shard)
+        return total
+
+    async def relay_shard(self, shard: int) -> int:
+        """转发单个分片的待发送事件（其他worker正在转发该分片时直接返回0）
+
+        命名锁属于连接会话，所以加锁、读取和删除都使用同一个连接；Redis写入失败时先释放锁和连接，再抛出ConnectionError。
+        """
+        lock_name = shard_lock_name(RELAY_LOCK_NAME, shard)
+        db_service = await get_database_service()
+        redis_service = await get_redis_service()
+        total = 0
+        async with db_service.get_connection(shard) as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT GET_LOCK(%s, 0)", (lock_name,))
+                (acquired,) = await cursor.fetchone()
+            if not acquired:
+                return 0
+            try:
+                while True:
+                    relayed = await self.relay_batch(conn, redis_service, shard)
+                    if relayed is None:
+                        break
+                    total += relayed
+                    if relayed < settings.OUTBOX_BATCH_SIZE:
+                        return total
+            finally:
+                async with conn.cursor() as cursor:
+                    await cursor.execute("SELECT RELEASE_LOCK(%s)", (lock_name,))
+        raise ConnectionError(f"Failed to publish outbox events to Redis ({total} relayed from shard {shard})")
+
+    async def run(self) -> None:
+        """后台转发循环：被唤醒或每OUTBOX_POLL_INTERVAL秒执行一轮，失败时按间隔重试"""
+        while True:
+            self._event().clear()
+            try:
+                relayed = await self.relay_pending()
+                if relayed:
+                    logger.debug(f"📨 Relayed {relayed} outbox events")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.inc("outbox_relay_failures_total")
+                logger.error(f"❌ Outbox relay failed: {e}")
+            try:
+                await asyncio.wait_for(self._event().wait(), settings.OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+
+# 全局outbox转发实例
+outbox_relay = OutboxRelay()
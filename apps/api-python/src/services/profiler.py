@@ -0,0 +1,161 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# 栈帧：(函数名, 文件, 函数定义行号)，按函数聚合而不是按执行行
+Frame = Tuple[str, str, int]
+
+
+def _format_frame(frame: Frame) -> str:
+    name, filename, line = frame
+    return f"{name} ({filename}:{line})"
+
+
+class StackSamples:
+    """采样结果：每个线程的调用栈（从根到叶）及出现次数"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.duration = 0.0
+        self.sample_count = 0
+        self.counts: Dict[Tuple[str, Tuple[Frame, ...]], int] = defaultdict(int)
+
+    def to_collapsed(self) -> str:
+        """collapsed格式（flamegraph.pl / speedscope均可导入）：线程;帧;帧 次数"""
+        lines = []
+        for (thread_name, stack), count in sorted(self.counts.items(), key=lambda item: -item[1]):
+            frames = ";".join(_format_frame(frame).replace(";", ":") for frame in stack)
+            lines.append(f"{thread_name};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def to_speedscope(self, name: str) -> Dict[str, Any]:
+        """speedscope文件格式（每个线程一个sampled profile）"""
+        frame_index: Dict[Frame, int] = {}
+        frames: List[Dict[str, Any]] = []
+        profiles: Dict[str, Dict[str, Any]] = {}
+        for (thread_name, stack), count in self.counts.items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                indexes.append(frame_index[frame])
+            profile = profiles.setdefault(thread_name, {
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(self.duration, 6),
+                "samples": [],
+                "weights": [],
+            })
+            profile["samples"].append(indexes)
+            profile["weights"].append(round(count * self.interval, 6))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": settings.APP_NAME,
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values()),
+        }
+
+
+class SamplingProfiler:
+    """基于sys._current_frames的采样分析器（在独立线程中采样当前worker的所有线程）
+
+    不需要预先插桩，未运行时没有任何开销；同一worker同一时间只允许一个采样会话。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def sample(self, seconds: float, interval: float) -> StackSamples:
+        """阻塞采样seconds秒（应在线程池中调用），已有会话时抛出RuntimeError"""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A sampling session is already running in this worker")
+        try:
+            result = StackSamples(interval)
+            own_thread = threading.get_ident()
+            started = time.perf_counter()
+            deadline = started + seconds
+            while True:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                        frame = frame.f_back
+                    stack.reverse()
+                    result.counts[(thread_names.get(thread_id, str(thread_id)), tuple(stack))] += 1
+                result.sample_count += 1
+                time.sleep(max(0.0, interval - (time.perf_counter() - now)))
+            result.duration = time.perf_counter() - started
+            return result
+        finally:
+            self._lock.release()
+
+
+class RequestProfiles:
+    """单请求cProfile报告（按profile id保留最近PROFILING_REPORTS_KEPT份）"""
+
+    def __init__(self):
+        self._reports: "OrderedDict[str, str]" = OrderedDict()
+        self._active = False
+
+    def start(self) -> Optional[cProfile.Profile]:
+        """开始分析；已有请求在分析时返回None（cProfile作用于整个事件循环线程，不能嵌套）"""
+        if self._active:
+            return None
+        self._active = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def finish(self, profile_id: str, profiler: cProfile.Profile, elapsed: float) -> str:
+        """结束分析，保存完整报告并返回摘要（自身耗时最多的函数）"""
+        profiler.disable()
+        self._active = False
+
+        stats = pstats.Stats(profiler)
+        top = sorted(stats.stats.items(), key=lambda item: -item[1][2])[:settings.PROFILING_SUMMARY_FUNCTIONS]
+        summary = ", ".join(
+            f"{os.path.basename(filename)}:{line}({name})={tottime * 1000:.1f}ms"
+            for (filename, line, name), (_, _, tottime, _, _) in top
+        )
+
+        buffer = io.StringIO()
+        report = pstats.Stats(profiler, stream=buffer)
+        report.sort_stats("cumulative").print_stats(settings.PROFILING_REPORT_LINES)
+        self._reports[profile_id] = f"elapsed: {elapsed * 1000:.1f}ms\n{buffer.getvalue()}"
+        while len(self._reports) > settings.PROFILING_REPORTS_KEPT:
+            self._reports.popitem(last=False)
+        return f"total={elapsed * 1000:.1f}ms; {summary}"
+
+    def get(self, profile_id: str) -> Optional[str]:
+        return self._reports.get(profile_id)
+
+
+# 全局采样分析器和请求分析报告
+sampling_profiler = SamplingProfiler()
+request_profiles = RequestProfiles()
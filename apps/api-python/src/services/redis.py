@@ -1,15 +1,61 @@
 import redis.asyncio as redis
+from redis.asyncio.cluster import ClusterNode, RedisCluster
+from redis.asyncio.sentinel import Sentinel
+import asyncio
 import os
 import json
-from typing import Any, Optional
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 import logging
 from ..config.settings import settings
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, breaker_options, get_circuit_breaker
+from .metrics import metrics
+from .deadline import wait_with_budget
+from .tracing import span
 
 logger = logging.getLogger(__name__)
 
+# 计入熔断统计的异常：连接/超时类故障
+REDIS_FAILURE_EXCEPTIONS = (
+    redis.ConnectionError,
+    redis.TimeoutError,
+    asyncio.TimeoutError,
+    ConnectionError,
+    OSError,
+)
+
+# 仅当key存在时INCRBY，避免在计数器未初始化时从0开始累加
+_INCR_IF_EXISTS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return nil
+"""
+
+REDIS_MODES = ("standalone", "sentinel", "cluster")
+
+
+def parse_address(entry: str) -> Tuple[str, int]:
+    """解析"host:port"（省略端口时为6379）"""
+    host, _, port = entry.strip().rpartition(":")
+    if not host:
+        return port, 6379
+    return host, int(port)
+
+
+def hash_tag(value: Any) -> str:
+    """集群hash tag：key中{}内的部分决定槽位，需要放在同一节点的key（同一Lua脚本、RENAME的
+    源和目标、同一邮箱的限流与验证码数据等）使用相同的tag，如f"{hash_tag(email)}:code"
+    """
+    return f"{{{value}}}"
+
+
 class RedisService:
     _instance: Optional['RedisService'] = None
     _client: Optional[redis.Redis] = None
+    # 集群模式下用于pub/sub的单节点连接（集群客户端不支持订阅，PUBLISH会广播到所有节点）
+    _pubsub_client: Optional[redis.Redis] = None
+    _init_lock: Optional[asyncio.Lock] = None
     
     def __new__(cls):
         if cls._instance is None:
@@ -20,36 +66,122 @@ class RedisService:
     async def initialize(cls) -> 'RedisService':
         """初始化Redis连接"""
         instance = cls()
-        if cls._client is None:
+        if cls._client is not None:
+            return instance
+        if cls._init_lock is None:
+            cls._init_lock = asyncio.Lock()
+        async with cls._init_lock:
+            if cls._client is not None:
+                return instance
             try:
-                cls._client = redis.Redis(
-                    host=settings.REDIS_HOST,
-                    port=settings.REDIS_PORT,
-                    password=settings.REDIS_PASSWORD,
-                    db=settings.REDIS_DB,
-                    decode_responses=True,
-                    socket_connect_timeout=10,
-                    socket_timeout=settings.REDIS_TIMEOUT,
-                    retry_on_timeout=True,
-                    health_check_interval=30
-                )
-                # Test connection
-                await cls._client.ping()
-                logger.info(f"✅ Redis connection established successfully (Environment: {settings.ENVIRONMENT})")
+                client = cls._create_client()
+                # Test connection（成功后才保存客户端，失败时允许重试初始化）
+                await client.ping()
+                cls._client = client
+                logger.info(f"✅ Redis connection established successfully (Environment: {settings.ENVIRONMENT}, mode: {settings.REDIS_MODE})")
                 logger.debug(f"🔍 Redis config: {settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}")
             except Exception as e:
                 logger.error(f"❌ Redis connection failed: {e}")
                 raise e
         return instance
     
+    @staticmethod
+    def _connection_options() -> Dict[str, Any]:
+        return dict(
+            password=settings.REDIS_PASSWORD or None,
+            decode_responses=True,
+            socket_connect_timeout=10,
+            socket_timeout=settings.REDIS_TIMEOUT,
+            health_check_interval=30,
+        )
+    
+    @classmethod
+    def _create_client(cls) -> redis.Redis:
+        """按REDIS_MODE创建客户端，三种模式对外提供相同的命令接口"""
+        options = cls._connection_options()
+        if settings.REDIS_MODE == "cluster":
+            # 集群模式只有db 0；客户端缓存槽位映射，MOVED/ASK时自动刷新
+            nodes = settings.REDIS_CLUSTER_NODES or [f"{settings.REDIS_HOST}:{settings.REDIS_PORT}"]
+            return RedisCluster(
+                startup_nodes=[ClusterNode(*parse_address(node)) for node in nodes],
+                **options
+            )
+        if settings.REDIS_MODE == "sentinel":
+            if not settings.REDIS_SENTINELS:
+                raise ValueError("REDIS_SENTINELS is required when REDIS_MODE=sentinel")
+            # 每次建立连接时向哨兵询问当前主节点，故障转移后新连接自动指向新主节点
+            sentinel = Sentinel(
+                [parse_address(node) for node in settings.REDIS_SENTINELS],
+                sentinel_kwargs={
+                    "password": settings.REDIS_SENTINEL_PASSWORD,
+                    "socket_timeout": settings.REDIS_OPERATION_TIMEOUT,
+                },
+            )
+            return sentinel.master_for(
+                settings.REDIS_SENTINEL_MASTER, db=settings.REDIS_DB, retry_on_timeout=True, **options
+            )
+        if settings.REDIS_MODE != "standalone":
+            raise ValueError(f"Unknown REDIS_MODE {settings.REDIS_MODE!r}, expected one of {REDIS_MODES}")
+        return redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            retry_on_timeout=True,
+            **options
+        )
+    
     @classmethod
     async def close(cls):
         """关闭Redis连接"""
+        if cls._pubsub_client:
+            await cls._pubsub_client.close()
+            cls._pubsub_client = None
         if cls._client:
             await cls._client.close()
             cls._client = None
             logger.info("✅ Redis connection closed")
     
+    @property
+    def client(self) -> redis.Redis:
+        """底层客户端（用于阻塞读取等不适合经熔断器和单次超时限制的长时间调用）"""
+        if self._client is None:
+            raise RuntimeError("Redis client not initialized")
+        return self._client
+    
+    def pubsub(self) -> redis.client.PubSub:
+        """创建pub/sub订阅（集群模式下连接到任一节点，PUBLISH在集群内广播）"""
+        client = self.client
+        if isinstance(client, RedisCluster):
+            if self._pubsub_client is None:
+                node = client.get_random_node()
+                type(self)._pubsub_client = redis.Redis(host=node.host, port=node.port, **self._connection_options())
+            client = self._pubsub_client
+        return client.pubsub(ignore_subscribe_messages=True)
+    
+    @staticmethod
+    def get_breaker() -> Optional[CircuitBreaker]:
+        """Redis熔断器（未启用时返回None）"""
+        if not settings.CIRCUIT_BREAKER_ENABLED:
+            return None
+        return get_circuit_breaker(
+            "redis",
+            recorded_exceptions=REDIS_FAILURE_EXCEPTIONS,
+            **breaker_options(settings)
+        )
+    
+    async def _execute(self, op: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """经熔断器执行Redis命令，单次调用受REDIS_OPERATION_TIMEOUT和请求剩余时间限制"""
+        breaker = self.get_breaker()
+        started = time.monotonic()
+        try:
+            with span(f"redis {op}", kind="client", **{"db.system": "redis", "db.operation": op}):
+                if breaker is None:
+                    return await wait_with_budget(call(), settings.REDIS_OPERATION_TIMEOUT)
+                async with breaker.guard():
+                    return await wait_with_budget(call(), settings.REDIS_OPERATION_TIMEOUT)
+        finally:
+            metrics.observe("redis_command_seconds", time.monotonic() - started, op=op)
+    
     async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
         """设置缓存值"""
         try:
@@ -57,10 +189,13 @@ class RedisService:
                 value = json.dumps(value)
             
             if ttl:
-                await self._client.setex(key, ttl, value)
+                await self._execute("set", lambda: self._client.setex(key, ttl, value))
             else:
-                await self._client.set(key, value)
+                await self._execute("set", lambda: self._client.set(key, value))
             return True
+        except CircuitOpenError:
+            metrics.inc("redis_cache_bypass_total", op="set")
+            return False
         except Exception as e:
             logger.error(f"❌ Redis set failed for key {key}: {e}")
             return False
@@ -68,24 +203,228 @@ class RedisService:
     async def get(self, key: str) -> Optional[Any]:
         """获取缓存值"""
         try:
-            value = await self._client.get(key)
-            if value is None:
-                return None
-            
-            # Try to parse as JSON
-            try:
-                return json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                return value
+            value = await self._execute("get", lambda: self._client.get(key))
+            return self._decode(value)
+        except CircuitOpenError:
+            # 熔断期间绕过缓存，按未命中处理
+            metrics.inc("redis_cache_bypass_total", op="get")
+            return None
         except Exception as e:
             logger.error(f"❌ Redis get failed for key {key}: {e}")
             return None
     
+    @staticmethod
+    def _decode(value: Any) -> Optional[Any]:
+        if value is None:
+            return None
+        
+        # Try to parse as JSON
+        try:
+            return json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return value
+    
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """批量获取缓存值（一次MGET；集群模式下按槽位拆分为多个MGET并在一次pipeline中发送），未命中的位置为None"""
+        if not keys:
+            return []
+        
+        def read():
+            if isinstance(self._client, RedisCluster):
+                return self._client.mget_nonatomic(keys)
+            return self._client.mget(keys)
+        
+        try:
+            values = await self._execute("mget", read)
+            return [self._decode(value) for value in values]
+        except CircuitOpenError:
+            metrics.inc("redis_cache_bypass_total", op="mget")
+            return [None] * len(keys)
+        except Exception as e:
+            logger.error(f"❌ Redis mget failed for {len(keys)} keys: {e}")
+            return [None] * len(keys)
+    
+    async def mset(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """批量设置缓存值（单次pipeline往返；集群模式下pipeline按节点拆分）"""
+        if not mapping:
+            return True
+        
+        async def write():
+            async with self._client.pipeline(transaction=False) as pipe:
+                for key, value in mapping.items():
+                    if isinstance(value, (dict, list)):
+                        value = json.dumps(value)
+                    if ttl:
+                        pipe.setex(key, ttl, value)
+                    else:
+                        pipe.set(key, value)
+                return await pipe.execute()
+        
+        try:
+            await self._execute("mset", write)
+            return True
+        except CircuitOpenError:
+            metrics.inc("redis_cache_bypass_total", op="mset")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Redis mset failed for {len(mapping)} keys: {e}")
+            return False
+    
+    async def set_if_absent(self, key: str, value: Any, ttl: int) -> bool:
+        """key不存在时设置（SET NX EX），用于简单分布式锁"""
+        try:
+            result = await self._execute("set_nx", lambda: self._client.set(key, value, nx=True, ex=ttl))
+            return bool(result)
+        except CircuitOpenError:
+            metrics.inc("redis_cache_bypass_total", op="set_nx")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Redis set_if_absent failed for key {key}: {e}")
+            return False
+    
+    async def incr_if_exists(self, key: str, delta: int = 1) -> Optional[int]:
+        """key存在时原子增减，key不存在时不创建（返回None）"""
+        try:
+            return await self._execute(
+                "incr_if_exists",
+                lambda: self._client.eval(_INCR_IF_EXISTS_SCRIPT, 1, key, delta)
+            )
+        except CircuitOpenError:
+            metrics.inc("redis_cache_bypass_total", op="incr_if_exists")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Redis incr_if_exists failed for key {key}: {e}")
+            return None
+    
+    async def eval(self, script: str, keys: List[str], args: List[Any]) -> Any:
+        """执行Lua脚本，失败时返回None"""
+        try:
+            return await self._execute("eval", lambda: self._client.eval(script, len(keys), *keys, *args))
+        except CircuitOpenError:
+            metrics.inc("redis_cache_bypass_total", op="eval")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Redis eval failed for keys {keys}: {e}")
+            return None
+    
+    async def eval_many(self, script: str, calls: List[Tuple[List[str], List[Any]]]) -> bool:
+        """在一次pipeline往返中对多组keys/args执行同一个Lua脚本"""
+        if not calls:
+            return True
+        
+        async def run():
+            async with self._client.pipeline(transaction=False) as pipe:
+                for keys, args in calls:
+                    pipe.eval(script, len(keys), *keys, *args)
+                return await pipe.execute()
+        
+        try:
+            await self._execute("eval_many", run)
+            return True
+        except CircuitOpenError:
+            metrics.inc("redis_cache_bypass_total", op="eval_many")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Redis eval_many failed for {len(calls)} calls: {e}")
+            return False
+    
+    async def publish_events(self, events: List[Tuple[str, Dict[str, str]]], maxlen: int) -> bool:
+        """用pipeline把事件追加到各自的Stream（XADD MAXLEN ~），再PUBLISH到同名频道
+        
+        事件为(stream, fields)；频道消息带上Stream条目ID，订阅者可据此从Stream续读。
+        XADD成功即视为已发布（返回True）：PUBLISH失败只影响实时推送，订阅者重连时从Stream补发，
+        此时返回False会让outbox重试并在Stream中写入重复事件。
+        """
+        if not events:
+            return True
+        
+        # 集群中PUBLISH不属于任何槽位，发给默认节点即可（在集群内广播）
+        publish_options = {"target_nodes": RedisCluster.DEFAULT_NODE} if isinstance(self._client, RedisCluster) else {}
+        
+        async def append():
+            async with self._client.pipeline(transaction=False) as pipe:
+                for stream, fields in events:
+                    pipe.xadd(stream, fields, maxlen=maxlen, approximate=True)
+                return await pipe.execute()
+        
+        try:
+            entry_ids = await self._execute("xadd_events", append)
+        except CircuitOpenError:
+            metrics.inc("redis_cache_bypass_total", op="xadd_events")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Redis publish_events failed for {len(events)} events: {e}")
+            return False
+        
+        async def notify():
+            async with self._client.pipeline(transaction=False) as pipe:
+                for (stream, fields), entry_id in zip(events, entry_ids):
+                    pipe.execute_command("PUBLISH", stream, json.dumps({"id": entry_id, **fields}), **publish_options)
+                return await pipe.execute()
+        
+        try:
+            await self._execute("publish_events", notify)
+        except Exception as e:
+            metrics.inc("redis_event_publish_failures_total")
+            logger.warning(f"⚠️ Redis PUBLISH failed for {len(events)} events already in streams: {e}")
+        return True
+    
+    async def xrange(self, stream: str, start: str, count: int) -> Optional[List[Tuple[str, Dict[str, str]]]]:
+        """读取Stream中start之后的条目（start为"(ID"时不含该ID），失败时返回None"""
+        try:
+            return await self._execute("xrange", lambda: self._client.xrange(stream, min=start, max="+", count=count))
+        except CircuitOpenError:
+            metrics.inc("redis_cache_bypass_total", op="xrange")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Redis xrange failed for stream {stream}: {e}")
+            return None
+    
+    async def last_entry_id(self, stream: str) -> Optional[str]:
+        """Stream中最后一个条目的ID（XREVRANGE COUNT 1），Stream为空时为"0-0"，失败时返回None"""
+        try:
+            entries = await self._execute("xrevrange", lambda: self._client.xrevrange(stream, count=1))
+            return entries[0][0] if entries else "0-0"
+        except CircuitOpenError:
+            metrics.inc("redis_cache_bypass_total", op="xrevrange")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Redis xrevrange failed for stream {stream}: {e}")
+            return None
+    
+    async def zrangebylex(self, key: str, lower: Any, upper: Any, offset: int, count: int) -> List[str]:
+        """按字典序范围读取有序集合成员（lower/upper使用ZRANGEBYLEX的[/(语法）"""
+        try:
+            return await self._execute(
+                "zrangebylex",
+                lambda: self._client.zrangebylex(key, lower, upper, start=offset, num=count)
+            )
+        except CircuitOpenError:
+            metrics.inc("redis_cache_bypass_total", op="zrangebylex")
+            return []
+        except Exception as e:
+            logger.error(f"❌ Redis zrangebylex failed for key {key}: {e}")
+            return []
+    
+    async def rename(self, key: str, new_key: str) -> bool:
+        """重命名key（原子替换目标key）"""
+        try:
+            return bool(await self._execute("rename", lambda: self._client.rename(key, new_key)))
+        except CircuitOpenError:
+            metrics.inc("redis_cache_bypass_total", op="rename")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Redis rename failed for key {key}: {e}")
+            return False
+    
     async def delete(self, key: str) -> bool:
         """删除缓存值"""
         try:
-            result = await self._client.delete(key)
+            result = await self._execute("delete", lambda: self._client.delete(key))
             return result > 0
+        except CircuitOpenError:
+            metrics.inc("redis_cache_bypass_total", op="delete")
+            return False
         except Exception as e:
             logger.error(f"❌ Redis delete failed for key {key}: {e}")
             return False
@@ -93,8 +432,11 @@ class RedisService:
     async def exists(self, key: str) -> bool:
         """检查key是否存在"""
         try:
-            result = await self._client.exists(key)
+            result = await self._execute("exists", lambda: self._client.exists(key))
             return result > 0
+        except CircuitOpenError:
+            metrics.inc("redis_cache_bypass_total", op="exists")
+            return False
         except Exception as e:
             logger.error(f"❌ Redis exists check failed for key {key}: {e}")
             return False
@@ -102,8 +444,11 @@ class RedisService:
     async def expire(self, key: str, ttl: int) -> bool:
         """设置key过期时间"""
         try:
-            result = await self._client.expire(key, ttl)
+            result = await self._execute("expire", lambda: self._client.expire(key, ttl))
             return result
+        except CircuitOpenError:
+            metrics.inc("redis_cache_bypass_total", op="expire")
+            return False
         except Exception as e:
             logger.error(f"❌ Redis expire failed for key {key}: {e}")
             return False
@@ -111,7 +456,7 @@ class RedisService:
     async def health_check(self) -> bool:
         """Redis健康检查"""
         try:
-            response = await self._client.ping()
+            response = await self._execute("ping", lambda: self._client.ping())
             return response is True
         except Exception as e:
             logger.error(f"❌ Redis health check failed: {e}")
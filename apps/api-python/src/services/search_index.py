@@ -0,0 +1,216 @@
+import base64
+import binascii
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+import aiomysql
+
+from ..config.settings import settings
+from .database import get_database_service
+from .metrics import metrics
+from .redis import RedisService, get_redis_service
+
+logger = logging.getLogger(__name__)
+
+# 所有key使用同一个hash tag，保证Lua脚本涉及的key落在同一个slot
+INDEX_KEY = "{users:search}:index"
+REBUILD_KEY = "{users:search}:rebuild"
+REBUILD_MARKER_KEY = "{users:search}:rebuilding"
+
+# 成员格式：term \x00 field \x00 user_id，所有成员score为0，按字典序排列
+SEPARATOR = "\x00"
+INDEXED_FIELDS = ("username", "name", "email")
+
+# 替换一个用户的全部词条：删除旧词条，写入新词条，并记录到用户的词条集合
+# KEYS: 索引, 用户词条集合, 重建中的临时索引, 重建标记；ARGV: 新词条
+_REPLACE_TERMS_SCRIPT = """
+local old = redis.call('SMEMBERS', KEYS[2])
+local rebuilding = redis.call('EXISTS', KEYS[4]) == 1
+if #old > 0 then
+    redis.call('ZREM', KEYS[1], unpack(old))
+    if rebuilding then
+        redis.call('ZREM', KEYS[3], unpack(old))
+    end
+end
+redis.call('DEL', KEYS[2])
+for i = 1, #ARGV do
+    redis.call('ZADD', KEYS[1], 0, ARGV[i])
+    if rebuilding then
+        redis.call('ZADD', KEYS[3], 0, ARGV[i])
+    end
+end
+if #ARGV > 0 then
+    redis.call('SADD', KEYS[2], unpack(ARGV))
+end
+return #ARGV
+"""
+
+
+def terms_key(user_id: int) -> str:
+    """用户当前词条集合的key（更新/删除时用于清理旧词条）"""
+    return f"{{users:search}}:terms:{user_id}"
+
+
+def normalize_term(value: str) -> str:
+    """统一为小写并截断"""
+    return " ".join(value.lower().split())[:settings.SEARCH_MAX_TERM_LENGTH]
+
+
+def user_terms(user_id: int, username: Optional[str], name: Optional[str], email: Optional[str]) -> List[str]:
+    """生成用户的索引成员：用户名、姓名（整体及每个单词）、邮箱@之前的部分"""
+    values: Dict[str, List[str]] = {
+        "username": [username or ""],
+        "name": [name or ""] + (name or "").split(),
+        "email": [(email or "").split("@", 1)[0]],
+    }
+    members = []
+    for field in INDEXED_FIELDS:
+        for term in dict.fromkeys(normalize_term(value) for value in values[field]):
+            if term:
+                members.append(f"{term}{SEPARATOR}{field}{SEPARATOR}{user_id}")
+    return members
+
+
+def encode_cursor(member: str) -> str:
+    return base64.urlsafe_b64encode(member.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> str:
+    """解析翻页游标，格式不合法时抛出ValueError"""
+    try:
+        return base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+    except (binascii.Error, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+class UserSearchIndex:
+    """基于Redis有序集合字典序的用户前缀搜索索引"""
+
+    @staticmethod
+    async def _get_redis() -> Optional[RedisService]:
+        try:
+            return await get_redis_service()
+        except Exception as e:
+            logger.warning(f"⚠️ Search index unavailable: {e}")
+            return None
+
+    @staticmethod
+    def _script_call(user_id: int, members: List[str], index_key: str = INDEX_KEY) -> Tuple[List[str], List[Any]]:
+        return [index_key, terms_key(user_id), REBUILD_KEY, REBUILD_MARKER_KEY], members
+
+    async def index_user(self, user) -> None:
+        """写入/更新用户的索引词条（失败只记录日志，可通过重建修复）"""
+        redis_service = await self._get_redis()
+        if redis_service is None:
+            return
+        keys, args = self._script_call(user.id, user_terms(user.id, user.username, user.name, user.email))
+        await redis_service.eval(_REPLACE_TERMS_SCRIPT, keys, args)
+
+    async def remove_user(self, user_id: int) -> None:
+        """删除用户的全部索引词条"""
+        redis_service = await self._get_redis()
+        if redis_service is None:
+            return
+        keys, args = self._script_call(user_id, [])
+        await redis_service.eval(_REPLACE_TERMS_SCRIPT, keys, args)
+
+    async def search(self, query: str, limit: int, cursor: Optional[str] = None) -> Optional[Tuple[List[int], Optional[str]]]:
+        """前缀搜索，返回 (去重后的用户ID, 下一页游标)；索引不可用时返回None
+
+        同一用户可能通过多个字段命中，页内去重；跨页可能重复出现。
+        """
+        prefix = normalize_term(query)
+        if not prefix:
+            return [], None
+        redis_service = await self._get_redis()
+        if redis_service is None:
+            return None
+
+        if cursor is not None:
+            last_member = decode_cursor(cursor)
+            if not last_member.startswith(prefix):
+                raise ValueError("Cursor does not belong to this query")
+            lower = f"({last_member}"
+        else:
+            lower = f"[{prefix}"
+        # \xff大于任何UTF-8字节，作为前缀范围的上界
+        upper = b"[" + prefix.encode("utf-8") + b"\xff"
+
+        started = time.monotonic()
+        user_ids: List[int] = []
+        batch = limit * 2
+        next_cursor: Optional[str] = None
+        while True:
+            members = await redis_service.zrangebylex(INDEX_KEY, lower, upper, 0, batch)
+            for member in members:
+                user_id = int(member.rsplit(SEPARATOR, 1)[1])
+                if user_id not in user_ids:
+                    user_ids.append(user_id)
+                    if len(user_ids) == limit:
+                        next_cursor = encode_cursor(member)
+                        break
+            if next_cursor is not None or len(members) < batch:
+                break
+            lower = f"({members[-1]}"
+
+        metrics.observe("user_search_seconds", time.monotonic() - started)
+        return user_ids, next_cursor
+
+    async def rebuild(self, chunk_size: Optional[int] = None) -> int:
+        """按主键分块流式读取users表重建索引，完成后原子替换
+
+        重建期间的增量写入同时写入临时索引，替换后不会丢失。
+        """
+        chunk_size = chunk_size or settings.SEARCH_REBUILD_CHUNK_SIZE
+        redis_service = await self._get_redis()
+        if redis_service is None:
+            raise RuntimeError("Redis is unavailable")
+        if not await redis_service.set_if_absent(REBUILD_MARKER_KEY, "1", ttl=settings.SEARCH_REBUILD_LOCK_TTL):
+            raise RuntimeError("Search index rebuild already in progress")
+
+        try:
+            await redis_service.delete(REBUILD_KEY)
+            db_service = await get_database_service()
+            indexed = 0
+            for shard in range(db_service.shard_count):
+                last_id = 0
+                while True:
+                    async with db_service.get_connection(shard) as conn:
+                        async with conn.cursor(aiomysql.DictCursor) as cursor:
+                            await cursor.execute(
+                                "SELECT id, username, name, email FROM users "
+                                "WHERE id > %s AND deleted_at IS NULL ORDER BY id LIMIT %s",
+                                (last_id, chunk_size)
+                            )
+                            rows = await cursor.fetchall()
+                    if not rows:
+                        break
+
+                    calls = [
+                        self._script_call(
+                            row["id"],
+                            user_terms(row["id"], row["username"], row["name"], row["email"]),
+                            index_key=REBUILD_KEY
+                        )
+                        for row in rows
+                    ]
+                    if not await redis_service.eval_many(_REPLACE_TERMS_SCRIPT, calls):
+                        raise RuntimeError(f"Failed to index users after id {last_id} on shard {shard}")
+                    indexed += len(rows)
+                    last_id = rows[-1]["id"]
+                    logger.info(f"🔎 Search index rebuild: {indexed} users indexed (last id {last_id})")
+
+            if indexed:
+                if not await redis_service.rename(REBUILD_KEY, INDEX_KEY):
+                    raise RuntimeError("Failed to swap rebuilt search index")
+            else:
+                await redis_service.delete(INDEX_KEY)
+            metrics.set_gauge("user_search_indexed_users", indexed)
+            return indexed
+        finally:
+            await redis_service.delete(REBUILD_MARKER_KEY)
+
+
+# 全局用户搜索索引实例
+user_search_index = UserSearchIndex()
@@ -0,0 +1,61 @@
+import asyncio
+import heapq
+import zlib
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Tuple, TypeVar
+
+from ..config.settings import settings
+from .snowflake import shard_of
+
+T = TypeVar("T")
+
+
+def parse_shard(entry: str) -> Tuple[str, int, str]:
+    """解析DB_SHARDS中的分片：库名，或host:port/库名"""
+    if "/" not in entry:
+        return settings.DB_HOST, settings.DB_PORT, entry
+    address, _, database = entry.partition("/")
+    host, _, port = address.partition(":")
+    return host or settings.DB_HOST, int(port) if port else settings.DB_PORT, database
+
+
+def shard_count() -> int:
+    """用户分片数：分片0为主库DB_DATABASE，其余为DB_SHARDS（分片数确定后不能再修改）"""
+    return 1 + len(settings.DB_SHARDS)
+
+
+def shard_for_id(user_id: int) -> Optional[int]:
+    """按用户ID路由（分片编码在雪花ID中）；编码的分片未配置时返回None（不可能存在的ID，按未找到处理）"""
+    shard = shard_of(user_id)
+    if shard >= shard_count():
+        return None
+    return shard
+
+
+def shard_for_email(email: str) -> int:
+    """新用户按邮箱哈希分配分片，按邮箱查询时可以直接定位"""
+    return zlib.crc32(email.strip().lower().encode()) % shard_count()
+
+
+def shard_lock_name(name: str, shard: int) -> str:
+    """分片上后台任务的MySQL命名锁（命名锁按实例生效，同一实例上的分片需要不同的锁名）"""
+    return name if shard == 0 else f"{name}:{shard}"
+
+
+def group_by_shard(user_ids: Iterable[int]) -> List[Tuple[int, List[int]]]:
+    """把ID按分片分组（保持各组内的原有顺序，跳过属于未配置分片的ID）"""
+    groups: dict = {}
+    for user_id in user_ids:
+        shard = shard_for_id(user_id)
+        if shard is not None:
+            groups.setdefault(shard, []).append(user_id)
+    return sorted(groups.items())
+
+
+async def scatter(fn: Callable[[int], Awaitable[T]]) -> List[T]:
+    """在所有分片上并发执行，按分片顺序返回结果（任一分片失败时抛出异常）"""
+    return list(await asyncio.gather(*(fn(shard) for shard in range(shard_count()))))
+
+
+def merge_sorted(results: List[List[Any]], key: Callable[[Any], Any], reverse: bool = False) -> List[Any]:
+    """k路归并各分片已排好序的结果"""
+    return list(heapq.merge(*results, key=key, reverse=reverse))
@@ -0,0 +1,76 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import logging
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """请求合并：相同key的并发调用只执行一次，其余调用者等待同一个结果"""
+
+    def __init__(self, name: str, default_timeout: Optional[float] = None):
+        self.name = name
+        self.default_timeout = default_timeout
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    @property
+    def inflight(self) -> int:
+        """当前进行中的key数量"""
+        return len(self._calls)
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """执行fn，若相同key已在执行中则等待其结果
+
+        timeout作用于共享调用本身：超时后所有等待者都会收到TimeoutError，
+        key同时被释放，下一次调用会重新执行。
+        """
+        label = key[0] if isinstance(key, tuple) and key else self.name
+        task = self._calls.get(key)
+
+        if task is None:
+            effective_timeout = timeout if timeout is not None else self.default_timeout
+            task = asyncio.ensure_future(self._run(fn, effective_timeout))
+            self._calls[key] = task
+            task.add_done_callback(lambda _t, k=key: self._release(k, _t))
+            metrics.inc("singleflight_calls_total", group=self.name, method=label)
+        else:
+            metrics.inc("singleflight_coalesced_total", group=self.name, method=label)
+
+        metrics.set_gauge("singleflight_inflight_keys", len(self._calls), group=self.name)
+        # shield：单个调用者被取消时不影响其他等待者
+        return await asyncio.shield(task)
+
+    @staticmethod
+    async def _run(fn: Callable[[], Awaitable[Any]], timeout: Optional[float]) -> Any:
+        if timeout is None:
+            return await fn()
+        return await asyncio.wait_for(fn(), timeout)
+
+    def _release(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        metrics.set_gauge("singleflight_inflight_keys", len(self._calls), group=self.name)
+        # 所有等待者都已取消时避免"Task exception was never retrieved"警告
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"🔍 Single-flight call {key!r} failed: {task.exception()}")
+
+    def forget(self, key: Hashable) -> None:
+        """丢弃进行中的key，后续调用将重新执行（写操作后使用）"""
+        self._calls.pop(key, None)
+
+    def forget_method(self, method: str) -> None:
+        """丢弃某个方法的所有进行中key（写操作影响的参数无法逐一列出时使用，如分页、按邮箱查询）"""
+        for key in [key for key in self._calls if isinstance(key, tuple) and key and key[0] == method]:
+            del self._calls[key]
+
+
+def flight_key(method: str, *args: Any) -> Tuple[Any, ...]:
+    """构造按方法名和参数区分的合并key"""
+    return (method, *args)
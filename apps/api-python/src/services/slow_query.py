@@ -0,0 +1,162 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import re
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set
+import logging
+
+from ..config.settings import settings
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# SQL归一化：字面量和占位符替换为?，IN列表折叠，空白合并
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"%\(\w+\)s|%s")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_RE = re.compile(r"\bVALUES\s*(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+_HINT_RE = re.compile(r"/\*\+.*?\*/\s*")
+
+_EXPLAIN_RE = re.compile(r"^\s*EXPLAIN\b", re.IGNORECASE)
+
+# 可以EXPLAIN的语句
+_EXPLAINABLE_RE = re.compile(r"^\s*(SELECT|UPDATE|DELETE|INSERT|REPLACE)\b", re.IGNORECASE)
+
+
+def normalize_sql(query: str) -> str:
+    """归一化SQL：去掉字面量和参数，同一语句的不同参数得到相同结果"""
+    normalized = _HINT_RE.sub("", query)
+    normalized = _STRING_RE.sub("?", normalized)
+    normalized = _PLACEHOLDER_RE.sub("?", normalized)
+    normalized = _NUMBER_RE.sub("?", normalized)
+    normalized = _IN_LIST_RE.sub("IN (...)", normalized)
+    normalized = _VALUES_RE.sub(r"VALUES \1", normalized)
+    return _WHITESPACE_RE.sub(" ", normalized).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def redact_params(args: Any) -> Any:
+    """参数只保留类型（日志中不出现用户数据）"""
+    if args is None:
+        return None
+    if isinstance(args, dict):
+        return {key: type(value).__name__ for key, value in args.items()}
+    if isinstance(args, (list, tuple)):
+        return [type(value).__name__ for value in args]
+    return type(args).__name__
+
+
+class SlowQueryLog:
+    """慢查询记录：按指纹聚合超过SLOW_QUERY_THRESHOLD的语句，新指纹在后台执行EXPLAIN FORMAT=JSON
+
+    只在内存中按worker保存，最多保留SLOW_QUERY_MAX_FINGERPRINTS个指纹（满时丢弃最久未出现的）。
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._explain_tasks: Set[asyncio.Task] = set()
+        self._explain_slots: Optional[asyncio.Semaphore] = None
+
+    @contextmanager
+    def observe(self, query: str, args: Any) -> Iterator[None]:
+        """语句观察者：计时并记录慢语句"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            # 后台EXPLAIN本身不计入
+            if elapsed >= settings.SLOW_QUERY_THRESHOLD and not _EXPLAIN_RE.match(query):
+                self.record(query, args, elapsed)
+
+    def record(self, query: str, args: Any, elapsed: float) -> None:
+        normalized = normalize_sql(query)
+        key = fingerprint(normalized)
+        entry = self._entries.get(key)
+        is_new = entry is None
+        if is_new:
+            self._evict()
+            entry = self._entries[key] = {
+                "fingerprint": key,
+                "sql": normalized,
+                "count": 0,
+                "total_seconds": 0.0,
+                "max_seconds": 0.0,
+                "first_seen": time.time(),
+                "explain": None,
+            }
+        entry["count"] += 1
+        entry["total_seconds"] += elapsed
+        entry["max_seconds"] = max(entry["max_seconds"], elapsed)
+        entry["last_seen"] = time.time()
+        entry["last_params"] = redact_params(args)
+
+        metrics.inc("slow_queries_total")
+        metrics.observe("slow_query_seconds", elapsed)
+        logger.warning(
+            f"🐌 Slow query {elapsed * 1000:.0f}ms [{key}] {normalized} params={entry['last_params']}"
+        )
+        if is_new and settings.SLOW_QUERY_EXPLAIN and _EXPLAINABLE_RE.match(query):
+            self._schedule_explain(key, query, args)
+
+    def _evict(self) -> None:
+        while len(self._entries) >= settings.SLOW_QUERY_MAX_FINGERPRINTS:
+            oldest = min(self._entries.values(), key=lambda entry: entry["last_seen"])
+            del self._entries[oldest["fingerprint"]]
+
+    def _schedule_explain(self, key: str, query: str, args: Any) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        # 在空白上下文中执行：不继承请求的截止时间和追踪上下文
+        task = loop.create_task(self._explain(key, query, args), context=contextvars.Context())
+        self._explain_tasks.add(task)
+        task.add_done_callback(self._explain_tasks.discard)
+
+    async def _explain(self, key: str, query: str, args: Any) -> None:
+        """用实际参数执行EXPLAIN FORMAT=JSON（同一时间最多SLOW_QUERY_EXPLAIN_CONCURRENCY个）"""
+        from .database import get_database_service
+
+        if self._explain_slots is None:
+            self._explain_slots = asyncio.Semaphore(settings.SLOW_QUERY_EXPLAIN_CONCURRENCY)
+        async with self._explain_slots:
+            try:
+                db_service = await get_database_service()
+                async with db_service.get_connection() as conn:
+                    async with conn.cursor() as cursor:
+                        await asyncio.wait_for(
+                            cursor.execute(f"EXPLAIN FORMAT=JSON {_HINT_RE.sub('', query)}", args),
+                            settings.SLOW_QUERY_EXPLAIN_TIMEOUT
+                        )
+                        row = await cursor.fetchone()
+            except Exception as e:
+                logger.warning(f"⚠️ EXPLAIN failed for slow query [{key}]: {e}")
+                return
+        entry = self._entries.get(key)
+        if entry is not None and row:
+            entry["explain"] = json.loads(row[0])
+            metrics.inc("slow_query_explains_total")
+
+    def top(self, sort: str = "total_seconds", limit: int = 20) -> List[Dict[str, Any]]:
+        """按累计耗时/最大耗时/次数排序的慢语句"""
+        entries = sorted(self._entries.values(), key=lambda entry: -entry[sort])[:limit]
+        return [
+            {**entry, "avg_seconds": round(entry["total_seconds"] / entry["count"], 6)}
+            for entry in entries
+        ]
+
+    def reset(self) -> None:
+        self._entries.clear()
+
+
+# 全局慢查询记录实例
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,104 @@
+import threading
+import time
+from typing import Optional
+
+from ..config.settings import settings
+
+# 64位ID布局（最高位为0）：41位毫秒时间戳 | 6位分片 | 6位worker | 10位序号
+TIMESTAMP_BITS = 41
+SHARD_BITS = 6
+WORKER_BITS = 6
+SEQUENCE_BITS = 10
+
+MAX_SHARDS = 1 << SHARD_BITS
+MAX_WORKERS = 1 << WORKER_BITS
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+
+WORKER_SHIFT = SEQUENCE_BITS
+SHARD_SHIFT = SEQUENCE_BITS + WORKER_BITS
+TIMESTAMP_SHIFT = SEQUENCE_BITS + WORKER_BITS + SHARD_BITS
+
+# 时钟回拨不超过该毫秒数时等待追上，否则报错
+MAX_CLOCK_BACKWARDS_MS = 1000
+
+
+def shard_of(snowflake_id: int) -> int:
+    """ID所在的分片（不超过SNOWFLAKE_LEGACY_MAX_ID的旧自增ID在分片0）"""
+    if snowflake_id <= settings.SNOWFLAKE_LEGACY_MAX_ID:
+        return 0
+    return (snowflake_id >> SHARD_SHIFT) & (MAX_SHARDS - 1)
+
+
+def timestamp_of(snowflake_id: int) -> float:
+    """ID生成时间（Unix秒）"""
+    return ((snowflake_id >> TIMESTAMP_SHIFT) + settings.SNOWFLAKE_EPOCH_MS) / 1000
+
+
+class SnowflakeGenerator:
+    """雪花ID生成器：全局唯一、按时间递增，并编码所在分片
+
+    同一进程内线程安全；不同进程必须使用不同的worker id。未指定worker_id时由WorkerIdLease
+    在启动时租用（assign），租约过期或被收回（revoke）后拒绝生成ID，避免与其他进程重复。
+    """
+
+    def __init__(self, worker_id: Optional[int] = None, epoch_ms: Optional[int] = None):
+        self.worker_id = None if worker_id is None else worker_id % MAX_WORKERS
+        self.epoch_ms = settings.SNOWFLAKE_EPOCH_MS if epoch_ms is None else epoch_ms
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+        # 租约到期时间（time.monotonic()）；显式指定worker_id时为None，不过期
+        self._lease_expires: Optional[float] = None
+
+    def assign(self, worker_id: int, valid_for: float) -> None:
+        """使用租到的worker id，valid_for秒内有效（续约时再次调用extend）"""
+        with self._lock:
+            self.worker_id = worker_id % MAX_WORKERS
+            self._lease_expires = time.monotonic() + valid_for
+
+    def extend(self, valid_for: float) -> None:
+        with self._lock:
+            if self.worker_id is not None:
+                self._lease_expires = time.monotonic() + valid_for
+
+    def revoke(self) -> None:
+        """租约丢失：在重新租到worker id之前拒绝生成ID"""
+        with self._lock:
+            self.worker_id = None
+            self._lease_expires = None
+
+    def _now_ms(self) -> int:
+        return int(time.time() * 1000) - self.epoch_ms
+
+    def next_id(self, shard: int) -> int:
+        if not 0 <= shard < MAX_SHARDS:
+            raise ValueError(f"Shard {shard} out of range (max {MAX_SHARDS - 1})")
+        with self._lock:
+            if self.worker_id is None or (self._lease_expires is not None and time.monotonic() > self._lease_expires):
+                raise RuntimeError("Snowflake worker id is not leased")
+            now = self._now_ms()
+            if now < self._last_ms:
+                if self._last_ms - now > MAX_CLOCK_BACKWARDS_MS:
+                    raise RuntimeError(f"Clock moved backwards by {self._last_ms - now}ms")
+                while now < self._last_ms:
+                    time.sleep((self._last_ms - now) / 1000)
+                    now = self._now_ms()
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & SEQUENCE_MASK
+                if self._sequence == 0:
+                    # 本毫秒序号用完，等到下一毫秒
+                    while now <= self._last_ms:
+                        now = self._now_ms()
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return (
+                (now << TIMESTAMP_SHIFT)
+                | (shard << SHARD_SHIFT)
+                | (self.worker_id << WORKER_SHIFT)
+                | self._sequence
+            )
+
+
+# 全局ID生成器（worker id由worker_id_lease租用）
+id_generator = SnowflakeGenerator()
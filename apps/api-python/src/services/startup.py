@@ -0,0 +1,86 @@
+import importlib
+import time
+from contextlib import contextmanager
+from types import ModuleType
+from typing import Any, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 进程启动基准时间（本模块是应用最早导入的模块之一）
+_PROCESS_T0 = time.perf_counter()
+
+
+class StartupReport:
+    """启动耗时报告：模块导入耗时、依赖初始化耗时、就绪状态"""
+
+    def __init__(self):
+        self.imports: Dict[str, float] = {}
+        self.dependencies: Dict[str, Dict[str, Any]] = {}
+        self.settings_seconds: Optional[float] = None
+        self.serving_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+
+    def import_module(self, name: str, package: Optional[str] = None) -> ModuleType:
+        """导入模块并记录耗时（包含其依赖模块的首次导入）"""
+        started = time.perf_counter()
+        module = importlib.import_module(name, package)
+        self.imports[module.__name__] = round(time.perf_counter() - started, 6)
+        return module
+
+    @contextmanager
+    def measure_dependency(self, name: str):
+        """记录一次依赖初始化的耗时和结果"""
+        started = time.perf_counter()
+        entry = self.dependencies.setdefault(name, {"attempts": 0})
+        entry["attempts"] += 1
+        try:
+            yield
+        except BaseException as e:
+            entry.update(status="error", error=str(e), seconds=round(time.perf_counter() - started, 6))
+            raise
+        entry.update(status="connected", error=None, seconds=round(time.perf_counter() - started, 6))
+
+    @property
+    def ready(self) -> bool:
+        """所有依赖是否已就绪"""
+        return self.ready_at is not None
+
+    def mark_serving(self) -> None:
+        """应用开始接收请求"""
+        self.serving_at = time.perf_counter()
+
+    def mark_ready(self) -> None:
+        """依赖全部连接完成"""
+        self.ready_at = time.perf_counter()
+
+    def as_dict(self) -> Dict[str, Any]:
+        """导出报告"""
+        def since_start(t: Optional[float]) -> Optional[float]:
+            return round(t - _PROCESS_T0, 6) if t is not None else None
+
+        return {
+            "ready": self.ready,
+            "settings_seconds": self.settings_seconds,
+            "imports": dict(sorted(self.imports.items(), key=lambda item: -item[1])),
+            "dependencies": self.dependencies,
+            "serving_after_seconds": since_start(self.serving_at),
+            "ready_after_seconds": since_start(self.ready_at),
+        }
+
+    def log_summary(self) -> None:
+        """输出启动耗时摘要"""
+        report = self.as_dict()
+        imports = ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in report["imports"].items())
+        dependencies = ", ".join(
+            f"{name}={(entry.get('seconds') or 0) * 1000:.1f}ms({entry.get('status')})"
+            for name, entry in report["dependencies"].items()
+        )
+        logger.info(
+            f"⏱️ Startup: serving after {report['serving_after_seconds']}s, "
+            f"ready after {report['ready_after_seconds']}s; imports: {imports}; dependencies: {dependencies}"
+        )
+
+
+# 全局启动报告
+startup_report = StartupReport()
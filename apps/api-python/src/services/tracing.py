@@ -0,0 +1,166 @@
+import contextlib
+import threading
+from collections import OrderedDict
+from typing import Any, ContextManager, Dict, List, Optional
+import logging
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 未启用追踪时为None，span()直接返回空上下文，没有额外开销
+_tracer = None
+_provider = None
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+# 数据库语句在span属性中的最大长度
+MAX_STATEMENT_LENGTH = 2048
+
+
+def tracing_enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, kind: Optional[str] = None, **attributes: Any) -> ContextManager:
+    """创建子span（kind为client/server/internal），未启用追踪时为空操作"""
+    if _tracer is None:
+        return _NULL_CONTEXT
+    from opentelemetry.trace import SpanKind
+    span_kind = getattr(SpanKind, (kind or "internal").upper())
+    return _tracer.start_as_current_span(name, kind=span_kind, attributes=attributes)
+
+
+def statement_span(query: str, args: Any) -> ContextManager:
+    """数据库语句span（只记录带占位符的语句，不记录参数值）"""
+    operation = query.lstrip().split(None, 1)[0].upper() if query.strip() else "QUERY"
+    return span(
+        f"mysql {operation}",
+        kind="client",
+        **{"db.system": "mysql", "db.operation": operation, "db.statement": query[:MAX_STATEMENT_LENGTH]}
+    )
+
+
+class TailSamplingSpanProcessor:
+    """尾部采样：缓存同一trace的span，本地根span结束后再决定是否导出
+
+    出错或耗时超过阈值的trace全部保留，其余按比例保留（按trace id判定，同一trace结果一致）。
+    """
+
+    def __init__(self, delegate, latency_threshold: float, ratio: float, max_traces: int):
+        self._delegate = delegate
+        self._latency_threshold = latency_threshold
+        self._ratio_bound = int(ratio * (1 << 64))
+        self._max_traces = max_traces
+        self._pending: "OrderedDict[int, List[Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def on_start(self, span, parent_context=None) -> None:
+        pass
+
+    def on_end(self, span) -> None:
+        trace_id = span.context.trace_id
+        is_local_root = span.parent is None or span.parent.is_remote
+        with self._lock:
+            spans = self._pending.pop(trace_id, []) if is_local_root else self._pending.setdefault(trace_id, [])
+            spans.append(span)
+            while len(self._pending) > self._max_traces:
+                self._pending.popitem(last=False)
+                metrics.inc("tracing_tail_evicted_total")
+        if not is_local_root:
+            return
+
+        if self._keep(span):
+            metrics.inc("tracing_traces_total", decision="keep")
+            for finished in spans:
+                self._delegate.on_end(finished)
+        else:
+            metrics.inc("tracing_traces_total", decision="drop")
+
+    def _keep(self, root) -> bool:
+        from opentelemetry.trace import StatusCode
+        if root.status.status_code == StatusCode.ERROR:
+            return True
+        if (root.end_time - root.start_time) / 1e9 >= self._latency_threshold:
+            return True
+        return (root.context.trace_id & ((1 << 64) - 1)) < self._ratio_bound
+
+    def shutdown(self) -> None:
+        self._delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self._delegate.force_flush(timeout_millis)
+
+
+def _build_exporter(config):
+    if config.TRACING_EXPORTER == "file":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        out = open(config.TRACING_FILE_PATH, "a", encoding="utf-8")
+        return ConsoleSpanExporter(out=out, formatter=lambda finished: finished.to_json(indent=None) + "\n")
+    if config.TRACING_EXPORTER == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        return ConsoleSpanExporter()
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    return OTLPSpanExporter(endpoint=config.TRACING_OTLP_ENDPOINT)
+
+
+def setup_tracing(config) -> bool:
+    """按配置初始化OpenTelemetry（每个worker进程各自初始化），依赖缺失时记录警告并保持关闭"""
+    global _tracer, _provider
+    if _tracer is not None or not config.TRACING_ENABLED:
+        return _tracer is not None
+
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ALWAYS_ON, ParentBased, TraceIdRatioBased
+    except ImportError as e:
+        logger.warning(f"⚠️ Tracing enabled but OpenTelemetry is not installed: {e}")
+        return False
+
+    exporter_processor = BatchSpanProcessor(_build_exporter(config))
+    if config.TRACING_SAMPLER == "tail":
+        # 尾部采样需要记录所有span，是否导出由处理器决定
+        sampler = ALWAYS_ON
+        processor = TailSamplingSpanProcessor(
+            exporter_processor,
+            latency_threshold=config.TRACING_TAIL_LATENCY_SECONDS,
+            ratio=config.TRACING_SAMPLE_RATIO,
+            max_traces=config.TRACING_TAIL_MAX_TRACES,
+        )
+    else:
+        # 头部采样：上游已决定时沿用traceparent中的采样标记
+        sampler = ParentBased(TraceIdRatioBased(config.TRACING_SAMPLE_RATIO))
+        processor = exporter_processor
+
+    resource = Resource.create({
+        "service.name": config.TRACING_SERVICE_NAME,
+        "service.version": config.VERSION,
+        "deployment.environment": getattr(config.ENVIRONMENT, "value", str(config.ENVIRONMENT)),
+    })
+    _provider = TracerProvider(resource=resource, sampler=sampler)
+    _provider.add_span_processor(processor)
+    trace.set_tracer_provider(_provider)
+    _tracer = trace.get_tracer(__name__)
+    logger.info(
+        f"🔭 Tracing enabled (sampler={config.TRACING_SAMPLER}, ratio={config.TRACING_SAMPLE_RATIO}, "
+        f"exporter={config.TRACING_EXPORTER})"
+    )
+    return True
+
+
+def shutdown_tracing() -> None:
+    """导出剩余span并关闭"""
+    global _tracer, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = None
+    _provider = None
+
+
+def extract_context(headers: Dict[str, str]):
+    """从请求头解析W3C traceparent/tracestate"""
+    from opentelemetry.propagate import extract
+    return extract(headers)
@@ -0,0 +1,164 @@
+import asyncio
+from typing import List, Optional, Sequence
+import logging
+
+from ..config.settings import settings
+from .database import get_database_service
+from .metrics import metrics
+from .sharding import shard_lock_name
+
+logger = logging.getLogger(__name__)
+
+# MySQL命名锁，多个worker中同一时间只有一个执行清理
+PURGE_LOCK_NAME = "user_purge"
+
+# 直接按user_id清理的子表（orders及order_items单独处理）
+USER_CHILD_TABLES = ("refresh_tokens", "user_sessions")
+
+
+class UserPurger:
+    """后台清理已标记删除的用户
+
+    依赖ON DELETE CASCADE一次删除大用户会在单个语句中锁住大量行，这里改为按小批量
+    （USER_PURGE_BATCH_SIZE）逐表删除，批次之间暂停USER_PURGE_BATCH_PAUSE秒，最后在一个事务中
+    删除剩余的关联行和用户行。
+    """
+
+    def __init__(self):
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def _event(self) -> asyncio.Event:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        return self._wakeup
+
+    def wake(self) -> None:
+        """有新的删除时唤醒清理循环（无需等到下一个周期）"""
+        self._event().set()
+
+    @staticmethod
+    async def _execute(conn, query: str, args: Sequence) -> int:
+        async with conn.cursor() as cursor:
+            await cursor.execute(query, args)
+            return cursor.rowcount
+
+    @staticmethod
+    async def _fetch_ids(conn, query: str, args: Sequence) -> List[int]:
+        async with conn.cursor() as cursor:
+            await cursor.execute(query, args)
+            return [row[0] for row in await cursor.fetchall()]
+
+    @staticmethod
+    async def _pause() -> None:
+        await asyncio.sleep(settings.USER_PURGE_BATCH_PAUSE)
+
+    async def _delete_in_batches(self, conn, table: str, where: str, args: Sequence) -> int:
+        """按LIMIT分批删除，每批单独提交（autocommit），直到删除数小于批量大小"""
+        batch_size = settings.USER_PURGE_BATCH_SIZE
+        total = 0
+        while True:
+            deleted = await self._execute(conn, f"DELETE FROM {table} WHERE {where} LIMIT %s", (*args, batch_size))
+            total += deleted
+            metrics.inc("user_purge_rows_total", deleted, table=table)
+            if deleted < batch_size:
+                return total
+            await self._pause()
+
+    async def purge_user(self, conn, user_id: int) -> None:
+        """清理单个用户的关联数据，最后删除用户行"""
+        for table in USER_CHILD_TABLES:
+            await self._delete_in_batches(conn, table, "user_id = %s", (user_id,))
+
+        # 订单：每次取一批订单ID，先删订单项再删订单
+        while True:
+            order_ids = await self._fetch_ids(
+                conn,
+                "SELECT id FROM orders WHERE user_id = %s ORDER BY id LIMIT %s",
+                (user_id, settings.USER_PURGE_BATCH_SIZE)
+            )
+            if not order_ids:
+                break
+            placeholders = ", ".join(["%s"] * len(order_ids))
+            await self._delete_in_batches(conn, "order_items", f"order_id IN ({placeholders})", order_ids)
+            deleted = await self._execute(conn, f"DELETE FROM orders WHERE id IN ({placeholders})", order_ids)
+            metrics.inc("user_purge_rows_total", deleted, table="orders")
+            await self._pause()
+
+        # 清理期间新写入的少量关联行与用户行在同一事务中显式删除（不依赖外键级联，
+        # 通过host:port/库名配置的分片表可能没有外键）
+        await conn.begin()
+        try:
+            await self._execute(
+                conn,
+                "DELETE order_items FROM order_items JOIN orders ON orders.id = order_items.order_id "
+                "WHERE orders.user_id = %s",
+                (user_id,)
+            )
+            for table in ("orders", *USER_CHILD_TABLES):
+                await self._execute(conn, f"DELETE FROM {table} WHERE user_id = %s", (user_id,))
+            await self._execute(conn, "DELETE FROM users WHERE id = %s AND deleted_at IS NOT NULL", (user_id,))
+        except Exception:
+            await conn.rollback()
+            raise
+        await conn.commit()
+        metrics.inc("users_purged_total")
+
+    async def purge_pending(self) -> int:
+        """在每个分片上清理一轮已标记删除的用户，返回清理的用户数"""
+        db_service = await get_database_service()
+        purged = 0
+        for shard in range(db_service.shard_count):
+            purged += await self.purge_shard(shard)
+        return purged
+
+    async def purge_shard(self, shard: int) -> int:
+        """清理单个分片（各分片使用不同的锁，分片可能在同一MySQL实例上）
+
+        命名锁属于连接会话，所以加锁和所有删除都使用同一个连接。
+        """
+        lock_name = shard_lock_name(PURGE_LOCK_NAME, shard)
+        db_service = await get_database_service()
+        async with db_service.get_connection(shard) as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT GET_LOCK(%s, 0)", (lock_name,))
+                (acquired,) = await cursor.fetchone()
+            if not acquired:
+                return 0
+            try:
+                user_ids = await self._fetch_ids(
+                    conn,
+                    "SELECT id FROM users WHERE deleted_at IS NOT NULL ORDER BY deleted_at LIMIT %s",
+                    (settings.USER_PURGE_USERS_PER_PASS,)
+                )
+                metrics.set_gauge("user_purge_pending", len(user_ids), shard=str(shard))
+                for user_id in user_ids:
+                    await self.purge_user(conn, user_id)
+                return len(user_ids)
+            finally:
+                async with conn.cursor() as cursor:
+                    await cursor.execute("SELECT RELEASE_LOCK(%s)", (lock_name,))
+
+    async def run(self) -> None:
+        """后台清理循环：每USER_PURGE_INTERVAL秒或被唤醒时执行一轮"""
+        while True:
+            purged = 0
+            try:
+                purged = await self.purge_pending()
+                if purged:
+                    logger.info(f"🧹 Purged {purged} deleted users")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ User purge failed: {e}")
+
+            # 本轮达到上限说明还有积压，立即继续
+            if purged < settings.USER_PURGE_USERS_PER_PASS:
+                try:
+                    await asyncio.wait_for(self._event().wait(), settings.USER_PURGE_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            self._event().clear()
+
+
+# 全局用户清理实例
+user_purger = UserPurger()
@@ -0,0 +1,125 @@
+import asyncio
+import os
+from typing import Optional
+import logging
+
+import aiomysql
+
+from ..config.settings import settings
+from .metrics import metrics
+from .snowflake import MAX_WORKERS, id_generator
+
+logger = logging.getLogger(__name__)
+
+# 每个worker id对应主库上的一个MySQL命名锁
+LOCK_PREFIX = "snowflake_worker_"
+
+
+def worker_lock_name(worker_id: int) -> str:
+    return f"{LOCK_PREFIX}{worker_id}"
+
+
+class WorkerIdLease:
+    """在主库上用MySQL命名锁租用雪花ID的worker id（0-63），每个进程（包括gunicorn的每个worker）各租一个
+
+    命名锁属于连接会话，用一条不占连接池的专用连接持有：进程退出或连接断开时锁自动释放。
+    每SNOWFLAKE_LEASE_INTERVAL秒确认连接仍持有锁并续约；确认失败时立即停止生成ID，再重新租用。
+    """
+
+    def __init__(self):
+        self._conn: Optional[aiomysql.Connection] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self.worker_id: Optional[int] = None
+
+    @staticmethod
+    def _valid_for() -> float:
+        return settings.SNOWFLAKE_LEASE_INTERVAL * 2
+
+    async def acquire(self) -> int:
+        """租用一个空闲的worker id（64个都被占用时抛出RuntimeError）"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._conn is not None and self.worker_id is not None:
+                return self.worker_id
+            conn = await aiomysql.connect(
+                host=settings.DB_HOST,
+                port=settings.DB_PORT,
+                user=settings.DB_USERNAME,
+                password=settings.DB_PASSWORD,
+                charset=settings.DB_CHARSET,
+                autocommit=True,
+            )
+            try:
+                # 从进程号对应的位置开始尝试，同时启动的worker不会都争抢同一个id
+                start = os.getpid() % MAX_WORKERS
+                for offset in range(MAX_WORKERS):
+                    candidate = (start + offset) % MAX_WORKERS
+                    async with conn.cursor() as cursor:
+                        await cursor.execute("SELECT GET_LOCK(%s, 0)", (worker_lock_name(candidate),))
+                        (acquired,) = await cursor.fetchone()
+                    if acquired:
+                        self._conn = conn
+                        self.worker_id = candidate
+                        id_generator.assign(candidate, self._valid_for())
+                        metrics.set_gauge("snowflake_worker_id", candidate)
+                        logger.info(f"🆔 Leased snowflake worker id {candidate}")
+                        return candidate
+            except BaseException:
+                conn.close()
+                raise
+            conn.close()
+            raise RuntimeError(f"All {MAX_WORKERS} snowflake worker ids are leased by other processes")
+
+    async def renew(self) -> bool:
+        """确认专用连接仍持有命名锁并延长租约；失败时收回worker id并关闭连接"""
+        conn, worker_id = self._conn, self.worker_id
+        if conn is None or worker_id is None:
+            return False
+        try:
+            async with conn.cursor() as cursor:
+                await asyncio.wait_for(
+                    cursor.execute("SELECT IS_USED_LOCK(%s) = CONNECTION_ID()", (worker_lock_name(worker_id),)),
+                    settings.SNOWFLAKE_LEASE_INTERVAL
+                )
+                (held,) = await cursor.fetchone()
+        except Exception as e:
+            logger.error(f"❌ Snowflake worker id {worker_id} lease check failed: {e}")
+            held = False
+        if held:
+            id_generator.extend(self._valid_for())
+            return True
+        id_generator.revoke()
+        conn.close()
+        self._conn = None
+        self.worker_id = None
+        metrics.inc("snowflake_worker_lease_lost_total")
+        logger.error(f"❌ Lost snowflake worker id {worker_id}, id generation paused until re-leased")
+        return False
+
+    async def run(self) -> None:
+        """后台续约循环（首次租用在数据库初始化时完成）"""
+        while True:
+            await asyncio.sleep(settings.SNOWFLAKE_LEASE_INTERVAL)
+            if self._lock is None:
+                # 数据库尚未初始化（后台连接时）
+                continue
+            try:
+                if not await self.renew():
+                    await self.acquire()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Failed to re-lease snowflake worker id: {e}")
+
+    def release(self) -> None:
+        """关闭专用连接（释放命名锁）"""
+        id_generator.revoke()
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self.worker_id = None
+
+
+# 全局worker id租约
+worker_id_lease = WorkerIdLease()
@@ -0,0 +1,110 @@
+import pytest
+
+from src.services.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_breaker(clock, **options):
+    defaults = dict(
+        window_size=4,
+        minimum_calls=4,
+        failure_rate_threshold=0.5,
+        slow_call_duration=1.0,
+        slow_call_rate_threshold=0.75,
+        open_duration=10.0,
+        half_open_max_calls=2,
+        recorded_exceptions=(ConnectionError,),
+        clock=clock,
+    )
+    defaults.update(options)
+    return CircuitBreaker("test", **defaults)
+
+async def fail():
+    raise ConnectionError("down")
+
+async def ok():
+    return "ok"
+
+@pytest.mark.asyncio
+async def test_opens_on_error_rate_and_fails_fast():
+    """测试错误率超过阈值后熔断并快速失败"""
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for fn in (ok, ok, fail, fail):
+        try:
+            await breaker.call(fn)
+        except ConnectionError:
+            pass
+    assert breaker.state == CircuitState.OPEN
+
+    with pytest.raises(CircuitOpenError) as exc_info:
+        await breaker.call(ok)
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers["Retry-After"] == "10"
+
+@pytest.mark.asyncio
+async def test_opens_on_slow_calls():
+    """测试慢调用率超过阈值后熔断"""
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        async with breaker.guard():
+            clock.now += 2.0
+    assert breaker.state == CircuitState.OPEN
+
+@pytest.mark.asyncio
+async def test_half_open_recovers_or_reopens():
+    """测试半开状态下试探成功则关闭、失败则重新打开"""
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        with pytest.raises(ConnectionError):
+            await breaker.call(fail)
+    clock.now += 10.0
+    assert breaker.state == CircuitState.HALF_OPEN
+
+    with pytest.raises(ConnectionError):
+        await breaker.call(fail)
+    assert breaker.state == CircuitState.OPEN
+
+    clock.now += 10.0
+    assert await breaker.call(ok) == "ok"
+    assert await breaker.call(ok) == "ok"
+    assert breaker.state == CircuitState.CLOSED
+
+@pytest.mark.asyncio
+async def test_unrecorded_exceptions_do_not_trip():
+    """测试业务异常不计入熔断统计"""
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+
+    async def business_error():
+        raise ValueError("duplicate")
+
+    for _ in range(8):
+        with pytest.raises(ValueError):
+            await breaker.call(business_error)
+    assert breaker.state == CircuitState.CLOSED
+
+@pytest.mark.asyncio
+async def test_checkout_records_use_failures_but_not_hold_time():
+    """取连接后使用期间的故障计为失败，长时间持有不算慢调用"""
+    clock = FakeClock()
+    breaker = make_breaker(clock, slow_call_rate_threshold=0.5)
+    for _ in range(4):
+        async with breaker.guard_checkout() as acquired:
+            acquired()
+            clock.now += 60
+    assert breaker.state == CircuitState.CLOSED
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            async with breaker.guard_checkout() as acquired:
+                acquired()
+                raise ConnectionError("lost connection during query")
+    assert breaker.state == CircuitState.OPEN
@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+
+from src.services.concurrency_limiter import (
+    PRIORITY_NORMAL,
+    PRIORITY_WRITE,
+    AdaptiveConcurrencyLimiter,
+    LimiterRejected,
+)
+
+def make_limiter(**overrides):
+    options = dict(initial=2, minimum=1, maximum=10, latency_target=0.1, backoff=0.5, queue_size=1)
+    options.update(overrides)
+    return AdaptiveConcurrencyLimiter(**options)
+
+@pytest.mark.asyncio
+async def test_queue_full_evicts_lower_priority_and_wakes_in_priority_order():
+    """测试队列满时写请求挤掉普通请求，释放名额后按优先级唤醒"""
+    limiter = make_limiter()
+    await limiter.acquire(PRIORITY_NORMAL, 1)
+    await limiter.acquire(PRIORITY_NORMAL, 1)
+
+    normal = asyncio.create_task(limiter.acquire(PRIORITY_NORMAL, 1))
+    await asyncio.sleep(0)
+    write = asyncio.create_task(limiter.acquire(PRIORITY_WRITE, 1))
+    await asyncio.sleep(0)
+    with pytest.raises(LimiterRejected) as rejected:
+        await normal
+    assert rejected.value.reason == "evicted"
+
+    with pytest.raises(LimiterRejected) as rejected:
+        await limiter.acquire(PRIORITY_NORMAL, 1)
+    assert rejected.value.reason == "queue_full"
+
+    limiter.release()
+    await write
+    assert limiter.inflight == 2 and limiter.queued == 0
+
+@pytest.mark.asyncio
+async def test_queue_timeout_and_aimd_adjustment():
+    """测试排队超时被拒绝；慢请求乘性减少限制，快请求在高负载时加性增加"""
+    limiter = make_limiter(initial=4, queue_size=10)
+    for _ in range(4):
+        await limiter.acquire(PRIORITY_NORMAL, 1)
+    with pytest.raises(LimiterRejected) as rejected:
+        await limiter.acquire(PRIORITY_NORMAL, 0.01)
+    assert rejected.value.reason == "queue_timeout"
+
+    limiter.record_latency(0.5)
+    limiter.record_latency(0.5)
+    assert limiter.limit == 2
+
+    limiter.record_latency(0.01)
+    assert limiter.limit == 2.5
+
+def test_long_lived_streams_bypass_the_limiter():
+    """SSE和流式导出有各自的上限，不占用自适应并发名额"""
+    from src.middleware.concurrency import request_priority
+    from src.services.concurrency_limiter import PRIORITY_CRITICAL
+
+    for path in ("/api/exports/users", "/api/events"):
+        assert request_priority({"path": path, "method": "GET", "headers": []}) == PRIORITY_CRITICAL
+    assert request_priority({"path": "/api/users", "method": "GET", "headers": []}) == PRIORITY_NORMAL
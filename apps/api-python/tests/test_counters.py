@@ -0,0 +1,170 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from src.services import counters
+from src.services.counters import RECONCILE_LOCK_KEY, CounterService, CountMode, counter_key
+
+class FakeCounterRedis:
+    """按计数器所用命令语义在内存中保存key的假Redis"""
+
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+
+    async def incr_if_exists(self, key, delta=1):
+        # 与Lua脚本一致：key不存在时不创建
+        if key not in self.values:
+            return None
+        self.values[key] = int(self.values[key]) + delta
+        return self.values[key]
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ttl=None):
+        self.values[key] = value
+        return True
+
+    async def mset(self, mapping, ttl=None):
+        self.values.update(mapping)
+        return True
+
+    async def set_if_absent(self, key, value, ttl):
+        if key in self.values:
+            return False
+        self.values[key] = value
+        return True
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.row = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, args=()):
+        self.db.queries.append((self.db.shard, " ".join(query.split())))
+        self.row = self.db.results(self.db.shard, " ".join(query.split()))
+
+    async def fetchone(self):
+        return self.row
+
+    async def fetchall(self):
+        return self.row
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, *args):
+        return FakeCursor(self.db)
+
+class FakeDatabase:
+    """两个用户分片：分片0有3个用户，分片1有2个用户；商品只在分片0"""
+
+    shard_count = 2
+
+    def __init__(self):
+        self.queries = []
+        self.shard = 0
+
+    def results(self, shard, query):
+        if "information_schema" in query:
+            return (10 * (shard + 1),)
+        if "GROUP BY category" in query:
+            return [("books", 4), ("games", 1), (None, 2)]
+        if "FROM users" in query:
+            return (3 if shard == 0 else 2,)
+        return (7,)
+
+    @asynccontextmanager
+    async def get_connection(self, shard=0):
+        self.shard = shard
+        yield FakeConnection(self)
+
+@pytest.fixture
+def fake_backends(monkeypatch):
+    redis_service, db = FakeCounterRedis(), FakeDatabase()
+
+    async def get_redis():
+        return redis_service
+
+    async def get_db():
+        return db
+
+    monkeypatch.setattr(CounterService, "_get_redis", staticmethod(get_redis))
+    monkeypatch.setattr(counters, "get_database_service", get_db)
+    return redis_service, db
+
+@pytest.mark.asyncio
+async def test_adjust_before_initialization_does_not_create_counter(fake_backends):
+    """计数器尚未初始化时增减不创建key（避免从0开始的错误计数），初始化后按增量更新"""
+    redis_service, _ = fake_backends
+    service = CounterService()
+
+    await service.adjust("users", 1)
+    assert counter_key("users") not in redis_service.values
+
+    assert await service.count("users", CountMode.EXACT) == 5
+    await service.adjust("users", 1)
+    await service.adjust("users", -3)
+    assert await service.count("users", CountMode.EXACT) == 3
+
+@pytest.mark.asyncio
+async def test_reconcile_overwrites_drift(fake_backends):
+    """对账用MySQL的COUNT覆盖漂移的计数器，用户计数为所有分片之和"""
+    redis_service, _ = fake_backends
+    redis_service.values.update({counter_key("users"): 99, counter_key("products", "books"): 0})
+
+    counts = await CounterService().reconcile()
+
+    assert counts == {
+        counter_key("users"): 5,
+        counter_key("products"): 7,
+        counter_key("products", "books"): 4,
+        counter_key("products", "games"): 1,
+    }
+    assert redis_service.values[counter_key("users")] == 5
+    assert redis_service.values[counter_key("products", "books")] == 4
+
+@pytest.mark.asyncio
+async def test_reconciler_runs_once_per_interval_across_workers(fake_backends, monkeypatch):
+    """多个worker的对账循环通过SET NX锁，每个周期只有一个执行对账"""
+    redis_service, _ = fake_backends
+    reconciled = []
+
+    async def reconcile(self):
+        reconciled.append(self)
+        return {}
+
+    async def stop(_):
+        raise asyncio.CancelledError()
+
+    monkeypatch.setattr(CounterService, "reconcile", reconcile)
+    monkeypatch.setattr(counters.asyncio, "sleep", stop)
+    for _ in range(2):
+        with pytest.raises(asyncio.CancelledError):
+            await CounterService().run_reconciler()
+
+    assert len(reconciled) == 1 and RECONCILE_LOCK_KEY in redis_service.values
+
+@pytest.mark.asyncio
+async def test_approximate_mode_sums_shard_estimates_and_caches(fake_backends, monkeypatch):
+    """估算模式读取各分片information_schema之和并在COUNTER_APPROXIMATE_TTL内缓存；分类计数回退到精确计数"""
+    _, db = fake_backends
+    monkeypatch.setattr(counters.settings, "COUNTER_APPROXIMATE_TTL", 60)
+    service = CounterService()
+
+    assert await service.count("users", CountMode.APPROXIMATE) == 30
+    queries = len(db.queries)
+    assert await service.count("users", CountMode.APPROXIMATE) == 30
+    assert len(db.queries) == queries
+
+    assert await service.count("products", CountMode.APPROXIMATE, category="books") == 7
+    assert "information_schema" not in db.queries[-1][1]
+    assert await service.count("users", CountMode.NONE) is None
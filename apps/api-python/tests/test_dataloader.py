@@ -0,0 +1,64 @@
+import asyncio
+import pytest
+
+from src.services.dataloader import DataLoader
+
+@pytest.mark.asyncio
+async def test_loads_in_same_tick_are_batched():
+    """测试同一tick内多个协程的load合并为一次批量查询，并保持顺序"""
+    batches = []
+
+    async def batch_fn(keys):
+        batches.append(keys)
+        return {key: key * 10 for key in keys if key != 3}
+
+    loader = DataLoader("test", batch_fn)
+
+    async def single(key):
+        return await loader.load(key)
+
+    results = await asyncio.gather(single(1), single(2), loader.load_many([3, 2, 4]))
+    assert results == [10, 20, [None, 20, 40]]
+    assert batches == [[1, 2, 3, 4]]
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_not_cached():
+    """测试批量查询失败时key不被缓存，可重试"""
+    attempts = []
+
+    async def batch_fn(keys):
+        attempts.append(keys)
+        if len(attempts) == 1:
+            raise ConnectionError("db down")
+        return {key: key for key in keys}
+
+    loader = DataLoader("test", batch_fn)
+    with pytest.raises(ConnectionError):
+        await loader.load(1)
+    assert await loader.load(1) == 1
+    assert attempts == [[1], [1]]
+
+@pytest.mark.asyncio
+async def test_cancelling_all_waiters_cancels_batch():
+    """测试一批的等待者全部取消时批量查询随之取消，key可重新加载"""
+    started = asyncio.Event()
+    cancelled = []
+
+    async def batch_fn(keys):
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(keys)
+            raise
+        return {}
+
+    loader = DataLoader("test", batch_fn)
+    waiter = asyncio.create_task(loader.load_many([1, 2]))
+    await started.wait()
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    await asyncio.sleep(0)
+    assert cancelled == [[1, 2]]
+    assert not loader._tasks and not loader._cache
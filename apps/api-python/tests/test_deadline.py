@@ -0,0 +1,102 @@
+import asyncio
+import pytest
+
+from src.config.settings import settings
+from src.middleware.deadline import DeadlineMiddleware
+from src.services.deadline import (
+    DeadlineExceeded,
+    add_execution_time_hint,
+    deadline_scope,
+    route_timeout,
+    wait_with_budget,
+)
+
+def test_route_timeout_uses_longest_prefix(monkeypatch):
+    """测试路由超时按最长前缀匹配，指定方法的配置更具体，0表示不限制"""
+    monkeypatch.setattr(settings, "DEADLINE_DEFAULT_SECONDS", 10.0)
+    monkeypatch.setattr(settings, "DEADLINE_ROUTES", {"/api/users": 5.0, "GET /api/users": 2.0, "/api/exports": 0})
+    assert route_timeout("GET", "/api/users/1") == 2.0
+    assert route_timeout("POST", "/api/users") == 5.0
+    assert route_timeout("GET", "/api/usersx") == 10.0
+    assert route_timeout("GET", "/api/exports/users") is None
+
+@pytest.mark.asyncio
+async def test_budget_limits_waits_and_select_hint():
+    """测试截止时间内的等待被缩短为504，SELECT语句带上剩余时间提示"""
+    with deadline_scope(0.05):
+        with pytest.raises(DeadlineExceeded):
+            await wait_with_budget(asyncio.sleep(1), 2.0)
+        with pytest.raises(DeadlineExceeded):
+            await wait_with_budget(asyncio.sleep(0), 2.0)
+
+    with deadline_scope(1.5):
+        hinted = add_execution_time_hint("SELECT * FROM users WHERE id = %s")
+        assert hinted.startswith("SELECT /*+ MAX_EXECUTION_TIME(")
+        assert add_execution_time_hint("UPDATE users SET name = %s") == "UPDATE users SET name = %s"
+    assert add_execution_time_hint("SELECT 1") == "SELECT 1"
+
+async def run_middleware(app, messages, monkeypatch, timeout):
+    monkeypatch.setattr(settings, "DEADLINE_ROUTES", {})
+    monkeypatch.setattr(settings, "DEADLINE_DEFAULT_SECONDS", timeout)
+    sent = []
+
+    async def receive():
+        return await messages.get()
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/api/users", "headers": []}
+    await DeadlineMiddleware(app)(scope, receive, send)
+    return sent
+
+@pytest.mark.asyncio
+async def test_middleware_cancels_on_deadline_and_disconnect(monkeypatch):
+    """测试超过截止时间返回504，客户端断开时取消处理任务"""
+    cancelled = []
+
+    async def slow_app(scope, receive, send):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(scope["path"])
+            raise
+
+    sent = await run_middleware(slow_app, asyncio.Queue(), monkeypatch, 0.05)
+    assert sent[0]["status"] == 504 and cancelled
+
+    cancelled.clear()
+    messages = asyncio.Queue()
+    messages.put_nowait({"type": "http.disconnect"})
+    sent = await run_middleware(slow_app, messages, monkeypatch, 5)
+    assert sent == [] and cancelled
+
+@pytest.mark.asyncio
+async def test_middleware_lets_handler_finish_after_complete_response(monkeypatch):
+    """测试响应发送完毕后的断开不取消处理任务，请求体不会被预读"""
+    finished = []
+    messages = asyncio.Queue()
+    for chunk in (b"a", b"b"):
+        messages.put_nowait({"type": "http.request", "body": chunk, "more_body": True})
+    messages.put_nowait({"type": "http.request", "body": b"c", "more_body": False})
+
+    async def streaming_app(scope, receive, send):
+        await asyncio.sleep(0.01)
+        # 中间件最多预读一个分块，其余仍在服务器端
+        assert messages.qsize() == 1
+        body = b""
+        while True:
+            message = await receive()
+            body += message["body"]
+            if not message["more_body"]:
+                break
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": body})
+        # uvicorn在响应完成后对receive返回http.disconnect；StreamingResponse此时仍在收尾
+        messages.put_nowait({"type": "http.disconnect"})
+        assert (await receive())["type"] == "http.disconnect"
+        await asyncio.sleep(0.01)
+        finished.append(body)
+
+    sent = await run_middleware(streaming_app, messages, monkeypatch, 5)
+    assert sent[1]["body"] == b"abc" and finished == [b"abc"]
@@ -0,0 +1,157 @@
+import asyncio
+import json
+
+import pytest
+
+from src.config.settings import settings
+from src.services.dynamic_config import TUNABLE_SETTINGS, DynamicConfig, validate_overrides
+
+
+@pytest.fixture
+def config():
+    original = {name: getattr(settings, name) for name in TUNABLE_SETTINGS}
+    yield DynamicConfig()
+    for name, value in original.items():
+        setattr(settings, name, value)
+
+
+def test_validate_rejects_unknown_and_invalid_values():
+    """只允许白名单中的配置，按BaseConfig的类型转换并检查下限"""
+    assert validate_overrides({"USER_CACHE_TTL": "60", "LOG_LEVEL": "debug"}) == {
+        "USER_CACHE_TTL": 60, "LOG_LEVEL": "DEBUG"
+    }
+    for overrides in ({"DB_HOST": "x"}, {"USER_CACHE_TTL": "soon"}, {"DB_POOL_SIZE": 0}, {"LOG_LEVEL": "LOUD"}):
+        with pytest.raises(ValueError):
+            validate_overrides(overrides)
+
+
+@pytest.mark.asyncio
+async def test_update_swaps_values_and_runs_appliers(config):
+    """一次更新的配置一起替换并调用应用函数，删除覆盖后恢复启动时的值"""
+    applied = []
+    config.register_applier(["USER_CACHE_TTL"], lambda: applied.append(settings.USER_CACHE_TTL))
+    default = config.baseline()["USER_CACHE_TTL"]
+
+    changes = await config.update("redis", {"USER_CACHE_TTL": default + 5, "SEARCH_MAX_LIMIT": 7})
+    assert set(changes) == {"USER_CACHE_TTL", "SEARCH_MAX_LIMIT"}
+    assert settings.USER_CACHE_TTL == default + 5 and settings.SEARCH_MAX_LIMIT == 7
+    assert applied == [default + 5] and config.version == 1
+    assert config.source_of("USER_CACHE_TTL") == "redis"
+
+    # 文件层被Redis层覆盖，不产生变更
+    assert await config.update("file", {"USER_CACHE_TTL": default + 1}) == {}
+
+    await config.update("redis", {"USER_CACHE_TTL": None})
+    assert settings.USER_CACHE_TTL == default + 1 and config.source_of("USER_CACHE_TTL") == "file"
+
+    with pytest.raises(ValueError):
+        await config.update("redis", {"CONCURRENCY_MIN_LIMIT": settings.CONCURRENCY_MAX_LIMIT + 1})
+
+
+@pytest.mark.asyncio
+async def test_failed_applier_reverts_value(config):
+    """应用失败时恢复旧值"""
+    def fail():
+        raise RuntimeError("boom")
+
+    config.register_applier(["SEARCH_MAX_LIMIT"], fail)
+    old = settings.SEARCH_MAX_LIMIT
+
+    changes = await config.update("redis", {"SEARCH_MAX_LIMIT": old + 1})
+    assert changes["SEARCH_MAX_LIMIT"]["applied"] is False
+    assert settings.SEARCH_MAX_LIMIT == old
+
+
+@pytest.mark.asyncio
+async def test_publish_merges_with_current_redis_value(config, monkeypatch):
+    """发布时以Redis中的当前内容为基础合并，不覆盖其他worker刚发布、本worker尚未读到的修改"""
+    import src.services.dynamic_config as dynamic_config_module
+
+    stored = {settings.DYNAMIC_CONFIG_REDIS_KEY: json.dumps({"SEARCH_MAX_LIMIT": 7})}
+
+    class FakeRedis:
+        async def eval(self, script, keys, args):
+            layer = json.loads(stored.get(keys[0], "{}"))
+            for name, value in json.loads(args[0]).items():
+                if value is None:
+                    layer.pop(name, None)
+                else:
+                    layer[name] = value
+            stored[keys[0]] = json.dumps(layer)
+            return stored[keys[0]]
+
+    async def get_fake_redis():
+        return FakeRedis()
+
+    monkeypatch.setattr(dynamic_config_module, "get_redis_service", get_fake_redis)
+    default = config.baseline()["USER_CACHE_TTL"]
+
+    changes, published = await config.publish({"USER_CACHE_TTL": default + 5})
+    assert published and set(changes) == {"USER_CACHE_TTL", "SEARCH_MAX_LIMIT"}
+    assert json.loads(stored[settings.DYNAMIC_CONFIG_REDIS_KEY]) == {"SEARCH_MAX_LIMIT": 7, "USER_CACHE_TTL": default + 5}
+    assert settings.SEARCH_MAX_LIMIT == 7 and settings.USER_CACHE_TTL == default + 5
+
+
+def test_pool_size_is_capped_at_per_worker_limit(monkeypatch):
+    """DB_POOL_SIZE会被所有worker采用，按启动时计算的每个worker份额校验"""
+    monkeypatch.setattr(settings, "DB_POOL_SIZE_LIMIT", 20)
+    assert validate_overrides({"DB_POOL_SIZE": 20}) == {"DB_POOL_SIZE": 20}
+    with pytest.raises(ValueError):
+        validate_overrides({"DB_POOL_SIZE": 21})
+
+
+class FakePool:
+    def __init__(self, used=0):
+        self.used = used
+        self.freesize = 0
+
+    @property
+    def size(self):
+        return self.used + self.freesize
+
+    async def acquire(self):
+        await asyncio.sleep(0)
+        if self.freesize:
+            self.freesize -= 1
+        self.used += 1
+        return object()
+
+    def release(self):
+        self.used -= 1
+        self.freesize += 1
+
+
+@pytest.mark.asyncio
+async def test_resized_pool_waits_for_retired_connections(monkeypatch):
+    """旧连接池排空期间，新旧连接池的连接总数不超过DB_POOL_SIZE；新旧连接池归还连接都会唤醒等待的请求"""
+    from src.services.database import DatabaseService
+
+    old, new = FakePool(used=3), FakePool()
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 4)
+    monkeypatch.setattr(DatabaseService, "_retired_pools", {old})
+    monkeypatch.setattr(DatabaseService, "_drain_cond", asyncio.Condition())
+
+    # 并发的请求只有一个能建立新连接
+    first, second = await asyncio.wait_for(asyncio.gather(
+        DatabaseService._acquire_primary(new),
+        asyncio.wait_for(DatabaseService._acquire_primary(new), 0.05),
+        return_exceptions=True
+    ), 1)
+    assert isinstance(second, asyncio.TimeoutError) and new.size + old.size == 4
+
+    blocked = asyncio.create_task(DatabaseService._acquire_primary(new))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+    # 归还到新连接池的连接可以直接复用
+    new.release()
+    await DatabaseService._notify_drained()
+    await asyncio.wait_for(blocked, 1)
+    assert new.size + old.size == 4
+
+    blocked = asyncio.create_task(DatabaseService._acquire_primary(new))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+    old.used -= 1
+    await DatabaseService._notify_drained()
+    await asyncio.wait_for(blocked, 1)
+    assert new.size + old.size == 4 and DatabaseService._drain_reserved == 0
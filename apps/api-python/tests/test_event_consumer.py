@@ -0,0 +1,52 @@
+import pytest
+
+from src.config.settings import settings
+from src.services.event_consumer import EventConsumer, dead_letter_key
+
+class FakeStreams:
+    """只实现EventConsumer认领路径用到的命令"""
+
+    def __init__(self, entries, deliveries):
+        self.entries = dict(entries)
+        self.pending = dict(deliveries)
+        self.added = []
+        self.acked = []
+
+    async def xpending_range(self, stream, group, min, max, count, idle=None):
+        return [{"message_id": entry_id, "times_delivered": times} for entry_id, times in self.pending.items()]
+
+    async def xrange(self, stream, min, max):
+        return [(min, self.entries[min])] if min in self.entries else []
+
+    async def xadd(self, stream, fields, maxlen=None, approximate=True):
+        self.added.append((stream, fields))
+
+    async def xack(self, stream, group, entry_id):
+        self.acked.append(entry_id)
+        self.pending.pop(entry_id, None)
+
+    async def xautoclaim(self, stream, group, consumer, min_idle_time, start_id, count):
+        for entry_id in self.pending:
+            self.pending[entry_id] += 1
+        return "0-0", [(entry_id, self.entries[entry_id]) for entry_id in self.pending], []
+
+@pytest.mark.asyncio
+async def test_claim_retries_and_dead_letters_exhausted_events(monkeypatch):
+    """测试认领时投递次数用尽的事件移入死信Stream，其余事件重新处理"""
+    monkeypatch.setattr(settings, "EVENTS_MAX_DELIVERIES", 3)
+    client = FakeStreams(
+        {"1-0": {"event_id": "1", "payload": "{}"}, "2-0": {"event_id": "2", "payload": "{}"}},
+        {"1-0": 3, "2-0": 1},
+    )
+    handled = []
+
+    async def handler(event):
+        handled.append(event["event_id"])
+
+    consumer = EventConsumer(client, "events:users", "indexer", "worker-1", handler)
+    assert await consumer.claim_stale() == 1
+    assert handled == ["2"]
+    assert client.added == [(dead_letter_key("events:users"), {
+        "event_id": "1", "payload": "{}", "dead_stream_id": "1-0", "dead_group": "indexer", "dead_deliveries": "3",
+    })]
+    assert client.acked == ["1-0", "2-0"]
@@ -0,0 +1,72 @@
+import json
+import pytest
+
+from src.config.settings import settings
+from src.services import event_hub as event_hub_module
+from src.services.event_hub import EventFilter, EventHub, Subscriber, decode_cursor, encode_cursor
+
+def make_event(entry_id, aggregate_id, event_type="user.updated"):
+    return {"id": entry_id, "event_id": entry_id, "type": event_type, "aggregate_id": str(aggregate_id), "payload": {}}
+
+def test_dispatch_filters_and_evicts_slow_consumers(monkeypatch):
+    """测试按用户过滤分发，队列满的订阅者被断开，其他订阅者不受影响"""
+    monkeypatch.setattr(settings, "SSE_CLIENT_BUFFER", 2)
+    hub = EventHub()
+    everyone = Subscriber(EventFilter(["users"]), {})
+    only_seven = Subscriber(EventFilter(["users"], user_id=7), {})
+    hub._subscribers.update({everyone, only_seven})
+
+    for index in range(3):
+        hub.dispatch("users", make_event(f"100-{index}", 7 if index == 0 else 8))
+
+    assert everyone.closed and everyone not in hub._subscribers
+    assert not only_seven.closed and only_seven.queue.qsize() == 1
+
+@pytest.mark.asyncio
+async def test_replay_resumes_after_cursor_and_skips_duplicates(monkeypatch):
+    """测试带Last-Event-ID续传时从Stream补发之后的事件，与实时推送重叠的事件只发送一次"""
+    requested = []
+
+    class FakeRedis:
+        async def xrange(self, stream, start, count):
+            requested.append((stream, start))
+            return [("100-1", {"event_id": "2", "type": "user.updated", "aggregate_id": "7", "payload": json.dumps({})})]
+
+    async def get_fake_redis():
+        return FakeRedis()
+
+    monkeypatch.setattr(event_hub_module, "get_redis_service", get_fake_redis)
+    subscriber = Subscriber(EventFilter(["users"]), decode_cursor("users:100-0"))
+    await EventHub()._replay(subscriber)
+    assert requested == [("events:users", "(100-0")]
+
+    stream, replayed = subscriber.queue.get_nowait()
+    assert subscriber.accept(stream, replayed)
+    assert not subscriber.accept("users", make_event("100-1", 7))
+    assert subscriber.accept("users", make_event("100-2", 7))
+    assert encode_cursor(subscriber.positions) == "users:100-2"
+
+@pytest.mark.asyncio
+async def test_subscribe_starts_every_stream_at_its_last_entry(monkeypatch):
+    """订阅时没有位置的Stream从当前最后一个条目开始，事件ID覆盖所有订阅的Stream"""
+    class FakeRedis:
+        async def last_entry_id(self, stream):
+            return {"events:orders": "200-0"}.get(stream, "0-0")
+
+        async def xrange(self, stream, start, count):
+            return []
+
+    async def get_fake_redis():
+        return FakeRedis()
+
+    async def ready(self):
+        return None
+
+    monkeypatch.setattr(event_hub_module, "get_redis_service", get_fake_redis)
+    monkeypatch.setattr(EventHub, "_ensure_listener", ready)
+    hub = EventHub()
+    subscriber = await hub.subscribe(EventFilter(["users", "orders"]), "users:100-0")
+
+    assert subscriber.positions == {"users": "100-0", "orders": "200-0"}
+    assert subscriber.accept("users", make_event("100-1", 7))
+    assert encode_cursor(subscriber.positions) == "orders:200-0;users:100-1"
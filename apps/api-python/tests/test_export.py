@@ -0,0 +1,102 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from src.services import export
+from src.services.export import ExportFormat, encode_header, encode_rows
+
+def test_encode_rows_csv_and_ndjson():
+    """测试导出编码：CSV空值为空串，NDJSON保留null，日期和金额转为字符串"""
+    columns = ("id", "total_amount", "notes", "created_at")
+    rows = [(1, Decimal("9.50"), "a,b", datetime(2024, 1, 1)), (2, Decimal("1.00"), None, None)]
+
+    csv_text = encode_header(ExportFormat.CSV, columns) + encode_rows(ExportFormat.CSV, columns, rows)
+    assert csv_text == (
+        "id,total_amount,notes,created_at\n"
+        '1,9.50,"a,b",2024-01-01T00:00:00\n'
+        "2,1.00,,\n"
+    )
+
+    ndjson_text = encode_rows(ExportFormat.NDJSON, columns, rows)
+    assert ndjson_text.splitlines()[1] == '{"id": 2, "total_amount": "1.00", "notes": null, "created_at": null}'
+    assert encode_header(ExportFormat.NDJSON, columns) == ""
+    assert encode_rows(ExportFormat.NDJSON, ("id", "user_id"), [(2, 1 << 60)], ("user_id",)) == (
+        '{"id": 2, "user_id": "%d"}\n' % (1 << 60)
+    )
+
+class FakeStreamCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, args=()):
+        if query.startswith("SELECT"):
+            self.rows = [row for row in self.rows if row[0] > args[0]]
+
+    async def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    async def close(self):
+        pass
+
+class FakeCursorCall:
+    """conn.cursor(...)既可以await（SSCursor），也可以async with"""
+
+    def __init__(self, rows):
+        self.cursor = FakeStreamCursor(list(rows))
+
+    def __await__(self):
+        yield from asyncio.sleep(0).__await__()
+        return self.cursor
+
+    async def __aenter__(self):
+        return self.cursor
+
+    async def __aexit__(self, *exc):
+        return False
+
+class FakeStreamConnection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self, cursor_class=None):
+        return FakeCursorCall(self.rows)
+
+class FakeShardedDatabase:
+    shard_count = 2
+
+    def __init__(self, rows_by_shard):
+        self.rows_by_shard = rows_by_shard
+        self.shards = []
+
+    @asynccontextmanager
+    async def stream_connection(self, replica=False, shard=0):
+        self.shards.append(shard)
+        yield FakeStreamConnection(self.rows_by_shard[shard])
+
+@pytest.mark.asyncio
+async def test_export_streams_every_shard_and_resumes_by_shard(monkeypatch):
+    """测试分片部署时依次导出所有分片并附带shard列，断点续传从指定分片的id之后开始"""
+    db = FakeShardedDatabase({0: [(1, "a"), (2, "b")], 1: [(1, "c")]})
+
+    async def get_db():
+        return db
+
+    monkeypatch.setattr(export, "get_database_service", get_db)
+    monkeypatch.setitem(export.EXPORT_TABLES, "things", ("id", "name"))
+
+    chunks = [chunk async for chunk in export.stream_export("things", ExportFormat.CSV)]
+    assert b"".join(chunks).decode() == "id,name,shard\n1,a,0\n2,b,0\n1,c,1\n"
+
+    chunks = [chunk async for chunk in export.stream_export("things", ExportFormat.CSV, after_id=1, after_shard=0)]
+    assert b"".join(chunks).decode() == "id,name,shard\n2,b,0\n1,c,1\n"
+    assert db.shards == [0, 1, 0, 1]
@@ -0,0 +1,20 @@
+from logging.handlers import RotatingFileHandler, WatchedFileHandler
+from types import SimpleNamespace
+
+from src.config.logging_config import _build_output_handler
+
+
+def test_multi_worker_log_file_is_not_rotated_in_process(tmp_path):
+    """多worker共享日志文件时不在进程内滚动，改为追加写入并在文件被移走后重新打开"""
+    config = SimpleNamespace(
+        LOG_FILE=str(tmp_path / "logs" / "api.log"), LOG_FILE_MAX_BYTES=1024, LOG_FILE_BACKUP_COUNT=1,
+        LOG_FILE_ROTATE=True,
+    )
+    handler = _build_output_handler(config)
+    assert isinstance(handler, RotatingFileHandler)
+    handler.close()
+
+    config.LOG_FILE_ROTATE = False
+    handler = _build_output_handler(config)
+    assert isinstance(handler, WatchedFileHandler)
+    handler.close()
@@ -0,0 +1,38 @@
+import asyncio
+import time
+import pytest
+
+from src.config.settings import settings
+from src.services.loop_monitor import inflight_requests, loop_monitor
+from src.services.metrics import metrics
+
+@pytest.mark.asyncio
+async def test_blocking_call_is_reported_with_route(monkeypatch, caplog):
+    """测试同步阻塞事件循环时记录延迟，看门狗日志包含阻塞位置和所在路由"""
+    monkeypatch.setattr(settings, "DEBUG", False)
+    monkeypatch.setattr(settings, "LOOP_DEBUG", False)
+    monkeypatch.setattr(settings, "LOOP_LAG_INTERVAL", 0.02)
+    monkeypatch.setattr(settings, "LOOP_LAG_THRESHOLD", 0.05)
+    metrics.reset()
+
+    monitor = asyncio.create_task(loop_monitor.run())
+    await asyncio.sleep(0.05)
+
+    async def handler():
+        inflight_requests.track(asyncio.current_task(), {"method": "GET", "path": "/api/slow"})
+        try:
+            time.sleep(0.3)
+        finally:
+            inflight_requests.untrack(asyncio.current_task())
+
+    with caplog.at_level("WARNING", logger="src.services.loop_monitor"):
+        await asyncio.create_task(handler())
+        await asyncio.sleep(0.05)
+    monitor.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await monitor
+
+    assert loop_monitor.max_lag >= 0.2
+    assert metrics.get_counter("event_loop_stalls_total") >= 1
+    stall_logs = [record.getMessage() for record in caplog.records if "blocked" in record.getMessage()]
+    assert stall_logs and "GET /api/slow" in stall_logs[0] and "time.sleep" in stall_logs[0]
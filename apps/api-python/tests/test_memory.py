@@ -0,0 +1,40 @@
+import pytest
+
+from src.services.memory import MemoryDiagnostics
+
+def test_snapshot_diff_points_at_growing_allocation():
+    """测试两个快照的差异能定位到持续增长的分配位置，关闭后快照被丢弃"""
+    diagnostics = MemoryDiagnostics()
+    diagnostics.start()
+    try:
+        diagnostics.take_snapshot("before")
+        retained = [bytearray(1024) for _ in range(1000)]
+        diagnostics.take_snapshot("after")
+
+        top = diagnostics.diff("before", "after", limit=1)[0]
+        assert top["file"].endswith("test_memory.py")
+        assert top["size_diff_bytes"] >= 1000 * 1024
+        assert len(retained) == 1000
+    finally:
+        diagnostics.stop()
+
+    assert diagnostics.list_snapshots() == []
+    with pytest.raises(KeyError):
+        diagnostics.top("before")
+
+def test_gc_pauses_are_published_by_collector():
+    """GC回调不直接写指标注册表，停顿时间由采集回调发布"""
+    import gc
+
+    from src.services.memory import collect_gc_pauses, install_memory_metrics
+    from src.services.metrics import MetricsRegistry, metrics
+
+    install_memory_metrics()
+    before = {key: list(stats) for key, stats in metrics._summaries.get("gc_pause_seconds", {}).items()}
+    gc.collect()
+    assert dict(metrics._summaries.get("gc_pause_seconds", {})) == before
+
+    registry = MetricsRegistry()
+    collect_gc_pauses(registry)
+    count, total, maximum = registry._summaries["gc_pause_seconds"][(("generation", "2"),)]
+    assert count >= 1 and total >= maximum > 0
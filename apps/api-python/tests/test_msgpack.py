@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, FastAPI, status
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from src.routes.negotiation import MsgPackRoute, negotiated
+from src.services.msgpack_codec import MSGPACK_MEDIA_TYPE, accepts_msgpack, packb, unpackb
+
+
+class Item(BaseModel):
+    name: str
+    created_at: datetime
+
+
+def make_client() -> TestClient:
+    router = APIRouter(route_class=MsgPackRoute)
+
+    @router.post("/items", status_code=status.HTTP_201_CREATED)
+    async def create_item(item: Item):
+        return negotiated({"success": True, "data": item.dict()})
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_codec_round_trips_datetimes_as_timestamps():
+    """datetime编码为Timestamp扩展类型，不带时区的按UTC解码"""
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 250000)
+    payload = packb({"id": 1, "created_at": created_at})
+
+    assert unpackb(payload) == {"id": 1, "created_at": created_at.replace(tzinfo=timezone.utc)}
+    assert len(payload) < len(f'{{"id":1,"created_at":"{created_at.isoformat()}"}}')
+    assert accepts_msgpack("application/msgpack, application/json;q=0.5")
+    assert not accepts_msgpack("*/*")
+    assert not accepts_msgpack("application/msgpack;q=0")
+
+
+def test_route_negotiates_request_and_response_formats():
+    """MessagePack请求体按模型校验，Accept决定响应格式，状态码与JSON一致"""
+    client = make_client()
+    created_at = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+    response = client.post(
+        "/items",
+        content=packb({"name": "widget", "created_at": created_at}),
+        headers={"Content-Type": MSGPACK_MEDIA_TYPE, "Accept": MSGPACK_MEDIA_TYPE}
+    )
+    assert response.status_code == 201
+    assert response.headers["content-type"] == MSGPACK_MEDIA_TYPE
+    assert unpackb(response.content)["data"] == {"name": "widget", "created_at": created_at}
+
+    response = client.post("/items", content=packb({"name": "widget", "created_at": created_at}),
+                           headers={"Content-Type": MSGPACK_MEDIA_TYPE})
+    assert response.status_code == 201
+    assert response.json()["data"]["name"] == "widget"
+
+    response = client.post("/items", content=packb({"name": "widget"}), headers={"Content-Type": MSGPACK_MEDIA_TYPE})
+    assert response.status_code == 422
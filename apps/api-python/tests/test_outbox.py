@@ -0,0 +1,109 @@
+import json
+from datetime import datetime
+import pytest
+
+from src.config.settings import settings
+from src.services.outbox import OutboxRelay
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, args=()):
+        self.conn.queries.append((" ".join(query.split()), list(args)))
+
+    async def fetchall(self):
+        return self.conn.rows
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+class FakeRedis:
+    def __init__(self, ok=True):
+        self.ok = ok
+        self.published = []
+
+    async def publish_events(self, events, maxlen):
+        if self.ok:
+            self.published.extend(events)
+        return self.ok
+
+@pytest.mark.asyncio
+async def test_relay_publishes_in_order_then_deletes(monkeypatch):
+    """测试事件按ID顺序发布到对应Stream后才从outbox删除；Redis写入失败时保留事件"""
+    monkeypatch.setattr(settings, "OUTBOX_BATCH_SIZE", 10)
+    created_at = datetime(2024, 1, 1, 12, 0, 0)
+    rows = [
+        (1, "users", 7, "user.created", json.dumps({"username": "bob"}), created_at),
+        (2, "users", 7, "user.deleted", "{}", created_at),
+    ]
+
+    conn = FakeConnection(rows)
+    redis_service = FakeRedis()
+    assert await OutboxRelay().relay_batch(conn, redis_service) == 2
+    assert [(stream, fields["event_id"], fields["type"]) for stream, fields in redis_service.published] == [
+        ("events:users", "1", "user.created"),
+        ("events:users", "2", "user.deleted"),
+    ]
+    assert conn.queries[-1] == ("DELETE FROM outbox_events WHERE id IN (%s, %s)", [1, 2])
+
+    conn = FakeConnection(rows)
+    assert await OutboxRelay().relay_batch(conn, FakeRedis(ok=False)) is None
+    assert not any(query.startswith("DELETE") for query, _ in conn.queries)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def xadd(self, stream, fields, maxlen, approximate):
+        self.commands.append(("XADD", stream))
+
+    def execute_command(self, *args, **options):
+        self.commands.append(args[:2])
+
+    async def execute(self):
+        commands, self.commands = self.commands, []
+        if commands[0][0] == "PUBLISH":
+            raise ConnectionError("publish failed")
+        self.client.streams.extend(stream for _, stream in commands)
+        return [f"{index}-0" for index in range(len(commands))]
+
+
+class FakePipelineClient:
+    def __init__(self):
+        self.streams = []
+
+    def pipeline(self, transaction):
+        return FakePipeline(self)
+
+
+@pytest.mark.asyncio
+async def test_publish_failure_after_xadd_counts_as_published(monkeypatch):
+    """事件已写入Stream后PUBLISH失败仍视为已发布，outbox不会重试而在Stream中写入重复事件"""
+    from src.services.redis import RedisService
+
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_ENABLED", False)
+    client = FakePipelineClient()
+    monkeypatch.setattr(RedisService, "_client", client)
+
+    assert await RedisService().publish_events([("events:users", {"event_id": "1"})], 100) is True
+    assert client.streams == ["events:users"]
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import shutil
+import socket
+import subprocess
+import time
+
+import pytest
+from redis.crc import key_slot
+
+from src.config.settings import settings
+from src.services.redis import RedisService, hash_tag, parse_address
+
+# 集成测试在本机启动多个redis-server进程，未安装时跳过
+requires_redis_server = pytest.mark.skipif(
+    shutil.which("redis-server") is None or shutil.which("redis-cli") is None,
+    reason="redis-server/redis-cli not installed"
+)
+
+
+def test_hash_tag_colocates_keys_in_one_slot():
+    """相同hash tag的key落在同一槽位"""
+    email = "alice@example.com"
+    keys = [f"{hash_tag(email)}:code", f"{hash_tag(email)}:attempts", f"rate:{hash_tag(email)}"]
+
+    assert len({key_slot(key.encode()) for key in keys}) == 1
+    assert parse_address("10.0.0.1:7001") == ("10.0.0.1", 7001)
+    assert parse_address("redis") == ("redis", 6379)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _cli(port: int, *args: str) -> str:
+    return subprocess.run(
+        ["redis-cli", "-p", str(port), *args], capture_output=True, text=True, timeout=10, check=True
+    ).stdout
+
+
+def _wait_for(condition, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if condition():
+                return
+        except subprocess.SubprocessError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError("Redis processes did not become ready")
+
+
+def _start(tmp_path, port: int, *args: str) -> subprocess.Popen:
+    process = subprocess.Popen(
+        ["redis-server", "--port", str(port), "--save", "", "--appendonly", "no", "--dir", str(tmp_path), *args],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    _wait_for(lambda: _cli(port, "ping").strip() == "PONG")
+    return process
+
+
+@pytest.fixture
+def redis_cluster(tmp_path):
+    """本机三主节点集群"""
+    ports = [_free_port() for _ in range(3)]
+    processes = [
+        _start(tmp_path, port, "--cluster-enabled", "yes", "--cluster-config-file", f"nodes-{port}.conf")
+        for port in ports
+    ]
+    try:
+        subprocess.run(
+            ["redis-cli", "--cluster", "create", *(f"127.0.0.1:{port}" for port in ports), "--cluster-yes"],
+            capture_output=True, timeout=30, check=True
+        )
+        _wait_for(lambda: all("cluster_state:ok" in _cli(port, "cluster", "info") for port in ports))
+        yield ports
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+@pytest.fixture
+def redis_sentinel(tmp_path):
+    """本机一主一从加一个哨兵"""
+    master_port, replica_port, sentinel_port = _free_port(), _free_port(), _free_port()
+    processes = [_start(tmp_path, master_port)]
+    processes.append(_start(tmp_path, replica_port, "--replicaof", "127.0.0.1", str(master_port)))
+    config = tmp_path / "sentinel.conf"
+    config.write_text(
+        f"port {sentinel_port}\n"
+        f"sentinel monitor mymaster 127.0.0.1 {master_port} 1\n"
+        "sentinel down-after-milliseconds mymaster 1000\n"
+        "sentinel failover-timeout mymaster 5000\n"
+    )
+    processes.append(subprocess.Popen(
+        ["redis-server", str(config), "--sentinel"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    ))
+    try:
+        _wait_for(lambda: "master_link_status:up" in _cli(replica_port, "info", "replication"))
+        _wait_for(lambda: str(master_port) in _cli(sentinel_port, "sentinel", "get-master-addr-by-name", "mymaster"))
+        yield master_port, replica_port, sentinel_port
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+async def _connect(monkeypatch, mode: str, **overrides) -> RedisService:
+    monkeypatch.setattr(settings, "REDIS_MODE", mode)
+    monkeypatch.setattr(settings, "REDIS_PASSWORD", "")
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_ENABLED", False)
+    for name, value in overrides.items():
+        monkeypatch.setattr(settings, name, value)
+    await RedisService.close()
+    return await RedisService.initialize()
+
+
+@requires_redis_server
+@pytest.mark.asyncio
+async def test_cluster_mode_splits_batches_across_slots(monkeypatch, redis_cluster):
+    """集群模式下批量读写跨槽位拆分，hash tag的key可用于同一Lua脚本和RENAME"""
+    service = await _connect(monkeypatch, "cluster", REDIS_CLUSTER_NODES=[f"127.0.0.1:{redis_cluster[0]}"])
+    try:
+        mapping = {f"user:{i}": {"id": i} for i in range(50)}
+        assert len({key_slot(key.encode()) for key in mapping}) > 1
+        assert await service.mset(mapping, ttl=60)
+        assert await service.mget([*mapping, "user:missing"]) == [*mapping.values(), None]
+
+        assert await service.set(f"{hash_tag('alice@example.com')}:code", "123456")
+        assert await service.eval(
+            "return redis.call('GET', KEYS[1]) .. redis.call('INCR', KEYS[2])",
+            [f"{hash_tag('alice@example.com')}:code", f"{hash_tag('alice@example.com')}:attempts"], []
+        ) == "1234561"
+        # 计数器只在已初始化时增减
+        assert await service.incr_if_exists("count:test", 1) is None
+        assert await service.get("count:test") is None
+        assert await service.set("count:test", 5)
+        assert await service.incr_if_exists("count:test", -2) == 3
+        assert await service.rename("{users:search}:rebuild-test", "{users:search}:index-test") is False
+        assert await service.set("{users:search}:rebuild-test", "1")
+        assert await service.rename("{users:search}:rebuild-test", "{users:search}:index-test")
+
+        pubsub = service.pubsub()
+        await pubsub.psubscribe("events:*")
+        assert await service.publish_events([("events:users", {"event_id": "1", "type": "user.created"})], 100)
+        message = None
+        for _ in range(20):
+            message = await pubsub.get_message(timeout=0.5)
+            if message:
+                break
+        await pubsub.close()
+        assert message is not None and json.loads(message["data"])["event_id"] == "1"
+        assert len(await service.xrange("events:users", "-", 10)) == 1
+    finally:
+        await RedisService.close()
+
+
+@requires_redis_server
+@pytest.mark.asyncio
+async def test_sentinel_mode_follows_failover(monkeypatch, redis_sentinel):
+    """哨兵切换主节点后，同一个RedisService继续读写新主节点"""
+    master_port, replica_port, sentinel_port = redis_sentinel
+    service = await _connect(monkeypatch, "sentinel", REDIS_SENTINELS=[f"127.0.0.1:{sentinel_port}"])
+    try:
+        assert await service.set("failover:key", "before")
+        _wait_for(lambda: _cli(replica_port, "get", "failover:key").strip() == "before")
+
+        _cli(sentinel_port, "sentinel", "failover", "mymaster")
+        _wait_for(lambda: str(replica_port) in _cli(sentinel_port, "sentinel", "get-master-addr-by-name", "mymaster"))
+        _wait_for(lambda: "role:slave" in _cli(master_port, "info", "replication"))
+
+        # 切换瞬间旧连接会报错（返回False），之后的命令重新发现主节点
+        written = False
+        for _ in range(50):
+            written = await service.set("failover:key", "after")
+            if written:
+                break
+            await asyncio.sleep(0.2)
+        assert written
+        assert await service.get("failover:key") == "after"
+        assert _cli(replica_port, "get", "failover:key").strip() == "after"
+    finally:
+        await RedisService.close()
@@ -0,0 +1,65 @@
+import pytest
+
+from src.services import search_index
+from src.services.search_index import UserSearchIndex, user_terms
+
+class FakeLexRedis:
+    """按ZRANGEBYLEX语义在内存中排序成员的假Redis"""
+
+    def __init__(self, members):
+        self.members = sorted(members, key=lambda member: member.encode("utf-8"))
+
+    async def zrangebylex(self, key, lower, upper, offset, count):
+        lower_bytes = lower.encode("utf-8")
+        upper_bytes = upper[1:]
+        result = []
+        for member in self.members:
+            value = member.encode("utf-8")
+            if lower_bytes[:1] == b"(" and value <= lower_bytes[1:]:
+                continue
+            if lower_bytes[:1] == b"[" and value < lower_bytes[1:]:
+                continue
+            if value > upper_bytes:
+                continue
+            result.append(member)
+        return result[offset:offset + count]
+
+def test_user_terms_cover_username_name_words_and_email_local_part():
+    """测试索引词条包含用户名、姓名及其单词、邮箱@之前的部分，并统一小写"""
+    terms = user_terms(7, "JohnDoe", "John  Doe", "jd@example.com")
+    assert terms == [
+        "johndoe\x00username\x007",
+        "john doe\x00name\x007",
+        "john\x00name\x007",
+        "doe\x00name\x007",
+        "jd\x00email\x007",
+    ]
+
+@pytest.mark.asyncio
+async def test_search_is_deduplicated_and_keyset_paginated(monkeypatch):
+    """测试同一用户多字段命中时页内去重，游标翻页不遗漏"""
+    members = (
+        user_terms(1, "john", "John Smith", "john@example.com")
+        + user_terms(2, "johanna", None, "jo@example.com")
+        + user_terms(3, "jon", None, "x@example.com")
+        + user_terms(4, "mary", "Mary Jones", "mary@example.com")
+    )
+    fake = FakeLexRedis(members)
+
+    async def get_redis():
+        return fake
+
+    monkeypatch.setattr(UserSearchIndex, "_get_redis", staticmethod(get_redis))
+    index = search_index.UserSearchIndex()
+
+    seen = []
+    cursor = None
+    while True:
+        user_ids, cursor = await index.search("Jo", 2, cursor)
+        seen.extend(user_ids)
+        if cursor is None:
+            break
+    assert set(seen) == {1, 2, 3, 4}
+
+    with pytest.raises(ValueError):
+        await index.search("mary", 2, search_index.encode_cursor("john\x00username\x001"))
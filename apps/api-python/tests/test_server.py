@@ -0,0 +1,33 @@
+from src.config.settings import settings
+from src.server import primary_pool_limit, resolve_pool_sizes
+
+
+def test_pool_sizes_share_budget_of_each_server(monkeypatch):
+    """同一服务器上的主库、分片和副本连接池一起分摊max_connections，其他服务器单独计算"""
+    for name, value in {
+        "DB_HOST": "db1", "DB_PORT": 3306, "DB_MAX_CONNECTIONS": 110, "DB_RESERVED_CONNECTIONS": 10,
+        "DB_POOL_SIZE": 20, "DB_SHARD_POOL_SIZE": 10, "DB_REPLICA_POOL_SIZE": 4,
+        "DB_SHARDS": ["users_1", "db2:3306/users_2"], "DB_REPLICA_HOST": "db1", "DB_REPLICA_PORT": None,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+
+    # db1每个worker预算25：20 + 10 + 4 = 34 按比例缩小
+    sizes = resolve_pool_sizes(4)
+    assert sizes == {"DB_POOL_SIZE": 14, "DB_SHARD_POOL_SIZE": 7, "DB_REPLICA_POOL_SIZE": 2}
+    assert sum(sizes.values()) * 4 <= 100
+
+    monkeypatch.setattr(settings, "DB_REPLICA_HOST", "replica")
+    assert resolve_pool_sizes(1) == {"DB_POOL_SIZE": 20, "DB_SHARD_POOL_SIZE": 10, "DB_REPLICA_POOL_SIZE": 4}
+
+
+def test_runtime_pool_limit_is_per_worker_share(monkeypatch):
+    """运行时DB_POOL_SIZE的上限为每个worker在主库服务器上的预算减去同一服务器上的其他连接池"""
+    for name, value in {
+        "DB_HOST": "db1", "DB_PORT": 3306, "DB_MAX_CONNECTIONS": 110, "DB_RESERVED_CONNECTIONS": 10,
+        "DB_SHARDS": ["users_1", "db2:3306/users_2"], "DB_REPLICA_HOST": None,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+
+    # 每个worker预算25，主库服务器上还有一个5连接的分片连接池
+    sizes = {"DB_POOL_SIZE": 10, "DB_SHARD_POOL_SIZE": 5, "DB_REPLICA_POOL_SIZE": 4}
+    assert primary_pool_limit(4, sizes) == 20
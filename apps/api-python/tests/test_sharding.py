@@ -0,0 +1,69 @@
+import pytest
+
+from src.config.settings import settings
+from src.services.sharding import group_by_shard, merge_sorted, shard_for_email, shard_for_id, shard_lock_name
+from src.services.snowflake import SnowflakeGenerator, shard_of
+
+
+def test_snowflake_ids_are_unique_increasing_and_encode_shard():
+    """雪花ID在同一进程内唯一、同一分片内递增，并能还原所在分片"""
+    generator = SnowflakeGenerator(worker_id=5)
+    ids = [generator.next_id(shard % 3) for shard in range(5000)]
+
+    assert len(set(ids)) == len(ids)
+    assert ids[::3] == sorted(ids[::3])
+    assert [shard_of(user_id) for user_id in ids[:6]] == [0, 1, 2, 0, 1, 2]
+    assert all(user_id > 5_000_000 for user_id in ids)
+
+
+def test_legacy_ids_route_to_first_shard(monkeypatch):
+    """迁移时记录的最大自增ID以内的ID都在分片0，属于未配置分片的ID按不存在处理"""
+    monkeypatch.setattr(settings, "DB_SHARDS", ["shard_1"])
+    monkeypatch.setattr(settings, "SNOWFLAKE_LEGACY_MAX_ID", 0)
+
+    assert shard_for_id(42) == 0
+    assert shard_for_id(5_000_000) is None
+    monkeypatch.setattr(settings, "SNOWFLAKE_LEGACY_MAX_ID", 6_000_000)
+    assert shard_for_id(5_000_000) == 0
+
+    generator = SnowflakeGenerator(worker_id=1)
+    on_shard_1, on_shard_2 = generator.next_id(1), generator.next_id(2)
+    assert shard_for_id(on_shard_1) == 1
+    assert shard_for_id(on_shard_2) is None
+    assert group_by_shard([on_shard_2, 42, on_shard_1]) == [(0, [42]), (1, [on_shard_1])]
+    assert shard_for_email("Alice@Example.com") == shard_for_email("alice@example.com")
+    assert shard_lock_name("user_purge", 0) == "user_purge"
+    assert shard_lock_name("user_purge", 1) == "user_purge:1"
+
+
+def test_merge_sorted_interleaves_shard_results():
+    """各分片已按倒序排好的结果归并为全局倒序"""
+    merged = merge_sorted([[9, 4, 1], [8, 7, 2], []], key=lambda value: value, reverse=True)
+
+    assert merged == [9, 8, 7, 4, 2, 1]
+
+def test_generator_requires_live_lease():
+    """未租到worker id或租约过期、被收回时拒绝生成ID"""
+    generator = SnowflakeGenerator()
+    with pytest.raises(RuntimeError):
+        generator.next_id(0)
+
+    generator.assign(7, valid_for=60)
+    assert (generator.next_id(0) >> 10) & 63 == 7
+    generator.assign(7, valid_for=-1)
+    with pytest.raises(RuntimeError):
+        generator.next_id(0)
+    generator.extend(60)
+    generator.next_id(0)
+    generator.revoke()
+    with pytest.raises(RuntimeError):
+        generator.next_id(0)
+
+def test_user_ids_serialize_as_strings():
+    """雪花ID在响应中为字符串，缓存中的字符串ID读回时仍为整数"""
+    from src.models.user import User
+
+    user_id = SnowflakeGenerator(worker_id=1).next_id(1)
+    user = User(id=user_id, username="bob", email="bob@example.com")
+    assert user.dict()["id"] == str(user_id)
+    assert User.model_validate_json(user.json()).id == user_id
@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+
+from src.services.metrics import metrics
+from src.services.singleflight import SingleFlight, flight_key
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    """测试并发相同key只执行一次"""
+    flight = SingleFlight("test_share")
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"id": 1}
+
+    results = await asyncio.gather(
+        *[flight.do(flight_key("get_user_by_id", 1), fetch) for _ in range(10)]
+    )
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert metrics.get_counter("singleflight_coalesced_total", group="test_share", method="get_user_by_id") == 9
+    assert flight.inflight == 0
+
+@pytest.mark.asyncio
+async def test_different_keys_are_not_coalesced():
+    """测试不同key分别执行"""
+    flight = SingleFlight("test_keys")
+    seen = []
+
+    async def fetch(user_id):
+        seen.append(user_id)
+        await asyncio.sleep(0)
+        return user_id
+
+    results = await asyncio.gather(
+        flight.do(flight_key("get_user_by_id", 1), lambda: fetch(1)),
+        flight.do(flight_key("get_user_by_id", 2), lambda: fetch(2)),
+    )
+    assert results == [1, 2]
+    assert sorted(seen) == [1, 2]
+
+@pytest.mark.asyncio
+async def test_timeout_releases_key():
+    """测试超时后所有等待者收到TimeoutError且key被释放"""
+    flight = SingleFlight("test_timeout")
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    results = await asyncio.gather(
+        flight.do("k", slow, timeout=0.01),
+        flight.do("k", slow, timeout=0.01),
+        return_exceptions=True,
+    )
+    assert all(isinstance(r, asyncio.TimeoutError) for r in results)
+    assert flight.inflight == 0
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_call():
+    """测试单个调用者取消不影响其他等待者"""
+    flight = SingleFlight("test_cancel")
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    first = asyncio.ensure_future(flight.do("k", fetch))
+    second = asyncio.ensure_future(flight.do("k", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == "ok"
+
+@pytest.mark.asyncio
+async def test_forget_method_restarts_all_keys_of_method():
+    """测试写操作后丢弃某个方法的所有进行中key，之后的调用重新执行"""
+    flight = SingleFlight("test_forget")
+    calls = []
+    release = asyncio.Event()
+
+    async def fetch(page):
+        calls.append(page)
+        await release.wait()
+        return page
+
+    first = [asyncio.create_task(flight.do(flight_key("get_users_page", page, 20), lambda p=page: fetch(p))) for page in (0, 20)]
+    other = asyncio.create_task(flight.do(flight_key("get_user_by_id", 1), lambda: fetch("id")))
+    await asyncio.sleep(0)
+    flight.forget_method("get_users_page")
+    assert flight.inflight == 1
+
+    again = asyncio.create_task(flight.do(flight_key("get_users_page", 0, 20), lambda: fetch("again")))
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(*first, other, again)
+    assert calls == [0, 20, "id", "again"]
+    assert flight.inflight == 0
@@ -0,0 +1,66 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+import pytest
+
+from src.config.settings import settings
+from src.services import database
+from src.services.slow_query import SlowQueryLog, normalize_sql
+
+def test_normalize_sql_removes_literals_and_collapses_lists():
+    """测试归一化去掉参数和字面量，不同长度的IN列表得到相同指纹"""
+    assert normalize_sql("SELECT *  FROM users\n WHERE id IN (%s, %s, %s) AND name = 'bob' LIMIT 10") == \
+        "SELECT * FROM users WHERE id IN (...) AND name = ? LIMIT ?"
+    assert normalize_sql("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)") == "INSERT INTO t (a, b) VALUES (?, ?)"
+
+class FakeCursor:
+    def __init__(self, executed):
+        self.executed = executed
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, args=None):
+        self.executed.append((query, args))
+
+    async def fetchone(self):
+        return (json.dumps({"query_block": {"table": {"access_type": "ALL"}}}),)
+
+class FakeDatabaseService:
+    def __init__(self):
+        self.executed = []
+
+    @asynccontextmanager
+    async def get_connection(self):
+        yield self
+
+    def cursor(self):
+        return FakeCursor(self.executed)
+
+@pytest.mark.asyncio
+async def test_slow_statements_are_aggregated_and_explained_once(monkeypatch, caplog):
+    """测试慢语句按指纹聚合，日志不含参数值，新指纹只EXPLAIN一次"""
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD", 0)
+    fake_db = FakeDatabaseService()
+
+    async def get_fake_service():
+        return fake_db
+
+    monkeypatch.setattr(database, "get_database_service", get_fake_service)
+    log = SlowQueryLog()
+    query = "SELECT * FROM users ORDER BY created_at DESC LIMIT %s OFFSET %s"
+    with caplog.at_level("WARNING", logger="src.services.slow_query"):
+        for offset in (0, 20):
+            with log.observe(query, (20, offset)):
+                pass
+    await asyncio.gather(*log._explain_tasks)
+
+    [entry] = log.top()
+    assert entry["count"] == 2 and entry["last_params"] == ["int", "int"]
+    assert entry["explain"]["query_block"]["table"]["access_type"] == "ALL"
+    assert fake_db.executed == [(f"EXPLAIN FORMAT=JSON {query}", (20, 0))]
+    assert all("created_at" in record.getMessage() and "20" not in record.getMessage().split("params=")[1]
+               for record in caplog.records)
@@ -0,0 +1,26 @@
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import Status, StatusCode
+
+from src.services.tracing import TailSamplingSpanProcessor
+
+def test_tail_sampling_keeps_error_traces_with_all_children():
+    """测试尾部采样：比例为0时正常trace被丢弃，出错的trace连同子span一起导出"""
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(TailSamplingSpanProcessor(
+        SimpleSpanProcessor(exporter), latency_threshold=60, ratio=0.0, max_traces=100
+    ))
+    tracer = provider.get_tracer(__name__)
+
+    with tracer.start_as_current_span("fast"):
+        with tracer.start_as_current_span("mysql SELECT"):
+            pass
+    assert exporter.get_finished_spans() == ()
+
+    with tracer.start_as_current_span("failing") as root:
+        with tracer.start_as_current_span("redis get"):
+            pass
+        root.set_status(Status(StatusCode.ERROR))
+    assert [span.name for span in exporter.get_finished_spans()] == ["redis get", "failing"]
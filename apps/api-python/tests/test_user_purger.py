@@ -0,0 +1,71 @@
+import pytest
+
+from src.config.settings import settings
+from src.services.user_purger import UserPurger
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self._rows = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, args=()):
+        self.conn.queries.append((" ".join(query.split()), tuple(args)))
+        self.rowcount, self._rows = self.conn.responses.pop(0) if self.conn.responses else (0, [])
+
+    async def fetchall(self):
+        return self._rows
+
+class FakeConnection:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.queries = []
+
+    async def begin(self):
+        self.queries.append(("BEGIN", ()))
+
+    async def commit(self):
+        self.queries.append(("COMMIT", ()))
+
+    async def rollback(self):
+        self.queries.append(("ROLLBACK", ()))
+
+    def cursor(self):
+        return FakeCursor(self)
+
+@pytest.mark.asyncio
+async def test_purge_user_deletes_children_in_batches_before_user(monkeypatch):
+    """测试清理按批删除子表（满批继续），先删订单项再删订单，最后在事务中删除剩余关联行和用户行"""
+    monkeypatch.setattr(settings, "USER_PURGE_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "USER_PURGE_BATCH_PAUSE", 0)
+    conn = FakeConnection([
+        (2, []), (1, []),        # refresh_tokens：满批后再删一批
+        (0, []),                 # user_sessions
+        (2, [(10,), (11,)]),     # 第一批订单ID
+        (1, []),                 # order_items
+        (2, []),                 # orders
+        (0, []),                 # 没有更多订单
+        (0, []), (0, []), (1, []), (0, []),  # 清理期间新写入的关联行
+        (1, []),                 # users
+    ])
+
+    await UserPurger().purge_user(conn, 7)
+
+    tables = [
+        query.split()[1 if query.startswith("DELETE order_items FROM") else 2] if query.startswith("DELETE")
+        else query.lower().split()[0]
+        for query, _ in conn.queries
+    ]
+    assert tables == [
+        "refresh_tokens", "refresh_tokens", "user_sessions",
+        "select", "order_items", "orders", "select",
+        "begin", "order_items", "orders", "refresh_tokens", "user_sessions", "users", "commit",
+    ]
+    assert conn.queries[4] == ("DELETE FROM order_items WHERE order_id IN (%s, %s) LIMIT %s", (10, 11, 2))
+    assert conn.queries[-2] == ("DELETE FROM users WHERE id = %s AND deleted_at IS NOT NULL", (7,))
@@ -0,0 +1,29 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.models.user import User
+from src.routes import users as users_module
+
+
+def test_unpaginated_responses_keep_original_shape(monkeypatch):
+    """不分页和按ids查询的响应不经PaginatedResponse转换，不带pagination字段"""
+    user = User(id=1, username="alice", email="alice@example.com")
+
+    async def get_all_users():
+        return [user]
+
+    async def get_users_by_ids(user_ids):
+        return {1: user}
+
+    monkeypatch.setattr(users_module.UserRepository, "get_all_users", get_all_users)
+    monkeypatch.setattr(users_module.UserRepository, "get_users_by_ids", get_users_by_ids)
+    app = FastAPI()
+    app.include_router(users_module.router, prefix="/api/users")
+    client = TestClient(app)
+
+    listed = client.get("/api/users/").json()
+    assert "pagination" not in listed and listed["data"][0]["id"] == "1"
+
+    batch = client.get("/api/users/", params={"ids": "1,2"}).json()
+    assert "pagination" not in batch
+    assert [(item["id"], item["found"]) for item in batch["data"]] == [("1", True), ("2", False)]
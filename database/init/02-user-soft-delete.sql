@@ -0,0 +1,5 @@
+-- 用户软删除：DELETE /api/users/{id} 只写入deleted_at（tombstone），
+-- 关联的refresh_tokens/user_sessions/orders/order_items及用户行由后台UserPurger分批清理
+ALTER TABLE users
+    ADD COLUMN deleted_at TIMESTAMP NULL DEFAULT NULL AFTER updated_at,
+    ADD INDEX idx_deleted_at (deleted_at);
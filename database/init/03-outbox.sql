@@ -0,0 +1,9 @@
+-- 事务性outbox：业务写入与事件在同一事务中提交，后台OutboxRelay转发到Redis Streams（events:<aggregate_type>）后删除
+CREATE TABLE IF NOT EXISTS outbox_events (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    aggregate_type VARCHAR(32) NOT NULL,
+    aggregate_id BIGINT NOT NULL,
+    event_type VARCHAR(64) NOT NULL,
+    payload JSON NOT NULL,
+    created_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3)
+);
@@ -0,0 +1,20 @@
+-- 用户ID改为雪花ID（64位，编码所在分片，见apps/api-python/src/services/snowflake.py）
+-- 已有的自增ID保持不变，按分片0路由：旧ID可能任意大，不能按位数判断，这里记录迁移时users表的最大ID作为分界，
+-- 应用在数据库初始化时读取（SNOWFLAKE_LEGACY_MAX_ID）；外键列先放宽约束再一起改为BIGINT
+SET FOREIGN_KEY_CHECKS = 0;
+
+ALTER TABLE users MODIFY id BIGINT NOT NULL AUTO_INCREMENT;
+ALTER TABLE refresh_tokens MODIFY user_id BIGINT NOT NULL;
+ALTER TABLE user_sessions MODIFY user_id BIGINT NOT NULL;
+ALTER TABLE orders MODIFY user_id BIGINT NOT NULL;
+
+SET FOREIGN_KEY_CHECKS = 1;
+
+CREATE TABLE IF NOT EXISTS snowflake_legacy_ids (
+    table_name VARCHAR(64) PRIMARY KEY,
+    max_id BIGINT NOT NULL
+);
+
+-- 只在第一次迁移时记录（之后写入的都是雪花ID）
+INSERT IGNORE INTO snowflake_legacy_ids (table_name, max_id)
+SELECT 'users', COALESCE(MAX(id), 0) FROM users;
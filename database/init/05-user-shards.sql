@@ -0,0 +1,32 @@
+-- 本地开发用的用户分片库（DB_SHARDS=turborepo_dev_shard_1,turborepo_dev_shard_2）
+-- 分片0为主库turborepo_dev；每个分片库包含完整的按用户存储的表结构，商品等全局表只在主库
+-- CREATE TABLE ... LIKE 不复制外键，这里补上分片内的外键（order_items.product_id引用主库的全局表products，不加外键）
+CREATE DATABASE IF NOT EXISTS turborepo_dev_shard_1 DEFAULT CHARACTER SET utf8mb4;
+CREATE DATABASE IF NOT EXISTS turborepo_dev_shard_2 DEFAULT CHARACTER SET utf8mb4;
+
+CREATE TABLE IF NOT EXISTS turborepo_dev_shard_1.users LIKE turborepo_dev.users;
+CREATE TABLE IF NOT EXISTS turborepo_dev_shard_1.refresh_tokens LIKE turborepo_dev.refresh_tokens;
+CREATE TABLE IF NOT EXISTS turborepo_dev_shard_1.user_sessions LIKE turborepo_dev.user_sessions;
+CREATE TABLE IF NOT EXISTS turborepo_dev_shard_1.orders LIKE turborepo_dev.orders;
+CREATE TABLE IF NOT EXISTS turborepo_dev_shard_1.order_items LIKE turborepo_dev.order_items;
+CREATE TABLE IF NOT EXISTS turborepo_dev_shard_1.outbox_events LIKE turborepo_dev.outbox_events;
+
+CREATE TABLE IF NOT EXISTS turborepo_dev_shard_2.users LIKE turborepo_dev.users;
+CREATE TABLE IF NOT EXISTS turborepo_dev_shard_2.refresh_tokens LIKE turborepo_dev.refresh_tokens;
+CREATE TABLE IF NOT EXISTS turborepo_dev_shard_2.user_sessions LIKE turborepo_dev.user_sessions;
+CREATE TABLE IF NOT EXISTS turborepo_dev_shard_2.orders LIKE turborepo_dev.orders;
+CREATE TABLE IF NOT EXISTS turborepo_dev_shard_2.order_items LIKE turborepo_dev.order_items;
+CREATE TABLE IF NOT EXISTS turborepo_dev_shard_2.outbox_events LIKE turborepo_dev.outbox_events;
+
+ALTER TABLE turborepo_dev_shard_1.refresh_tokens ADD FOREIGN KEY (user_id) REFERENCES turborepo_dev_shard_1.users(id) ON DELETE CASCADE;
+ALTER TABLE turborepo_dev_shard_1.user_sessions ADD FOREIGN KEY (user_id) REFERENCES turborepo_dev_shard_1.users(id) ON DELETE CASCADE;
+ALTER TABLE turborepo_dev_shard_1.orders ADD FOREIGN KEY (user_id) REFERENCES turborepo_dev_shard_1.users(id) ON DELETE CASCADE;
+ALTER TABLE turborepo_dev_shard_1.order_items ADD FOREIGN KEY (order_id) REFERENCES turborepo_dev_shard_1.orders(id) ON DELETE CASCADE;
+
+ALTER TABLE turborepo_dev_shard_2.refresh_tokens ADD FOREIGN KEY (user_id) REFERENCES turborepo_dev_shard_2.users(id) ON DELETE CASCADE;
+ALTER TABLE turborepo_dev_shard_2.user_sessions ADD FOREIGN KEY (user_id) REFERENCES turborepo_dev_shard_2.users(id) ON DELETE CASCADE;
+ALTER TABLE turborepo_dev_shard_2.orders ADD FOREIGN KEY (user_id) REFERENCES turborepo_dev_shard_2.users(id) ON DELETE CASCADE;
+ALTER TABLE turborepo_dev_shard_2.order_items ADD FOREIGN KEY (order_id) REFERENCES turborepo_dev_shard_2.orders(id) ON DELETE CASCADE;
+
+GRANT ALL PRIVILEGES ON `turborepo_dev_shard_%`.* TO 'developer'@'%';
+FLUSH PRIVILEGES;
@@ -1,5 +1,6 @@
 // 用户相关类型
 export interface User {
+  // 64位雪花ID，超过Number.MAX_SAFE_INTEGER，API始终以字符串返回
   id: string;
   email: string;
   name: string;
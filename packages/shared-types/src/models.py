@@ -5,7 +5,7 @@ from datetime import datetime
 
 # 用户相关模型
 class User(BaseModel):
-    id: str
+    id: str  # 64位雪花ID，超过2^53，以字符串传输
     email: EmailStr
     name: str
     avatar: Optional[str] = None
@@ -40,8 +40,10 @@ class ApiResponse(BaseModel):
 class Pagination(BaseModel):
     page: int
     limit: int
-    total: int
-    total_pages: int
+    # count_mode为none时不返回总数；approximate时为information_schema估算值
+    total: Optional[int] = None
+    total_pages: Optional[int] = None
+    count_mode: str = "exact"
 
 
 class PaginatedResponse(BaseModel):